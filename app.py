@@ -1,9 +1,9 @@
 # Import packages
-import subprocess, logging, secrets, os, redis
+import logging, secrets, os, redis
 from flask_migrate import Migrate
 from flask import Flask, render_template, request, Response, jsonify, redirect, url_for, session as flask_session
 from flask_session import Session
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from werkzeug.exceptions import HTTPException
 from modules import *
@@ -18,6 +18,9 @@ load_dotenv()
 # Create the flask object
 app = Flask(__name__)
 
+# Encode every JSON response with the fast serializer (orjson when installed)
+app.json = FastJSONProvider(app)
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
 
@@ -45,6 +48,15 @@ if env == 'production':
         app.logger.debug("Redis connection successful")
     except redis.ConnectionError as e:
         app.logger.error(f"Redis connection failed: {e}")
+    
+    # Share cached assignments and the catalog version across worker processes
+    assignment_cache.configure(RedisBackend(app.config['SESSION_REDIS']))
+    catalog.configure(RedisBackend(app.config['SESSION_REDIS']))
+    admin_roles.configure(RedisBackend(app.config['SESSION_REDIS']))
+    token_revocations.configure(RedisBackend(app.config['SESSION_REDIS']))
+    roster_cache.configure(RedisBackend(app.config['SESSION_REDIS']))
+    visibility_index.configure(RedisBackend(app.config['SESSION_REDIS']))
+    question_cache.configure(backend=RedisBackend(app.config['SESSION_REDIS']))
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite'
     app.config['SERVER_NAME'] = 'localhost'
@@ -54,12 +66,59 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Initialize the app with db object
 db.init_app(app)
 
+# Group commit XP events from this worker process
+xp_buffer.configure(app, app.config['XP_BUFFER_MAX_BATCH'], app.config['XP_BUFFER_MAX_DELAY'],
+                    app.config['XP_BUFFER_COMMIT_TIMEOUT'])
+
+# Bound the per-worker question response cache
+question_cache.configure(app.config['QUESTION_CACHE_SIZE'])
+
+# Reload the cached Admin roles at least this often (they can change outside the app)
+admin_roles.configure(ttl=app.config['ADMIN_ROLES_TTL'])
+
+# Classroom rosters are cached for ROSTER_CACHE_TTL seconds (0 turns the cache off)
+roster_cache.configure(ttl=app.config['ROSTER_CACHE_TTL'])
+
+# Teachers' student sets (authorization checks and the user directory) are rebuilt at least this often
+visibility_index.configure(ttl=app.config['ACL_TTL'])
+
+# Serve JS/CSS/JSON precompressed under content-hashed URLs and gzip large responses
+static_assets.init_app(app, app.config['STATIC_MAX_AGE'])
+app.wsgi_app = gzip_middleware = GzipMiddleware(app.wsgi_app, app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
+
+# Size and limit the /run_code sandbox pool (workers start on the first run)
+sandbox_pool.configure(size=app.config['SANDBOX_WORKERS'], max_queue=app.config['SANDBOX_MAX_QUEUE'],
+                       queue_timeout=app.config['SANDBOX_QUEUE_TIMEOUT'], max_runs=app.config['SANDBOX_MAX_RUNS'],
+                       cpu_seconds=app.config['SANDBOX_CPU_SECONDS'], wall_seconds=app.config['SANDBOX_WALL_SECONDS'],
+                       memory_mb=app.config['SANDBOX_MEMORY_MB'], max_output=app.config['SANDBOX_MAX_OUTPUT'])
+run_cache.configure(max_entries=app.config['RUN_CACHE_SIZE'], ttl=app.config['RUN_CACHE_TTL'],
+                    max_bytes=app.config['RUN_CACHE_MAX_BYTES'])
+
+# Size the project grader's own sandbox pool and its result cache
+project_grader.configure(size=app.config['GRADER_WORKERS'], test_seconds=app.config['GRADER_TEST_SECONDS'],
+                         max_batch=app.config['GRADER_MAX_BATCH'], max_queue=app.config['GRADER_MAX_QUEUE'],
+                         queue_timeout=app.config['GRADER_QUEUE_TIMEOUT'], cpu_seconds=app.config['GRADER_CPU_SECONDS'],
+                         wall_seconds=app.config['GRADER_WALL_SECONDS'], memory_mb=app.config['SANDBOX_MEMORY_MB'])
+grade_cache.configure(max_entries=app.config['GRADE_CACHE_SIZE'], ttl=app.config['GRADE_CACHE_TTL'])
+
+# Size the bcrypt executor used by the login paths; stored hashes are upgraded to BCRYPT_ROUNDS on login
+password_hasher.configure(workers=app.config['BCRYPT_WORKERS'], max_queue=app.config['BCRYPT_MAX_QUEUE'],
+                          queue_timeout=app.config['BCRYPT_QUEUE_TIMEOUT'], rounds=app.config['BCRYPT_ROUNDS'])
+
 # Initialize flask-migrate
 migrate = Migrate(app, db)
 
 # Initialize the JWT Manager for API calls
 jwt = JWTManager(app)
 
+# Revocations only need to outlive the access tokens they retire
+token_revocations.configure(ttl=app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    '''Refuse access tokens issued before their user's role, scope or password changed'''
+    return token_revocations.is_revoked(jwt_payload)
+
 @app.route('/test_session', methods=['GET'])
 def test_session():
     session['counter'] = session.get('counter', 0) + 1
@@ -77,13 +136,23 @@ def index():
     
     return render_template('index.html', username = username)
     
+def busy_login(error, message='Too many logins at once, please try again in a moment.'):
+    '''503 for a login (or any other password hash) turned away by the password hasher's queue'''
+    app.logger.warning(f"Password hashing rejected: {error}")
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
 @app.route('/login', methods=['POST'])
 def login():
     
     # verify login details
     username = request.form['username']
     password = request.form['password']
-    result = verify(username, password)
+    try:
+        result = verify(username, password, app.logger)
+    except HasherBusy as hb:
+        return busy_login(hb)
     
     if result is True:
         
@@ -141,6 +210,9 @@ def get_user_profile():
     Notes:
         - Returns entire student assignment dictionary
         - Returns entire xp history
+        - Supports conditional GET: 304 with no body when If-None-Match matches the ETag, which
+          tracks the user's data (XP, assignments, profile) and not the cursor
+        - Returns the first page of XP after the cursor - see /xp_sync for the remaining pages
     
     '''
     
@@ -148,12 +220,18 @@ def get_user_profile():
     username = session.get('username')
     user_id = session.get('user_id')
     
-    # get the last fetched datetime and xpUsername from request
-    last_fetched_datetime = request.args.get('lastUpdate')
+    # get the xp cursor (or legacy last fetched datetime), page size and xpUsername from request
+    xp_cursor = request.args.get('cursor') or request.args.get('lastUpdate')
+    xp_limit = request.args.get('limit', type=int)
     xp_username = request.args.get('xpUsername')
     
+    # Nothing to send if the client's copy is still current
+    etag = fetch_profile_etag(user_id, xp_username, username)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+    
     # Get the xp history update for the user
-    xp_data = fetch_xp_data(xp_username, last_fetched_datetime, app.logger)
+    xp_data = fetch_xp_data(xp_username, xp_cursor, app.logger, xp_limit)
     
     # Get the content and curriculum assignments for the user
     user_assignments, curriculum_order_map = fetch_user_assignments(user_id, app.logger)
@@ -178,7 +256,9 @@ def get_user_profile():
     
         # organize the response dictionary
         response.update({'xpData': xp_data['xpData'],
-                         'xpLastFetchedDatetime': xp_data['mostRecentDatetime']
+                         'xpLastFetchedDatetime': xp_data['mostRecentDatetime'],
+                         'xpNextCursor': xp_data['nextCursor'],
+                         'xpHasMore': xp_data['hasMore']
         })
 
         # Return the XP data to the client (or None if no data)
@@ -188,14 +268,11 @@ def get_user_profile():
             "username": username
         }
 
-        return Response(
-            json.dumps(full_response, ensure_ascii=False, default=str),
-            mimetype='application/json'
-        )
+        return with_etag(jsonify(full_response), etag)
     
     else:
 
-        return jsonify({"data": response, "message": "No new XP Data", "username": username})
+        return with_etag(jsonify({"data": response, "message": "No new XP Data", "username": username}), etag)
     
 @app.route('/get_student_profile', methods=['GET', 'POST'])
 def get_student_profile():
@@ -205,6 +282,9 @@ def get_student_profile():
     Notes:
         - Returns entire student assignment dictionary
         - Returns entire xp history
+        - Supports conditional GET: 304 with no body when If-None-Match matches the ETag, which
+          tracks the user's data (XP, assignments, profile) and not the cursor
+        - Returns the first page of XP after the cursor - see /xp_sync for the remaining pages
     
     '''
     
@@ -212,22 +292,30 @@ def get_student_profile():
     username = session.get('username')
     user_id = session.get('user_id')
     
-    # get the last fetched datetime and xpUsername from request
-    last_fetched_datetime = request.args.get('lastUpdate')
+    # get the xp cursor (or legacy last fetched datetime), page size and xpUsername from request
+    xp_cursor = request.args.get('cursor') or request.args.get('lastUpdate')
+    xp_limit = request.args.get('limit', type=int)
     xp_username = request.args.get('xpUsername')
     
     # Fetch the user_id for xp_username
     student_id = fetch_student_id(xp_username)
     
+    # Get the current curriculum - it is part of the response so it is part of the ETag
+    current_curriculum = fetch_current_curriculum(xp_username)
+    
+    # Nothing to send if the client's copy is still current
+    etag = fetch_profile_etag(student_id, xp_username, current_curriculum)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+    
     # Get the xp history update for the user
-    xp_data = fetch_xp_data(xp_username, last_fetched_datetime, app.logger)
+    xp_data = fetch_xp_data(xp_username, xp_cursor, app.logger, xp_limit)
     app.logger.debug(f"User XP Data: {xp_data}")
     
     # Get the content and curriculum assignments for the user
     user_assignments, curriculum_order_map = fetch_user_assignments(student_id, app.logger)
     
-    # Get the current curriculum and content
-    current_curriculum = fetch_current_curriculum(xp_username)
+    # Get the current content
     current_content = next((content for content, currics in user_assignments.items()
                     if current_curriculum in currics), None)
         
@@ -242,15 +330,132 @@ def get_student_profile():
     
         # organize the response dictionary
         response.update({'xpData': xp_data['xpData'],
-                         'xpLastFetchedDatetime': xp_data['mostRecentDatetime']
+                         'xpLastFetchedDatetime': xp_data['mostRecentDatetime'],
+                         'xpNextCursor': xp_data['nextCursor'],
+                         'xpHasMore': xp_data['hasMore']
         })
 
         # Return the XP data to the client (or None if no data)
-        return jsonify({"data": response, "message": "XP data found", "student": xp_username})
+        return with_etag(jsonify({"data": response, "message": "XP data found", "student": xp_username}), etag)
     
     else:
 
-        return jsonify({"data": response, "message": "No new XP Data", "student": xp_username})
+        return with_etag(jsonify({"data": response, "message": "No new XP Data", "student": xp_username}), etag)
+
+@app.route('/xp_sync', methods=['GET'])
+def xp_sync():
+    '''
+    Returns one page of XP history after a cursor
+    
+    Notes:
+        - Query args: xpUsername, cursor (from xpNextCursor), optional limit
+        - Students may only sync their own XP, teachers only their own students'
+    
+    '''
+    
+    username = session.get('username')
+    if username is None:
+        return jsonify({'error': 'Please log in again'}), 403
+    
+    xp_username = request.args.get('xpUsername') or username
+    if xp_username != username and xp_username not in fetch_visible_user_ids([xp_username]):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    xp_data = fetch_xp_data(xp_username, request.args.get('cursor'), app.logger, request.args.get('limit', type=int))
+    
+    if not xp_data:
+        return jsonify({'xpData': [], 'xpHasMore': False}), 200
+    
+    return jsonify({'xpData': xp_data['xpData'],
+                    'xpLastFetchedDatetime': xp_data['mostRecentDatetime'],
+                    'xpNextCursor': xp_data['nextCursor'],
+                    'xpHasMore': xp_data['hasMore']}), 200
+
+@app.route('/xp_summary', methods=['GET'])
+def xp_summary():
+    '''
+    Returns the precomputed dashboard summaries for a user
+
+    Notes:
+        - Query args: optional xpUsername (teachers only see their own students)
+        - Built from the XP rollup tables and the user's assignments, not the raw XP history
+        - Supports conditional GET with the same ETag inputs as /get_user_profile
+
+    '''
+
+    username = session.get('username')
+    if username is None:
+        return jsonify({'error': 'Please log in again'}), 403
+
+    xp_username = request.args.get('xpUsername') or username
+
+    try:
+        if xp_username == username:
+            student_id = session.get('user_id')
+        else:
+            student_id = fetch_visible_user_ids([xp_username]).get(xp_username)
+            if student_id is None:
+                return jsonify({'error': 'Unauthorized access'}), 403
+
+        etag = fetch_profile_etag(student_id, xp_username, 'summary')
+        if etag in request.if_none_match:
+            return not_modified(etag)
+
+        summary = fetch_xp_summary(student_id)
+        summary['xpUsername'] = xp_username
+
+        return with_etag(jsonify(summary), etag)
+
+    except HTTPException as e:
+        return jsonify({'error': e.description}), e.code
+
+    except Exception as e:
+        app.logger.error(f"Error building XP summary for {xp_username}: {e}")
+        return jsonify({'error': 'Unable to build XP summary'}), 500
+
+@app.route('/get_student_profiles', methods=['POST'])
+def get_student_profiles():
+    '''
+    Handles request for many student profiles at once for teacher views
+    
+    Notes:
+        - Body: {"usernames": [...]} or {"classroom": class_code}, optional "lastUpdate"
+        - Returns the same data as /get_student_profile keyed by username
+        - Teachers only receive students enrolled in their classrooms
+    
+    '''
+    
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    data = request.get_json() or {}
+    last_fetched_datetime = data.get('lastUpdate') or "1970-01-01"
+    
+    try:
+        if data.get('classroom'):
+            usernames = fetch_classroom_usernames(data['classroom'], app.logger)
+        else:
+            requested = data.get('usernames') or []
+            if not isinstance(requested, list):
+                return jsonify({'error': "'usernames' must be a list"}), 400
+            visible = fetch_visible_user_ids(requested)
+            usernames = [username for username in requested if username in visible]
+        
+        if len(usernames) > STUDENT_PROFILE_BATCH_LIMIT:
+            return jsonify({'error': f'At most {STUDENT_PROFILE_BATCH_LIMIT} students per request'}), 400
+        
+        profiles = fetch_student_profiles(usernames, last_fetched_datetime, app.logger)
+        return jsonify({"data": profiles, "message": f"{len(profiles)} profiles found"}), 200
+    
+    except HTTPException as e:
+        return jsonify({'error': str(e)}), e.code
+    
+    except ValueError as ve:
+        return jsonify({'error': f'Invalid lastUpdate: {ve}'}), 400
+    
+    except Exception as e:
+        app.logger.error(f"Error in /get_student_profiles: {e}")
+        return jsonify({'error': 'Internal Server Error'}), 500
 
 @app.route('/get_task_tags', methods=['GET'])
 def get_task_tags():
@@ -309,13 +514,15 @@ def add_new_user():
     data = request.get_json()
 
     new_username = data.get('new_username')
-    new_password = hashit(data.get('new_password'))
     new_email = data.get('new_email')
 
     try:
         # Create the new user using the extracted data
+        new_password = hashit(data.get('new_password'))
         new_user = create_new_user(new_username, new_password, new_email)
         return jsonify({"message": "User added successfully", "success": True})
+    except HasherBusy as hb:
+        return busy_login(hb, 'The server is busy, please try adding the user again in a moment.')
     except Exception as e:
         app.logger.error(f"Error creating user: {e}")
         return jsonify({"message": str(e), "success": False})
@@ -375,6 +582,31 @@ def get_users():
     except Exception as e:
         return jsonify({'error': 'Internal Server Error'}), 500
 
+@app.route('/user_directory', methods=['GET'])
+def user_directory():
+    '''
+    Responds with one page of the usernames the admin can see, for the user_data.html typeahead
+    
+    Query parameters: prefix, limit, cursor (the nextCursor of the previous page)
+    '''
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    prefix = request.args.get('prefix', '')
+    cursor = request.args.get('cursor') or None
+    limit = request.args.get('limit', app.config['DIRECTORY_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['DIRECTORY_MAX_PAGE_SIZE']))
+    
+    try:
+        return jsonify(fetch_user_directory(prefix, limit, cursor)), 200
+    
+    except HTTPException as e:
+        return jsonify({'error': str(e)}), e.code
+    
+    except Exception as e:
+        app.logger.error(f"User directory failed: {e}")
+        return jsonify({'error': 'Internal Server Error'}), 500
+
 @app.route('/get_user_data', methods=['GET'])
 def get_user_data():
     '''Route to fetch user data'''
@@ -409,6 +641,9 @@ def update_user():
         try:
             update_user_data(username, changes, app.logger)
             return jsonify({'message': 'User data updated successfully'}), 200
+        except HasherBusy as hb:
+            # Raised before anything is written, so the whole update can be retried
+            return busy_login(hb, 'The server is busy, please try updating the user again in a moment.')
         except Exception as e:
             app.logger.debug(f"Error updating user data for {username}: {e}")
             return jsonify({'message': 'Error updating user data'}), 500
@@ -430,13 +665,11 @@ def task_request():
     
     # Determine if the task is a Question or a Project
     
-    # Use the fetch_question function to retrieve the question data
-    question_data = fetch_question(question_id, app.logger)
+    # Use the fetch_question_json function to retrieve the serialized question data
+    question_json = fetch_question_json(question_id, app.logger)
     
     # Respond to the request by returning the data as a json
-    response = jsonify(question_data)
-    response.headers['Content-Type'] = 'application/json; charset=UTF-8'
-    return response
+    return Response(question_json, content_type='application/json; charset=UTF-8')
 
 @app.route('/get_curriculum', methods=['POST'])
 def get_curriculum():
@@ -453,7 +686,7 @@ def get_curriculum():
         curriculum_data = fetch_curriculum_task_list(curriculum_id)
         return jsonify(curriculum_data)
         
-    except IntegrityError as ie:
+    except (IntegrityError, ValueError) as ie:
         return jsonify({"error": f"Curriculum ID not found: {ie}"}), 404
     
     except Exception as e:
@@ -461,22 +694,100 @@ def get_curriculum():
 
 @app.route('/run_code', methods=['POST'])
 def run_code():
-    '''Function to execute code from the CodeMirror'''
+    '''
+    Function to execute code from the CodeMirror
+    
+    Notes:
+        - Runs in the warm sandbox pool with CPU, memory and wall-clock limits (modules.sandbox)
+        - Deterministic snippets are answered from the result cache without running (modules.sandbox.run_snippet)
+        - 503 with Retry-After when the run queue is full
+    '''
     
     # Extract the code
     data = request.get_json()
     code = data.get('code', '')
     
     try:
-        # Run the code with subprocess
-        result = subprocess.run(['python', '-c', code], capture_output=True, text=True)
-        output = result.stdout if result.returncode == 0 else result.stderr
+        # Run the code in a sandbox worker, or reuse the output of an identical deterministic snippet
+        result = run_snippet(code)
+        output = result['stdout'] if result['returncode'] == 0 else result['stderr']
+    
+    except SandboxBusy as sb:
+        app.logger.warning(f"/run_code rejected: {sb}")
+        response = jsonify({'output': 'Error: the code runner is busy, please try again in a moment.'})
+        response.headers['Retry-After'] = '2'
+        return response, 503
     
     except Exception as e:
         output = str(e)
         
     return jsonify({'output': output})
 
+@app.route('/grade_project', methods=['POST'])
+@login_required
+def grade_project():
+    '''
+    Route to grade the caller's code against a project's tests
+    
+    Notes:
+        - Expects {"task_key": Projects.task_key, "code": source}
+        - Returns the grade with per-test status and timing (modules.grading)
+        - 400 when the body is not JSON with a task_key and a string code
+        - 503 with Retry-After when the grading queue is full
+    '''
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not data.get('task_key') or not isinstance(data.get('code', ''), str):
+        return jsonify({'error': 'Expected a JSON body with task_key and code'}), 400
+    
+    try:
+        test = fetch_project_test(data.get('task_key'), app.logger)
+        grade = project_grader.grade(data.get('code', ''), test)
+    
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 404
+    
+    except SandboxBusy as sb:
+        app.logger.warning(f"/grade_project rejected: {sb}")
+        response = jsonify({'error': 'The grader is busy, please try again in a moment.'})
+        response.headers['Retry-After'] = '2'
+        return response, 503
+    
+    return jsonify(grade), 200
+
+@app.route('/grade_projects', methods=['POST'])
+def grade_projects():
+    '''
+    Route for admins to grade a classroom's project submissions in one batch
+    
+    Notes:
+        - Expects {"task_key": Projects.task_key, "submissions": [{"username": str, "code": str}, ...]}
+        - Submissions are graded in parallel across the grader's worker processes
+        - 400 when the body is not JSON with a task_key, or submissions is malformed
+    '''
+    
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not data.get('task_key'):
+        return jsonify({'error': 'Expected a JSON body with task_key and submissions'}), 400
+    submissions = data.get('submissions') or []
+    
+    try:
+        test = fetch_project_test(data.get('task_key'), app.logger)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 404
+    
+    try:
+        batch = project_grader.grade_batch(submissions, test)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    
+    app.logger.info(f"Graded {batch['graded']} submissions of {data.get('task_key')} "
+                    f"({batch['grades_per_second']:.1f}/s, {batch['cached']} cached)")
+    return jsonify({'task_key': data.get('task_key'), **batch}), 200
+
 @app.route('/manage_classrooms', methods=['GET'])
 def manage_classrooms():
     '''Route to draw the manage_classrooms page'''
@@ -631,6 +942,26 @@ def submit_question():
         app.logger.error(f"Error in /submit_question: {e}")
         return jsonify({"error": "An unexpected error occurred."}), 500
 
+@app.route('/curriculum_bundle/<curriculum_id>', methods=['GET'])
+def curriculum_bundle(curriculum_id):
+    '''
+    Route to get a curriculum's task list and every question payload in one response
+    
+    Notes:
+        - The ETag is the curriculum content hash, so a revalidation is a 304 until a question
+          or the task list changes
+        - The body is gzip encoded for clients that accept it
+    '''
+    try:
+        body, version = fetch_curriculum_bundle(curriculum_id, app.logger)
+    except ValueError as ve:
+        return jsonify({"error": f"Curriculum ID not found: {ve}"}), 404
+    
+    if version in request.if_none_match:
+        return not_modified(version)
+    
+    return with_etag(compressed_response(body), version)
+
 @app.route('/question_content', methods=['POST'])
 def question_content():
     '''This function gets a question for the testprep page'''
@@ -639,13 +970,11 @@ def question_content():
     data = request.get_json()
     question_id = data.get('questionKey')  # formerly .lower()
     
-    # Create a question object that retrieves the question data as an attribute
-    question_data = fetch_question(question_id, app.logger)
+    # Retrieve the serialized question data (cached by task_key)
+    question_json = fetch_question_json(question_id, app.logger)
     
     # Respond to the request by returning the data as a json
-    response = jsonify(question_data)
-    response.headers['Content-Type'] = 'application/json; charset=UTF-8'
-    return response
+    return Response(question_json, content_type='application/json; charset=UTF-8')
 
 @app.route('/new_classroom', methods=['POST'])
 def new_classroom():
@@ -745,7 +1074,16 @@ def remove_from_classroom():
         
 @app.route('/update_xp', methods=['POST'])
 def update_xp():
-    '''Route to get xp updates and post to the database'''
+    '''
+    Route to get xp updates and post to the database
+    
+    Notes:
+        - Body is one XP event, a list of events or {"events": [...]}
+        - Events carry an optional client event_id so retries are never double counted
+        - 200 means the valid events are committed (group committed with other requests' events);
+          malformed events are listed in "rejected" by event_id and must not be resent
+        - 503 means nothing was stored and the events must be resent
+    '''
     
     try:
     
@@ -753,10 +1091,13 @@ def update_xp():
         xp_data = request.get_json()
         
         # Call call the data helper function to update the database
-        update_xp_data(xp_data, app.logger)
+        accepted, rejected = update_xp_data(xp_data, app.logger)
         
         # Return a sucess response for testing
-        return jsonify({"status": "success", "message": "XP Data Received"}), 200
+        return jsonify({"status": "success", "message": "XP Data Stored", "accepted": accepted, "rejected": rejected}), 200
+    
+    except HTTPException as e:
+        return jsonify({"status": "error", "message": e.description}), e.code
     
     except Exception as e:
         return jsonify({"status": "error", "message":str(e)}), 500
@@ -790,6 +1131,21 @@ def student_assignments():
     except Exception as e:
         return jsonify({'error': f"Unexpected Error: {e}"}), 500
 
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    '''Route to report cache, XP buffer, compression, sandbox, grader, password, role, token, roster and ACL counters for system admins'''
+    
+    if session.get('role') != 'system':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    return jsonify({'assignments': assignment_cache.stats(), 'catalog': catalog.stats(),
+                    'questions': question_cache.stats(), 'xp_buffer': xp_buffer.stats(),
+                    'compression': gzip_middleware.stats(), 'sandbox': sandbox_pool.stats(),
+                    'run_cache': run_cache.stats(), 'grader': project_grader.stats(),
+                    'passwords': password_hasher.stats(), 'admin_roles': admin_roles.stats(),
+                    'tokens': token_revocations.stats(), 'rosters': roster_cache.stats(),
+                    'acl': visibility_index.stats()}), 200
+
 # API Routes ------------------------------------------------------------------------------#
 
 @app.route('/api/login', methods=['POST'])
@@ -798,12 +1154,17 @@ def api_login():
     username = data.get('username')
     password = data.get('password')
 
-    result = verify(username, password)
+    try:
+        result = verify(username, password, app.logger)
+    except HasherBusy as hb:
+        return busy_login(hb)
 
     if result is not True:
         return jsonify({"msg": result}), 401
 
-    access_token = create_access_token(identity=username)
+    # Sign the user_id, role and classroom scope into the token so API calls skip the database
+    claims = {**fetch_api_claims(username, app.logger), **token_revocations.claims()}
+    access_token = create_access_token(identity=username, additional_claims=claims)
     return jsonify(access_token=access_token)
 
 
@@ -811,7 +1172,7 @@ def api_login():
 @jwt_required()
 def authenticator():
     current_user = get_jwt_identity()
-    build_session(current_user)
+    build_api_session(current_user, get_jwt(), app.logger)
     role = session.get("role", "unknown")
 
     return jsonify(message=f"Hello, {current_user}. You are authenticated as a {role}."), 200
@@ -820,12 +1181,14 @@ def authenticator():
 @jwt_required()
 def classrooms_api():
     current_user = get_jwt_identity()
-    build_session(current_user)
-    classrooms = fetch_classrooms()
-    sections = {}
-    for classroom in classrooms:
-        students = fetch_classroom_data(classroom)['usernames']
-        sections.update({classroom:students})
+    claims = get_jwt()
+    build_api_session(current_user, claims, app.logger)
+    
+    # Teachers' classrooms are in the token; system admin see every classroom
+    classrooms = claims['classrooms'] if isinstance(claims.get('classrooms'), list) else fetch_classrooms(app.logger)
+    
+    # Every section's roster from one joined query (or the roster cache)
+    sections = {code: roster['usernames'] for code, roster in fetch_rosters(classrooms, app.logger).items()}
 
 
     app.logger.debug(f"Sections: {sections}")
@@ -835,63 +1198,82 @@ def classrooms_api():
 @app.route('/api/xp_for_teacher', methods=['GET'])
 @jwt_required()
 def xp_for_teacher():
+    '''
+    Streams the XP history of the caller's students
+    
+    Notes:
+        - Query args: since (ISO datetime, exclusive), classroom (Classroom.code),
+          format ("ndjson" default, one record per line, "json" for a single array, or "csv")
+        - Rows are written as they are read from a server-side cursor, so memory stays flat
+    '''
     current_user = get_jwt_identity()
-    build_session(current_user)
-
-    all_xp = fetch_student_xp_for_teacher(app.logger)
-
-    app.logger.debug(f"XP for teacher: {all_xp}")
+    build_api_session(current_user, get_jwt(), app.logger)
 
-    return jsonify(all_xp), 200
+    try:
+        records = fetch_student_xp_for_teacher(request.args.get('since'), request.args.get('classroom'), app.logger)
+        columns = ['username', *XP_RECORD_FIELDS]
+        return stream_export(records, columns, request.args.get('format', 'ndjson'))
+    except HTTPException as e:
+        return jsonify({'error': e.description}), e.code
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 
 @app.route('/api/export_user_assignments/<user_id>', methods=['GET'])
+@jwt_required()
 def export_user_assignments(user_id):
-    app.logger.debug(f"User ID: {type(user_id)}")
-    user_assignments, _ = fetch_user_assignments(int(user_id), app.logger)
-
-    rows = []
-    for content, curriculums in user_assignments.items():
-        for curriculum, questions in curriculums.items():
-            for q in questions:
-                rows.append({
-                    "content": content,
-                    "curriculum": curriculum,
-                    "task_key": q["task_key"],
-                    "difficulty": q["difficulty"],
-                    "standard": q["standard"],
-                    "objective": q["objective"],
-                    "tags": q["tags"]
-                })
-
-    return jsonify(rows)
+    '''
+    Streams a user's assigned questions
+    
+    Notes:
+        - Query args: content, curriculum (comma separated filters), columns (comma separated),
+          format ("json" default, "jsonl" or "csv")
+        - The caller must be the user, a system admin or one of the user's teachers
+    '''
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return jsonify({"error": "Invalid user_id"}), 400
+
+    try:
+        build_api_session(get_jwt_identity(), get_jwt(), app.logger)
+        check_user_access(user_id, app.logger)
+        columns = parse_export_columns(request.args.get('columns'), ASSIGNMENT_EXPORT_COLUMNS)
+        rows = export_user_assignment_rows(user_id, request.args.get('content'), request.args.get('curriculum'), columns)
+        return stream_export(rows, columns, request.args.get('format', 'json'), f"user_{user_id}_assignments")
+    except HTTPException as e:
+        return jsonify({"error": e.description}), e.code
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/api/export_user_xp/<user_id>', methods=['GET'])
+@jwt_required()
 def export_user_xp(user_id):
+    '''
+    Streams a user's XP history, oldest first
+    
+    Notes:
+        - Query args: start, end (ISO dates, start inclusive, end exclusive), content, curriculum
+          (comma separated filters), columns (comma separated), format ("json" default, "jsonl" or "csv")
+        - Read in yield_per chunks and written as it is read, so memory stays flat for any history size
+        - The caller must be the user, a system admin or one of the user's teachers
+    '''
     try:
         user_id = int(user_id)
     except ValueError:
         return jsonify({"error": "Invalid user_id"}), 400
 
-    xp_records = XP.query.filter_by(user_id=user_id).order_by(XP.timestamp).all()
-
-    results = []
-    for record in xp_records:
-        results.append({
-            "question_id": record.question_id,
-            "content_id": record.content_id,
-            "curriculum_id": record.curriculum_id,
-            "dXP": record.dXP,
-            "possible_xp": record.possible_xp,
-            "difficulty": record.difficulty,
-            "standard": record.standard,
-            "objective": record.objective,
-            "tags": record.tags,  # This may render as a list in Excel Power Query
-            "elapsed_time": record.elapsed_time,
-            "timestamp": record.timestamp.isoformat()
-        })
-
-    return jsonify(results)
+    try:
+        build_api_session(get_jwt_identity(), get_jwt(), app.logger)
+        check_user_access(user_id, app.logger)
+        columns = parse_export_columns(request.args.get('columns'), XP_EXPORT_COLUMNS)
+        rows = export_user_xp_rows(user_id, request.args.get('start'), request.args.get('end'),
+                                   request.args.get('content'), request.args.get('curriculum'), columns)
+        return stream_export(rows, columns, request.args.get('format', 'json'), f"user_{user_id}_xp")
+    except HTTPException as e:
+        return jsonify({"error": e.description}), e.code
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/api/export_tags', methods=['GET', 'POST'])
 def export_tags():
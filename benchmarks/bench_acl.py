@@ -0,0 +1,67 @@
+'''
+Benchmark: teacher -> student authorization checks
+
+Seeds a school (5000 students by default), then answers "may this teacher see this student?" and
+"which content may this teacher assign?" the original way (the three-way join of enrolled usernames
+that fetch_usernames/delete_user ran per call, the Content creator query of fetch_classroom_data)
+and through modules.acl.visibility_index with a warm index.
+
+Usage: python -m benchmarks.bench_acl [users] [checks]
+'''
+
+# Import packages
+import sys
+from modules.models import *
+from modules.acl import visibility_index
+from modules.catalog import catalog
+from modules.roles import admin_roles
+from benchmarks.bench_helpers import make_app, seed_school, QueryCounter, timer, summarize
+
+def legacy_can_view(teacher_id, username):
+    '''The original membership test: every enrolled username of the teacher, then `in`'''
+    students = db.session.query(User.username).\
+        join(ClassroomUser, ClassroomUser.user_id == User.id).\
+        join(Classroom, Classroom.id == ClassroomUser.classroom_id).\
+        filter(Classroom.admin_id == teacher_id).\
+        all()
+    return username in sorted(row[0] for row in students)
+
+def legacy_visible_content(teacher_id, system_ids):
+    return [row[0] for row in Content.query
+            .filter((Content.creator_id == teacher_id) | (Content.creator_id.in_(system_ids)))
+            .with_entities(Content.content_id).all()]
+
+def measure(name, check, cases):
+    samples, counts = [], []
+    for case in cases:
+        with QueryCounter(db.engine) as counter, timer(samples):
+            check(*case)
+        counts.append(counter.count)
+    stats = summarize(samples)
+    print(f"{name:<26}{max(counts):>12}{stats['p50']:>10.3f}{stats['p99']:>10.3f}")
+
+def run(users=5000, checks=200):
+    bench_app = make_app()
+
+    with bench_app.app_context():
+        school = seed_school(users=users, teachers=20, sections_per_teacher=8, xp_per_user=1)
+        teacher_id = school['teacher_ids'][0]
+        usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(school['student_ids'])).all())
+        cases = [(teacher_id, student_id) for student_id in school['student_ids'][:checks]]
+        system_ids = admin_roles.system_ids()
+
+        for teacher, student in cases:
+            assert legacy_can_view(teacher, usernames[student]) == visibility_index.can_view(teacher, student)
+        assert sorted(legacy_visible_content(teacher_id, system_ids)) == sorted(visibility_index.visible_content(teacher_id))
+
+        print(f"{users} students, {checks} checks for a teacher with {len(visibility_index.students(teacher_id))} students")
+        print(f"{'path':<26}{'statements':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        measure('legacy can_view', lambda teacher, student: legacy_can_view(teacher, usernames[student]), cases)
+        measure('index can_view', visibility_index.can_view, cases)
+        measure('legacy visible_content', lambda teacher, _: legacy_visible_content(teacher, system_ids), cases)
+        catalog.snapshot()
+        measure('index visible_content', lambda teacher, _: visibility_index.visible_content(teacher), cases)
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
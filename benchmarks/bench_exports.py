@@ -0,0 +1,80 @@
+'''
+Benchmark: peak memory and time of the streaming user XP export
+
+Seeds one user with growing XP histories and drains /api/export_user_xp in every format
+through the Flask test client, recording the tracemalloc peak while the response streams.
+The peak should stay flat as the history grows; the legacy export (every ORM row loaded
+and jsonify'd in one list) is measured alongside for comparison.
+
+Usage: python -m benchmarks.bench_exports [max_rows]
+'''
+
+# Import packages
+import sys, time, tracemalloc
+from flask import jsonify
+from sqlalchemy import insert
+from modules.models import *
+from modules.app_helpers import stream_export
+from modules.data_helpers import export_user_xp_rows, parse_export_columns, XP_EXPORT_COLUMNS
+from benchmarks.bench_helpers import make_app, make_xp_rows
+
+def legacy_export(user_id):
+    '''The original export, kept here as the baseline'''
+    xp_records = XP.query.filter_by(user_id=user_id).order_by(XP.timestamp).all()
+    return jsonify([{
+        "question_id": record.question_id,
+        "content_id": record.content_id,
+        "curriculum_id": record.curriculum_id,
+        "dXP": record.dXP,
+        "possible_xp": record.possible_xp,
+        "difficulty": record.difficulty,
+        "standard": record.standard,
+        "objective": record.objective,
+        "tags": record.tags,
+        "elapsed_time": record.elapsed_time,
+        "timestamp": record.timestamp.isoformat()
+    } for record in xp_records])
+
+def streaming_export(user_id, fmt):
+    columns = parse_export_columns(None, XP_EXPORT_COLUMNS)
+    return stream_export(export_user_xp_rows(user_id, columns=columns), columns, fmt)
+
+def measure(app, make_response):
+    '''Drain a response inside a request context and return (peak MiB, seconds, bytes)'''
+    with app.test_request_context():
+        db.session.expire_all()
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in make_response().response)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.session.remove()
+    return peak / 2**20, elapsed, size
+
+def run(max_rows=160000):
+    app = make_app()
+    with app.app_context():
+        user = User(username='export_user', password_hash=b'x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    print(f"{'rows':>8}{'export':>10}{'peak MiB':>11}{'seconds':>10}{'MiB out':>10}")
+    loaded = 0
+    rows = 10000
+    while rows <= max_rows:
+        with app.app_context():
+            db.session.execute(insert(XP), make_xp_rows([user_id], rows - loaded, ['q000001', 'q000002'], seed=rows))
+            db.session.commit()
+        loaded = rows
+
+        exports = [('legacy', lambda: legacy_export(user_id))]
+        exports += [(fmt, lambda fmt=fmt: streaming_export(user_id, fmt)) for fmt in ('json', 'jsonl', 'csv')]
+        for name, make_response in exports:
+            peak, elapsed, size = measure(app, make_response)
+            print(f"{rows:>8}{name:>10}{peak:>11.1f}{elapsed:>10.2f}{size / 2**20:>10.1f}")
+        rows *= 4
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 160000)
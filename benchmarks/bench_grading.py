@@ -0,0 +1,60 @@
+'''
+Benchmark: batch grading of a classroom's project submissions (modules.grading)
+
+Grades `students` distinct submissions against a small test suite with a grader of 1 worker and
+one of `workers` workers (each grade is a fresh sandbox child, so the gain comes from running
+grades on several worker processes at once), then regrades the same batch to show the
+(code hash, test hash) cache.
+
+Usage: python -m benchmarks.bench_grading [students] [workers]
+'''
+
+# Import packages
+import sys
+from modules.cache import RunResultCache
+from modules.grading import ProjectGrader
+
+TEST = '''
+import unittest
+
+def test_small():
+    assert fib(10) == 55
+
+def test_larger():
+    assert fib(25) == 75025
+
+def test_sequence():
+    assert [fib(n) for n in range(8)] == [0, 1, 1, 2, 3, 5, 8, 13]
+
+class TestEdges(unittest.TestCase):
+    def test_zero(self):
+        self.assertEqual(fib(0), 0)
+'''
+
+def submission(n):
+    '''Working recursive fib, with every tenth student off by one'''
+    base = "n" if n % 10 else "n + 1"
+    return f"# student {n}\ndef fib(n):\n    if n < 2:\n        return {base}\n    return fib(n - 1) + fib(n - 2)\n"
+
+def run(students=120, workers=4):
+    submissions = [{'username': f'student{n:05d}', 'code': submission(n)} for n in range(students)]
+
+    print(f"{students} submissions, {TEST.count('def test_')} tests each")
+    print(f"{'grader':<22}{'grades/s':>10}{'seconds':>10}{'cached':>8}")
+    for size in (1, workers):
+        grader = ProjectGrader(size=size, max_queue=students, queue_timeout=120, wall_seconds=30, cpu_seconds=10)
+        cache = RunResultCache()
+        grader.grade("", "", cache=RunResultCache())
+        for label in (f'{size} worker(s)', f'{size} worker(s), regrade'):
+            batch = grader.grade_batch(submissions, TEST, cache=cache)
+            print(f"{label:<22}{batch['grades_per_second']:>10.1f}{batch['seconds']:>10.2f}{batch['cached']:>8}")
+        grader.shutdown()
+
+    scores = [result['score'] for result in batch['results']]
+    test_ms = sorted(test['ms'] for result in batch['results'] for test in result['tests'])
+    print(f"mean score {sum(scores) / len(scores):.2f}, per-test p50 {test_ms[len(test_ms) // 2]:.2f} ms, "
+          f"max {test_ms[-1]:.2f} ms")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,238 @@
+'''
+Shared helpers for the benchmark scripts
+
+Notes:
+    - Benchmarks run against a throwaway database so they never touch db.sqlite
+    - Set BENCH_DATABASE_URL to benchmark against another database (e.g. a Postgres scratch db)
+    - Run scripts from the repo root, e.g. python -m benchmarks.bench_user_assignments
+'''
+
+# Import packages
+import os, random, statistics, tempfile, time
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from flask import Flask
+from sqlalchemy import event, insert
+from modules.models import *
+
+####################################################################################
+#### App / Database ################################################################
+####################################################################################
+
+def make_app(engine_options=None):
+    '''Create a minimal Flask app bound to a scratch database (engine_options go to SQLAlchemy)'''
+    
+    db_url = os.getenv('BENCH_DATABASE_URL')
+    if not db_url:
+        handle, path = tempfile.mkstemp(prefix='mps_bench_', suffix='.sqlite')
+        os.close(handle)
+        db_url = f'sqlite:///{path}'
+    
+    bench_app = Flask(__name__)
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+    bench_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    bench_app.config['SECRET_KEY'] = 'bench'
+    if engine_options:
+        bench_app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    db.init_app(bench_app)
+    
+    with bench_app.app_context():
+        db.drop_all()
+        db.create_all()
+    
+    return bench_app
+
+class QueryCounter:
+    '''Counts the SQL statements sent to the database inside a with block'''
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _callback(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._callback)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._callback)
+
+@contextmanager
+def timer(samples):
+    '''Append the elapsed milliseconds of the with block to samples'''
+    start = time.perf_counter()
+    yield
+    samples.append((time.perf_counter() - start) * 1000)
+
+def summarize(samples):
+    '''Return p50/p99/mean in milliseconds for a list of samples'''
+    ordered = sorted(samples)
+    p99_index = min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))
+    return {
+        'p50': statistics.median(ordered),
+        'p99': ordered[p99_index],
+        'mean': statistics.fmean(ordered)
+    }
+
+####################################################################################
+#### Synthetic Data ################################################################
+####################################################################################
+
+TAGS = ['loops', 'strings', 'lists', 'dicts', 'functions', 'classes', 'exceptions', 'files']
+
+# Assignment tree sizes: content areas, curriculums per content, questions per curriculum,
+# custom curriculums per student
+TREE_SIZES = {
+    'small': (2, 3, 5, 1),
+    'medium': (6, 7, 10, 3),
+    'large': (12, 12, 20, 6)
+}
+
+def seed_assignment_tree(size='medium', students=30, classrooms=1, seed=42):
+    '''
+    Seed a teacher, classrooms, students and a content -> curriculum -> question tree
+    
+    Returns: dict with the ids of the created teacher, classrooms and students
+    '''
+    rng = random.Random(seed)
+    n_content, n_curriculums, n_questions, n_custom = TREE_SIZES[size]
+    
+    teacher = User(username='bench_teacher', email='bench_teacher@example.com', password_hash=b'x',
+                   current_curriculum='', current_question='')
+    db.session.add(teacher)
+    db.session.flush()
+    db.session.add(Admin(id=teacher.id, role='teacher'))
+    
+    rooms = [Classroom(code=f'bench{c}', name=f'Bench {c}', admin_id=teacher.id) for c in range(classrooms)]
+    db.session.add_all(rooms)
+    
+    students_rows = [User(username=f'student{s:05d}', email=f'student{s:05d}@example.com', password_hash=b'x',
+                          current_curriculum='', current_question='') for s in range(students)]
+    db.session.add_all(students_rows)
+    db.session.flush()
+    
+    for s, student in enumerate(students_rows):
+        db.session.add(ClassroomUser(classroom_id=rooms[s % classrooms].id, user_id=student.id))
+    
+    contents = [Content(content_id=f'content{c}', creator_id=teacher.id) for c in range(n_content)]
+    db.session.add_all(contents)
+    db.session.flush()
+    
+    for room in rooms:
+        for content in contents:
+            db.session.add(ClassroomContent(classroom_id=room.id, content_id=content.id))
+    
+    question_number = 0
+    custom_curriculums = []
+    for content in contents + [None]:
+        for k in range(n_custom if content is None else n_curriculums):
+            curriculum = Curriculum(curriculum_id=f'{content.content_id if content else "custom"}_curric{k}',
+                                    creator_id=teacher.id)
+            db.session.add(curriculum)
+            db.session.flush()
+            if content is None:
+                custom_curriculums.append(curriculum)
+            else:
+                db.session.add(ContentCurriculum(content_id=content.id, curriculum_id=curriculum.id))
+            for q in range(n_questions):
+                question = Questions(task_key=f'q{question_number:06d}', content_id=content.content_id if content else '',
+                                     standard=rng.randint(1, 4), objective=rng.randint(1, 6),
+                                     difficulty=float(rng.randint(1, 9)), tags=rng.sample(TAGS, 2),
+                                     question='?', answer='a', creator_id=teacher.id)
+                db.session.add(question)
+                db.session.flush()
+                db.session.add(CurriculumQuestion(curriculum_id=curriculum.id, question_id=question.id))
+                question_number += 1
+    
+    for student in students_rows:
+        for curriculum in custom_curriculums:
+            db.session.add(UserCurriculum(user_id=student.id, curriculum_id=curriculum.id))
+    
+    db.session.commit()
+    
+    return {
+        'teacher_id': teacher.id,
+        'classroom_ids': [room.id for room in rooms],
+        'student_ids': [student.id for student in students_rows]
+    }
+
+def make_xp_rows(user_ids, rows_per_user, task_keys, seed=7):
+    '''Build a list of XP row dicts spread over the last two years'''
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=730)
+    rows = []
+    for user_id in user_ids:
+        for _ in range(rows_per_user):
+            difficulty = float(rng.randint(1, 9))
+            correct = rng.random() < 0.7
+            rows.append({
+                'user_id': user_id,
+                'dXP': difficulty / 3 if correct else (difficulty - 3) / 3,
+                'possible_xp': difficulty / 3,
+                'question_id': rng.choice(task_keys),
+                'content_id': 'content0',
+                'curriculum_id': 'content0_curric0',
+                'difficulty': difficulty,
+                'standard': rng.randint(1, 4),
+                'objective': rng.randint(1, 6),
+                'tags': rng.sample(TAGS, 2),
+                'elapsed_time': rng.uniform(3, 90),
+                'timestamp': start + timedelta(seconds=rng.randint(0, 730 * 86400))
+            })
+    return rows
+
+def seed_school(users=5000, teachers=20, sections_per_teacher=8, xp_per_user=50, size='medium', seed=11):
+    '''
+    Seed a whole school with bulk inserts: one content tree, teachers with sections,
+    students spread over the sections and an XP history for every student
+    
+    Returns: dict with teacher ids, classroom codes by teacher and student ids
+    '''
+    rng = random.Random(seed)
+    tree = seed_assignment_tree(size, students=0)
+    content_ids = [row[0] for row in db.session.query(Content.id).all()]
+    task_keys = [row[0] for row in db.session.query(Questions.task_key).all()]
+    
+    db.session.execute(insert(User), [
+        {'username': f'teacher{t:03d}', 'email': f'teacher{t:03d}@example.com', 'password_hash': b'x',
+         'current_curriculum': '', 'current_question': ''} for t in range(teachers)])
+    teacher_ids = [row[0] for row in db.session.query(User.id).filter(User.username.like('teacher%')).order_by(User.id).all()]
+    db.session.execute(insert(Admin), [{'id': teacher_id, 'role': 'teacher'} for teacher_id in teacher_ids])
+    
+    db.session.execute(insert(Classroom), [
+        {'code': f't{t:03d}s{k}', 'name': f'Section {k}', 'admin_id': teacher_id}
+        for t, teacher_id in enumerate(teacher_ids) for k in range(sections_per_teacher)])
+    classrooms = db.session.query(Classroom.id, Classroom.code, Classroom.admin_id).filter(Classroom.code.like('t%s%')).all()
+    
+    db.session.execute(insert(ClassroomContent), [
+        {'classroom_id': room.id, 'content_id': content_id} for room in classrooms for content_id in content_ids])
+    
+    db.session.execute(insert(User), [
+        {'username': f'student{s:05d}', 'email': f'student{s:05d}@example.com', 'password_hash': b'x',
+         'current_curriculum': '', 'current_question': ''} for s in range(users)])
+    student_ids = [row[0] for row in db.session.query(User.id).filter(User.username.like('student%')).order_by(User.id).all()]
+    
+    db.session.execute(insert(ClassroomUser), [
+        {'classroom_id': classrooms[s % len(classrooms)].id, 'user_id': student_id}
+        for s, student_id in enumerate(student_ids)])
+    
+    for start in range(0, len(student_ids), 500):
+        db.session.execute(insert(XP), make_xp_rows(student_ids[start:start + 500], xp_per_user, task_keys, rng.random()))
+    
+    db.session.commit()
+    
+    classroom_codes = {}
+    for room in classrooms:
+        classroom_codes.setdefault(room.admin_id, []).append(room.code)
+    
+    return {
+        'teacher_ids': teacher_ids,
+        'classroom_codes': classroom_codes,
+        'student_ids': student_ids,
+        'task_keys': task_keys,
+        'tree': tree
+    }
@@ -0,0 +1,78 @@
+'''
+Benchmark: JSON encoding of a /get_user_profile response with a 20k row xpData history
+
+Compares the two encoders the routes used before (json.dumps(default=str) in /get_user_profile
+and Flask's default jsonify provider) with modules.serialization on each of its backends
+(orjson when installed, the standard library fallback otherwise). Decoding is timed too, since
+request.get_json and the caches go through the same module.
+
+Usage: python -m benchmarks.bench_json [rows] [repeats]
+'''
+
+# Import packages
+import json, sys, time
+from types import SimpleNamespace
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import modules.serialization as serialization
+from modules.data_helpers import xp_record
+from benchmarks.bench_helpers import make_xp_rows
+
+def make_profile(rows):
+    '''A /get_user_profile body: assignments plus a page of xp_record dictionaries'''
+    xp_data = [xp_record(SimpleNamespace(**row)) for row in make_xp_rows([1], rows, [f'q{n:06d}' for n in range(300)])]
+    return {
+        "data": {
+            "userAssignments": {"content0": {"content0_curric0": [{"task_key": f"q{n:06d}", "difficulty": 3.0,
+                                                                   "standard": 1, "objective": 2, "tags": ["loops"]}
+                                                                  for n in range(300)]}},
+            "curriculumOrderMap": {"content0": ["content0_curric0"]},
+            "xpUsername": "student00000",
+            "xpData": xp_data,
+            "xpLastFetchedDatetime": xp_data[-1]["timestamp"].isoformat(),
+            "xpNextCursor": None,
+            "xpHasMore": False
+        },
+        "message": "XP data found",
+        "username": "student00000"
+    }
+
+def best_of(fn, repeats):
+    '''Fastest of repeats runs in ms, and the last result'''
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), result
+
+def run(rows=20000, repeats=10):
+    profile = make_profile(rows)
+    flask_json = DefaultJSONProvider(Flask(__name__))
+    orjson = serialization.orjson
+
+    encoders = [
+        ('json.dumps(default=str)', lambda: json.dumps(profile, ensure_ascii=False, default=str).encode('utf-8')),
+        ('flask jsonify provider', lambda: flask_json.dumps(profile).encode('utf-8')),
+    ]
+    serialization.orjson = None
+    stdlib_body = serialization.encode(profile)
+    encoders.append(('serialization (json)', lambda: serialization.encode(profile)))
+    if orjson:
+        encoders.append(('serialization (orjson)', lambda: serialization.encode(profile)))
+
+    print(f"{rows} xpData rows, best of {repeats}")
+    print(f"{'encoder':<26}{'encode ms':>11}{'decode ms':>11}{'KiB':>9}")
+    for name, encode in encoders:
+        serialization.orjson = orjson if name == 'serialization (orjson)' else None
+        encode_ms, body = best_of(encode, repeats)
+        decode_ms, _ = best_of(lambda: serialization.loads(body), repeats)
+        print(f"{name:<26}{encode_ms:>11.1f}{decode_ms:>11.1f}{len(body) / 1024:>9.0f}")
+
+    # Both backends must produce the same document
+    assert json.loads(serialization.encode(profile)) == json.loads(stdlib_body)
+    serialization.orjson = orjson
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,83 @@
+'''
+Benchmark: SQL statements and time per /login
+
+Seeds a school, then runs the login pipeline (verify, build_session,
+initialize_user_sessionStorage_data) for students in a request context, counting the statements
+sent to the database. The original build_session/initialize_user_sessionStorage_data queries are
+replayed for comparison. Fails when the lean path sends more than LOGIN_MAX_STATEMENTS statements
+per login once the admin role index is warm.
+
+Usage: python -m benchmarks.bench_login_queries [users] [logins]
+'''
+
+# Import packages
+import sys
+import bcrypt
+from flask import session
+from modules.models import *
+from modules.data_helpers import verify, build_session, initialize_user_sessionStorage_data
+from modules.passwords import password_hasher
+from modules.roles import admin_roles
+from benchmarks.bench_helpers import make_app, seed_school, QueryCounter, timer, summarize
+
+# verify (user row), build_session (user.id), initialize_user_sessionStorage_data (3 columns)
+LOGIN_MAX_STATEMENTS = 3
+
+def legacy_login(username):
+    '''The queries build_session and initialize_user_sessionStorage_data used to run'''
+    user = User.query.filter_by(username=username).first()
+    Admin.query.filter_by(id=user.id).first()
+    [record.id for record in Admin.query.all() if record.role == 'system']
+    classrooms = {c.classroom_id for c in ClassroomUser.query.with_entities(ClassroomUser.classroom_id).filter_by(user_id=user.id)}
+    content = {c.content_id for c in ClassroomContent.query.with_entities(ClassroomContent.content_id)
+               .filter(ClassroomContent.classroom_id.in_(classrooms))} if classrooms else set()
+    content |= {c.content_id for c in UserContent.query.with_entities(UserContent.content_id).filter_by(user_id=user.id)}
+    Content.query.with_entities(Content.content_id).filter(Content.id.in_(content)).all()
+    curriculums = {c.curriculum_id for c in ContentCurriculum.query.with_entities(ContentCurriculum.curriculum_id)
+                   .filter(ContentCurriculum.content_id.in_(content))} if content else set()
+    curriculums |= {c.curriculum_id for c in UserCurriculum.query.with_entities(UserCurriculum.curriculum_id).filter_by(user_id=user.id)}
+    Curriculum.query.with_entities(Curriculum.curriculum_id).filter(Curriculum.id.in_(curriculums)).all()
+    User.query.filter_by(id=user.id).first()
+
+def lean_login(username):
+    assert verify(username, 'pw') is True
+    build_session(username)
+    initialize_user_sessionStorage_data()
+
+def run(users=2000, logins=200):
+    bench_app = make_app()
+    password_hasher.configure(rounds=4)
+
+    with bench_app.app_context():
+        school = seed_school(users=users, teachers=max(1, users // 250), xp_per_user=1)
+        db.session.execute(db.update(User).values(password_hash=bcrypt.hashpw(b'pw', bcrypt.gensalt(4))))
+        db.session.execute(db.update(Admin).where(Admin.id == school['teacher_ids'][0]).values(role='system'))
+        db.session.commit()
+        usernames = [username for (username,) in db.session.query(User.username)
+                     .filter(User.id.in_(school['student_ids'][:logins]))]
+
+        print(f"{users} users, {len(usernames)} logins")
+        print(f"{'path':<10}{'statements/login':>18}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, login in (('legacy', lambda username: (verify(username, 'pw'), legacy_login(username))),
+                            ('lean', lean_login)):
+            with bench_app.test_request_context():
+                login(usernames[0])
+            samples, counts = [], []
+            for username in usernames:
+                db.session.expunge_all()
+                with bench_app.test_request_context(), QueryCounter(db.engine) as counter, timer(samples):
+                    login(username)
+                counts.append(counter.count)
+            stats = summarize(samples)
+            print(f"{name:<10}{max(counts):>18}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+
+        with bench_app.test_request_context():
+            lean_login(usernames[-1])
+            assert session['system_ids'] == [school['teacher_ids'][0]], session['system_ids']
+        assert max(counts) <= LOGIN_MAX_STATEMENTS, f"lean login sent {max(counts)} statements"
+        print(f"lean login within {LOGIN_MAX_STATEMENTS} statements; admin role index reloads: "
+              f"{admin_roles.stats()['reloads']}")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
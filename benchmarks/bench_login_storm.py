@@ -0,0 +1,67 @@
+'''
+Benchmark: a class logging in at the bell
+
+Runs `logins` simultaneous password checks two ways: bcrypt.checkpw straight in each request thread
+(the original verify()) and through modules.passwords.PasswordHasher (a bounded executor of
+`workers` threads). While the storm runs, a probe thread stands in for the other requests on the
+worker and times a small piece of Python work every 10 ms.
+
+Usage: python -m benchmarks.bench_login_storm [logins] [workers] [rounds]
+'''
+
+# Import packages
+import sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from modules.passwords import PasswordHasher
+from benchmarks.bench_helpers import timer, summarize
+
+def probe(stop, samples):
+    '''A cheap request: build and sort a small list'''
+    while not stop.is_set():
+        with timer(samples):
+            sorted(str(n) for n in range(2000))
+        time.sleep(0.01)
+
+def storm(check, logins, hashed):
+    barrier = threading.Barrier(logins)
+
+    def login(_):
+        barrier.wait()
+        samples = []
+        with timer(samples):
+            assert check(b'pw', hashed)
+        return samples[0]
+
+    stop, probe_samples = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(stop, probe_samples))
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(logins) as pool:
+        latencies = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    return elapsed, latencies, probe_samples
+
+def run(logins=200, workers=4, rounds=10):
+    hashed = bcrypt.hashpw(b'pw', bcrypt.gensalt(rounds))
+    hasher = PasswordHasher(workers=workers, max_queue=logins, queue_timeout=600, rounds=rounds)
+
+    print(f"{logins} simultaneous logins, bcrypt cost {rounds}, executor of {workers} threads")
+    print(f"{'path':<12}{'logins/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'probe p50':>11}{'probe p99':>11}")
+    paths = (('inline', bcrypt.checkpw), ('executor', lambda password, hashed: hasher.check('pw', hashed)))
+    for name, check in paths:
+        elapsed, latencies, probes = storm(check, logins, hashed)
+        stats, probe_stats = summarize(latencies), summarize(probes)
+        print(f"{name:<12}{logins / elapsed:>10.1f}{stats['p50']:>10.1f}{stats['p99']:>10.1f}"
+              f"{probe_stats['p50']:>11.2f}{probe_stats['p99']:>11.2f}")
+
+    stats = hasher.stats()
+    print(f"executor queue wait p50 {stats['queue_wait_ms']['p50']:.1f} ms, p99 {stats['queue_wait_ms']['p99']:.1f} ms; "
+          f"hash p50 {stats['hash_ms']['p50']:.1f} ms; peak pending {stats['peak_pending']}")
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
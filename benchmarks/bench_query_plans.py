@@ -0,0 +1,122 @@
+'''
+Benchmark: query plans and timings for the hot queries, before and after the index pack
+
+Seeds a large synthetic school, drops the indexes added by migration 5b7e3c1d9a42,
+captures EXPLAIN output and timings for the hot data_helpers queries, then creates the
+indexes and captures them again.
+
+Usage: python -m benchmarks.bench_query_plans [users] [xp_per_user] [repeats]
+'''
+
+# Import packages
+import sys
+from sqlalchemy import select, union, func, or_, and_
+from modules.models import *
+from benchmarks.bench_helpers import make_app, seed_school, timer, summarize
+
+# Indexes added by migrations/versions/5b7e3c1d9a42_add_index_pack_for_xp_and_join_tables.py
+INDEX_PACK = {
+    'uq_classroom_user_user_id_classroom_id',
+    'uq_classroom_content_classroom_id_content_id',
+    'uq_user_content_user_id_content_id',
+    'uq_user_curriculum_user_id_curriculum_id',
+    'ix_xp_user_id_timestamp_id',
+    'ix_classroom_user_classroom_id',
+    'ix_classroom_admin_id',
+    'ix_curriculum_question_curriculum_id',
+    'ix_content_curriculum_content_id',
+}
+
+def pack_indexes():
+    return [index for table in db.metadata.tables.values() for index in table.indexes if index.name in INDEX_PACK]
+
+def hot_queries(school):
+    '''(name, statement) pairs mirroring the queries in modules.data_helpers'''
+    student_id = school['student_ids'][len(school['student_ids']) // 2]
+    student_name = db.session.get(User, student_id).username
+    section = school['student_ids'][:30]
+    teacher_id = school['teacher_ids'][0]
+    class_code = school['classroom_codes'][teacher_id][0]
+    last_timestamp = db.session.query(func.min(XP.timestamp)).filter(XP.user_id == student_id).scalar()
+
+    return [
+        ('fetch_xp_data page', select(XP.id, XP.dXP, XP.timestamp)
+            .join(User, User.id == XP.user_id)
+            .where(User.username == student_name,
+                   or_(XP.timestamp > last_timestamp, and_(XP.timestamp == last_timestamp, XP.id > 0)))
+            .order_by(XP.timestamp, XP.id).limit(1001)),
+        ('fetch_profile_etag', select(func.max(XP.timestamp), func.max(XP.id))
+            .join(User, User.id == XP.user_id).where(User.username == student_name)),
+        ('fetch_xp_data_for_users', select(XP.user_id, XP.dXP, XP.timestamp)
+            .where(XP.user_id.in_(section), XP.timestamp > last_timestamp)
+            .order_by(XP.user_id, XP.timestamp, XP.id)),
+        ('fetch_assignment_ids_for_users', union(
+            select(ClassroomUser.user_id, ClassroomContent.content_id)
+                .join(ClassroomContent, ClassroomContent.classroom_id == ClassroomUser.classroom_id)
+                .where(ClassroomUser.user_id.in_(section)),
+            select(UserContent.user_id, UserContent.content_id).where(UserContent.user_id.in_(section)))),
+        ('custom curriculums', select(UserCurriculum.user_id, UserCurriculum.curriculum_id)
+            .where(UserCurriculum.user_id.in_(section)).order_by(UserCurriculum.id)),
+        ('teacher students', select(User.username)
+            .join(ClassroomUser, ClassroomUser.user_id == User.id)
+            .join(Classroom, Classroom.id == ClassroomUser.classroom_id)
+            .where(Classroom.admin_id == teacher_id)),
+        ('classroom roster', select(User.username)
+            .join(ClassroomUser, ClassroomUser.user_id == User.id)
+            .join(Classroom, Classroom.id == ClassroomUser.classroom_id)
+            .where(Classroom.code == class_code)),
+        ('classroom members', select(ClassroomUser.user_id)
+            .where(ClassroomUser.classroom_id == select(Classroom.id).where(Classroom.code == class_code).scalar_subquery())),
+    ]
+
+def explain(statement):
+    '''Return the EXPLAIN output for a statement as a list of lines'''
+    engine = db.engine
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={'render_postcompile': True})
+    if engine.dialect.name == 'sqlite':
+        prefix, params = 'EXPLAIN QUERY PLAN ', tuple(compiled.params[key] for key in compiled.positiontup)
+    else:
+        prefix, params = 'EXPLAIN ANALYZE ', compiled.params
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + str(compiled), params).all()
+    return [' '.join(str(col) for col in row) for row in rows]
+
+def capture(queries, repeats):
+    results = {}
+    for name, statement in queries:
+        samples = []
+        for _ in range(repeats):
+            with timer(samples):
+                db.session.execute(statement).all()
+        results[name] = (summarize(samples), explain(statement))
+    return results
+
+def run(users=5000, xp_per_user=100, repeats=20):
+    app = make_app()
+    with app.app_context():
+        print(f"Seeding {users} students with {xp_per_user} XP rows each ...")
+        school = seed_school(users=users, xp_per_user=xp_per_user)
+        queries = hot_queries(school)
+
+        for index in pack_indexes():
+            index.drop(db.engine)
+        before = capture(queries, repeats)
+
+        for index in pack_indexes():
+            index.create(db.engine)
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+        after = capture(queries, repeats)
+
+        for name, _ in queries:
+            print(f"\n=== {name}: p50 {before[name][0]['p50']:.2f} ms -> {after[name][0]['p50']:.2f} ms")
+            print("  before:")
+            for line in before[name][1]:
+                print(f"    {line}")
+            print("  after:")
+            for line in after[name][1]:
+                print(f"    {line}")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,60 @@
+'''
+Benchmark: /api/classrooms roster fan-out for a teacher with 8 sections
+
+Seeds a school (5000 students by default), then builds one teacher's {section: usernames} map
+three ways: the original per-classroom fetch_classroom_data lookup (ClassroomUser rows plus every
+User row, filtered in Python), modules.data_helpers.fetch_rosters with the roster cache off (one
+joined query), and fetch_rosters with a warm cache.
+
+Usage: python -m benchmarks.bench_rosters [users] [sections] [repeats]
+'''
+
+# Import packages
+import sys
+from modules.models import *
+from modules.cache import roster_cache
+from modules.data_helpers import CRUDHelper, fetch_rosters
+from benchmarks.bench_helpers import make_app, seed_school, QueryCounter, timer, summarize
+
+def legacy_rosters(class_codes):
+    '''The original classrooms_api loop over fetch_classroom_data'''
+    sections = {}
+    for code in class_codes:
+        classroom = Classroom.query.filter_by(code=code).first()
+        student_ids = [cu.user_id for cu in CRUDHelper(ClassroomUser).read(classroom_id=classroom.id)]
+        students = [student for student in CRUDHelper(User).read() if student.id in student_ids]
+        sections[code] = [student.username for student in students if student.username]
+    return sections
+
+def lean_rosters(class_codes):
+    return {code: roster['usernames'] for code, roster in fetch_rosters(class_codes).items()}
+
+def run(users=5000, sections=8, repeats=20):
+    bench_app = make_app()
+
+    with bench_app.app_context():
+        school = seed_school(users=users, teachers=20, sections_per_teacher=sections, xp_per_user=1)
+        class_codes = school['classroom_codes'][school['teacher_ids'][0]]
+        expected = legacy_rosters(class_codes)
+
+        print(f"{users} students, teacher with {len(class_codes)} sections "
+              f"({sum(len(names) for names in expected.values())} enrolled)")
+        print(f"{'path':<18}{'statements':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        paths = (('legacy', legacy_rosters, 0), ('fetch_rosters', lean_rosters, 0), ('fetch_rosters+cache', lean_rosters, 300))
+        for name, build, ttl in paths:
+            roster_cache.configure(ttl=ttl)
+            roster_cache.invalidate(class_codes)
+            build(class_codes)
+            samples = []
+            for _ in range(repeats):
+                db.session.expunge_all()
+                with QueryCounter(db.engine) as counter, timer(samples):
+                    sections_map = build(class_codes)
+            assert {code: sorted(names) for code, names in sections_map.items()} == \
+                   {code: sorted(names) for code, names in expected.items()}
+            stats = summarize(samples)
+            print(f"{name:<18}{counter.count:>12}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,64 @@
+'''
+Benchmark: /run_code latency for a lab of students clicking Run at once
+
+Compares the original one-interpreter-per-click subprocess.run path with modules.sandbox.SandboxPool
+(warm workers, one fork per run), and the pool behind the run result cache (modules.sandbox.run_snippet)
+with a deterministic version of the snippet that every student shares. Each simulated student runs
+the snippet `runs` times; the pool is sized like a single web worker's config.
+
+Usage: python -m benchmarks.bench_run_code [students] [runs_per_student] [pool_size]
+'''
+
+# Import packages
+import subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from modules.cache import RunResultCache
+from modules.sandbox import SandboxPool, run_snippet
+from benchmarks.bench_helpers import timer, summarize
+
+SNIPPET = "import math, random\nnums = [random.random() for _ in range(1000)]\nprint(round(sum(math.sqrt(n) for n in nums), 2))"
+DETERMINISTIC = "import math\nnums = [n / 1000 for n in range(1000)]\nprint(round(sum(math.sqrt(n) for n in nums), 2))"
+
+def legacy_run(code):
+    '''The original /run_code body'''
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else result.stderr
+
+def measure(run, code, students, runs):
+    def student(_):
+        samples = []
+        for _ in range(runs):
+            with timer(samples):
+                run(code)
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(students) as pool:
+        latencies = [sample for samples in pool.map(student, range(students)) for sample in samples]
+    return time.perf_counter() - start, latencies
+
+def run(students=30, runs=5, pool_size=4):
+    pool = SandboxPool(size=pool_size, max_queue=students, queue_timeout=60)
+    pool.start()
+    pool.run("pass")
+
+    print(f"{students} students x {runs} runs, pool of {pool_size} workers")
+    cache = RunResultCache()
+    paths = (('subprocess', legacy_run, SNIPPET), ('pool', pool.run, SNIPPET),
+             ('pool+cache', lambda code: run_snippet(code, pool, cache), DETERMINISTIC))
+    print(f"{'path':<12}{'runs/s':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, fn, code in paths:
+        elapsed, latencies = measure(fn, code, students, runs)
+        stats = summarize(latencies)
+        print(f"{name:<12}{len(latencies) / elapsed:>9.0f}{stats['p50']:>10.1f}{stats['p99']:>10.1f}")
+
+    stats = pool.stats()
+    print(f"pool queue wait p50 {stats['queue_wait_ms']['p50']:.1f} ms, p99 {stats['queue_wait_ms']['p99']:.1f} ms; "
+          f"run p50 {stats['run_ms']['p50']:.1f} ms")
+    stats = cache.stats()
+    print(f"run cache hits {stats['hits']}, misses {stats['misses']}, coalesced {stats['coalesced']}")
+    pool.shutdown()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
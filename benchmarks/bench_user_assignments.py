@@ -0,0 +1,130 @@
+'''
+Benchmark: fetch_user_assignments query count and latency
+
+Compares the legacy per-content / per-curriculum loader with the uncached loader
+(modules.data_helpers.load_user_assignments, which reads the structure from a warm
+catalog snapshot) for small, medium and large assignment trees and checks that both
+build the same nested dictionary.
+
+Usage: python -m benchmarks.bench_user_assignments [repeats]
+'''
+
+# Import packages
+import sys
+from collections import OrderedDict
+from modules.models import *
+from modules.data_helpers import load_user_assignments
+from modules.catalog import catalog
+from benchmarks.bench_helpers import make_app, seed_assignment_tree, QueryCounter, timer, summarize, TREE_SIZES
+
+def legacy_fetch_user_assignments(user_id):
+    '''The original N+1 loader, kept here as the baseline'''
+    user_content_ids = set()
+
+    classroom_contents = (
+        db.session.query(Content)
+        .join(ClassroomContent, ClassroomContent.content_id == Content.id)
+        .join(Classroom, Classroom.id == ClassroomContent.classroom_id)
+        .join(ClassroomUser, ClassroomUser.classroom_id == Classroom.id)
+        .filter(ClassroomUser.user_id == user_id)
+        .all()
+    )
+    for content in classroom_contents:
+        user_content_ids.add(content.content_id)
+
+    direct_contents = (
+        db.session.query(Content)
+        .join(UserContent, UserContent.content_id == Content.id)
+        .filter(UserContent.user_id == user_id)
+        .all()
+    )
+    for content in direct_contents:
+        user_content_ids.add(content.content_id)
+
+    result = {content_id: OrderedDict() for content_id in user_content_ids}
+
+    for content_id in user_content_ids:
+        content_obj = db.session.query(Content).filter_by(content_id=content_id).first()
+        if not content_obj:
+            continue
+        content_curricula = (
+            db.session.query(Curriculum)
+            .join(ContentCurriculum, ContentCurriculum.curriculum_id == Curriculum.id)
+            .filter(ContentCurriculum.content_id == content_obj.id)
+            .order_by(ContentCurriculum.id)
+            .all()
+        )
+        for curriculum in content_curricula:
+            question_data = (
+                db.session.query(Questions.task_key, Questions.difficulty, Questions.standard, Questions.objective, Questions.tags)
+                .join(CurriculumQuestion, CurriculumQuestion.question_id == Questions.id)
+                .filter(CurriculumQuestion.curriculum_id == curriculum.id)
+                .all()
+            )
+            result[content_id][curriculum.curriculum_id] = [
+                {"task_key": qk, "difficulty": difficulty, "standard": standard, "objective": objective, "tags": tags}
+                for (qk, difficulty, standard, objective, tags) in question_data
+            ]
+
+    custom_curricula = (
+        db.session.query(Curriculum)
+        .join(UserCurriculum, UserCurriculum.curriculum_id == Curriculum.id)
+        .filter(UserCurriculum.user_id == user_id)
+        .all()
+    )
+    custom_dict = OrderedDict()
+    for curriculum in custom_curricula:
+        question_data = (
+            db.session.query(Questions.task_key, Questions.difficulty, Questions.standard, Questions.objective, Questions.tags)
+            .join(CurriculumQuestion, CurriculumQuestion.question_id == Questions.id)
+            .filter(CurriculumQuestion.curriculum_id == curriculum.id)
+            .all()
+        )
+        custom_dict[curriculum.curriculum_id] = [
+            {"task_key": qk, "difficulty": difficulty, "standard": standard, "objective": objective, "tags": tags}
+            for (qk, difficulty, standard, objective, tags) in question_data
+        ]
+    if custom_dict:
+        result["custom"] = custom_dict
+
+    curriculum_order_map = {content: list(currics.keys()) for content, currics in result.items()}
+    return result, curriculum_order_map
+
+def normalize(assignments):
+    '''Sort questions so the comparison ignores row order within a curriculum'''
+    result, order_map = assignments
+    return (
+        {content: {curric: sorted(qs, key=lambda q: q['task_key']) for curric, qs in currics.items()}
+         for content, currics in result.items()},
+        order_map
+    )
+
+def run(repeats=50):
+    print(f"{'tree':<8}{'loader':<12}{'queries':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for size in TREE_SIZES:
+        app = make_app()
+        with app.app_context():
+            ids = seed_assignment_tree(size, students=5)
+            user_id = ids['student_ids'][0]
+            
+            # New database - publish it to the process-wide catalog and warm the snapshot
+            catalog.bump()
+            catalog.snapshot()
+
+            assert normalize(legacy_fetch_user_assignments(user_id)) == normalize(load_user_assignments(user_id)), \
+                f"Loaders disagree for the {size} tree"
+
+            for name, loader in (('legacy', legacy_fetch_user_assignments), ('catalog', load_user_assignments)):
+                with QueryCounter(db.engine) as counter:
+                    loader(user_id)
+                samples = []
+                for _ in range(repeats):
+                    db.session.expire_all()
+                    with timer(samples):
+                        loader(user_id)
+                stats = summarize(samples)
+                print(f"{size:<8}{name:<12}{counter.count:>9}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+            db.session.remove()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,56 @@
+'''
+Benchmark: the user_data.html user picker
+
+Seeds a school (20000 students by default), then compares the original /get_users payload (every
+User row hydrated and sorted, the whole list sent) with one typeahead page of
+modules.data_helpers.fetch_user_directory for a system admin (username index range scan) and a
+teacher (sorted in-memory array, bisect).
+
+Usage: python -m benchmarks.bench_user_directory [users] [repeats]
+'''
+
+# Import packages
+import sys, json
+from flask import session
+from modules.models import *
+from modules.data_helpers import fetch_user_directory
+from modules.acl import visibility_index
+from benchmarks.bench_helpers import make_app, seed_school, QueryCounter, timer, summarize
+
+PREFIXES = ['', 's', 'student0', 'student012', 'student0199', 'teacher']
+
+def legacy_users():
+    '''The original fetch_usernames for system admin'''
+    return sorted([user.username for user in User.query.all()])
+
+def run(users=20000, repeats=20):
+    bench_app = make_app()
+
+    with bench_app.app_context():
+        school = seed_school(users=users, teachers=20, sections_per_teacher=8, xp_per_user=1)
+        teacher_id = school['teacher_ids'][0]
+
+        print(f"{users} students")
+        print(f"{'path':<22}{'statements':>12}{'bytes':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        paths = (('legacy /get_users', 'system', lambda prefix: {'users': legacy_users()}),
+                 ('directory system', 'system', lambda prefix: fetch_user_directory(prefix, 25)),
+                 ('directory teacher', 'teacher', lambda prefix: fetch_user_directory(prefix, 25)))
+        for name, role, fetch in paths:
+            with bench_app.test_request_context():
+                session['role'], session['user_id'] = role, teacher_id
+                visibility_index.clear()
+                fetch('')
+                samples, counts, size = [], [], 0
+                for _ in range(repeats):
+                    for prefix in PREFIXES:
+                        db.session.expunge_all()
+                        with QueryCounter(db.engine) as counter, timer(samples):
+                            page = fetch(prefix)
+                        counts.append(counter.count)
+                        size = max(size, len(json.dumps(page)))
+            stats = summarize(samples)
+            print(f"{name:<22}{max(counts):>12}{size:>10}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,119 @@
+'''
+Benchmark: XP ingestion throughput, one commit per answer vs the group-commit write-behind buffer
+
+Simulates the end of a timed quiz: every student posts their answers at once and a pool of
+request threads (the web server's workers) handles the requests. The single-row path runs
+the pre-batching transaction per answer (insert XP, update rollups, commit). The batched path
+hands each request to modules.xp_buffer.XPWriteBuffer and each request is timed until its
+events are committed. Both paths must leave identical XP and rollup tables.
+
+Usage: python -m benchmarks.bench_xp_ingest [students] [answers_per_student] [request_threads]
+'''
+
+# Import packages
+import sys, time, random
+from concurrent.futures import ThreadPoolExecutor
+from modules.models import *
+from modules.data_helpers import normalize_xp_events
+from modules.rollups import apply_xp_rollups
+from modules.xp_buffer import XPWriteBuffer
+from benchmarks.bench_helpers import make_app, seed_assignment_tree, timer, summarize
+
+def make_requests(student_ids, answers, task_keys, seed=5):
+    '''One /update_xp payload per answer, interleaved across students like a real burst'''
+    rng = random.Random(seed)
+    requests = []
+    for n in range(answers):
+        for user_id in student_ids:
+            difficulty = float(rng.randint(1, 9))
+            requests.append((user_id, {
+                'event_id': f'{user_id}-{n}',
+                'dXP': difficulty / 3 if rng.random() < 0.7 else (difficulty - 3) / 3,
+                'question_id': rng.choice(task_keys),
+                'content_id': 'content0',
+                'curriculum_id': 'content0_curric0',
+                'standard': rng.randint(1, 4),
+                'objective': rng.randint(1, 6),
+                'elapsed_time': rng.uniform(3, 90),
+                'difficulty': difficulty,
+                'possible_xp': difficulty / 3
+            }))
+    return requests
+
+def reset(app):
+    with app.app_context():
+        for model in (XP, XPQuestionRollup, XPCurriculumRollup, XPStandardRollup):
+            db.session.query(model).delete()
+        db.session.commit()
+
+def snapshot(app):
+    '''Order independent view of the XP and rollup tables for comparing the two paths'''
+    with app.app_context():
+        xp = sorted((row.user_id, row.event_id, row.dXP) for row in db.session.query(XP.user_id, XP.event_id, XP.dXP))
+        questions = sorted((row.user_id, row.question_id, row.attempts, round(row.xp, 9))
+                           for row in db.session.query(XPQuestionRollup))
+        return xp, questions
+
+def run_single(app, requests, threads):
+    def handle(request):
+        user_id, payload = request
+        samples = []
+        with timer(samples), app.app_context():
+            entry = XP(**normalize_xp_events(payload, user_id)[0][0])
+            db.session.add(entry)
+            apply_xp_rollups([entry])
+            db.session.commit()
+        return samples[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = list(pool.map(handle, requests))
+    return time.perf_counter() - start, latencies, len(requests)
+
+def run_batched(app, requests, threads, max_batch, max_delay):
+    buffer = XPWriteBuffer()
+    buffer.configure(app, max_batch, max_delay)
+
+    def handle(request):
+        user_id, payload = request
+        samples = []
+        with timer(samples):
+            buffer.write(normalize_xp_events(payload, user_id)[0])
+        return samples[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = list(pool.map(handle, requests))
+    buffer.drain()
+    elapsed = time.perf_counter() - start
+
+    stats = buffer.stats()
+    assert stats['failed'] == 0 and stats['written'] == len(requests), stats
+    return elapsed, latencies, stats['batches']
+
+def run(students=500, answers=10, threads=32, max_batch=250, max_delay=0.05):
+    app = make_app({'connect_args': {'timeout': 120}, 'pool_size': threads, 'max_overflow': 0})
+    with app.app_context():
+        ids = seed_assignment_tree('small', students=students)
+        task_keys = [row[0] for row in db.session.query(Questions.task_key)]
+    requests = make_requests(ids['student_ids'], answers, task_keys)
+
+    print(f"{len(requests)} answers from {students} students, {threads} request threads")
+    print(f"{'path':<10}{'commits':>9}{'events/s':>11}{'p50 ms':>10}{'p99 ms':>10}")
+
+    results = {}
+    for name in ('single', 'batched'):
+        reset(app)
+        if name == 'single':
+            elapsed, latencies, commits = run_single(app, requests, threads)
+        else:
+            elapsed, latencies, commits = run_batched(app, requests, threads, max_batch, max_delay)
+        results[name] = snapshot(app)
+        stats = summarize(latencies)
+        print(f"{name:<10}{commits:>9}{len(requests) / elapsed:>11.0f}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+
+    assert results['single'] == results['batched'], "Paths produced different XP or rollup rows"
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
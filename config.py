@@ -4,6 +4,59 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'fallback-key-for-local-dev')
     DEBUG = False
+    # XP group commit: a lone request is written at once, concurrent ones are grouped until this many
+    # events or this many seconds (0 = write inline);
+    # /update_xp answers 503 if its events are not committed within the timeout
+    XP_BUFFER_MAX_BATCH = 250
+    XP_BUFFER_MAX_DELAY = 0.25
+    XP_BUFFER_COMMIT_TIMEOUT = 10
+    # Serialized questions kept per worker for /task_request and /question_content (LRU)
+    QUESTION_CACHE_SIZE = 1000
+    # Seconds before the cached Admin role index is reloaded even without a version bump
+    ADMIN_ROLES_TTL = 300
+    # Seconds a classroom roster (usernames/emails) stays cached, 0 to always query
+    ROSTER_CACHE_TTL = 300
+    # User directory typeahead: default/maximum page size
+    DIRECTORY_PAGE_SIZE = 25
+    DIRECTORY_MAX_PAGE_SIZE = 100
+    # Seconds a teacher's student set (ACL index) is kept without a version bump
+    ACL_TTL = 300
+    # /api/* access token lifetime in seconds (revoked tokens are remembered this long)
+    JWT_ACCESS_TOKEN_EXPIRES = 900
+    # gzip responses from this many bytes up; hashed static URLs are cached by browsers for this long
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    STATIC_MAX_AGE = 31536000
+    # /run_code sandbox pool (per web worker): warm workers, queue bound and wait, runs before recycling
+    SANDBOX_WORKERS = 4
+    SANDBOX_MAX_QUEUE = 16
+    SANDBOX_QUEUE_TIMEOUT = 10
+    SANDBOX_MAX_RUNS = 200
+    # Per-run limits: CPU seconds, wall-clock seconds, address space MB, bytes kept per output stream
+    SANDBOX_CPU_SECONDS = 5
+    SANDBOX_WALL_SECONDS = 10
+    SANDBOX_MEMORY_MB = 256
+    SANDBOX_MAX_OUTPUT = 65536
+    # Cached /run_code results for deterministic snippets (per web worker): entries, seconds, output bytes
+    RUN_CACHE_SIZE = 2000
+    RUN_CACHE_TTL = 3600
+    RUN_CACHE_MAX_BYTES = 32 * 2**20
+    # Project grader (per web worker): its own sandbox pool, per-test and whole-suite limits, batch size
+    GRADER_WORKERS = 4
+    GRADER_MAX_QUEUE = 32
+    GRADER_QUEUE_TIMEOUT = 60
+    GRADER_TEST_SECONDS = 2
+    GRADER_CPU_SECONDS = 10
+    GRADER_WALL_SECONDS = 30
+    GRADER_MAX_BATCH = 500
+    # Cached grades keyed by (code hash, test hash): entries, seconds
+    GRADE_CACHE_SIZE = 5000
+    GRADE_CACHE_TTL = 86400
+    # bcrypt executor for logins (per web worker): threads, queued checks and wait, and the cost factor
+    BCRYPT_WORKERS = 4
+    BCRYPT_MAX_QUEUE = 256
+    BCRYPT_QUEUE_TIMEOUT = 10
+    BCRYPT_ROUNDS = 12
 
 class DevelopmentConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///db.sqlite'
@@ -0,0 +1,279 @@
+'''
+Export the XP table and the flattened user assignments to date-partitioned Parquet files
+
+Layout under the output directory (Hive style, readable by pandas/pyarrow/duckdb/spark):
+    xp/date=YYYY-MM-DD/part-0.parquet               one partition per UTC day of XP.timestamp
+    assignments/snapshot_date=YYYY-MM-DD/part-0.parquet
+                                                     one (user, content, curriculum, question) row
+                                                     per assigned question, as of the export date
+    _watermark.json                                  last exported XP day and assignment snapshot
+
+Notes:
+    - Re-runs are incremental: only complete days after the XP watermark are exported, and a new
+      assignment snapshot is written once per day. --full ignores the watermark and rewrites everything
+    - XP.timestamp is set by the server when an event is accepted, so a finished day never changes
+      and today's partial day is left for the next run
+    - Partitions are exported in parallel (--workers), each reading --chunk-size rows per round trip
+      and writing one Parquet row group per chunk
+    - Each partition's XP.id range is looked up first, so a partition read is a primary key range scan
+    - Files are written to a temporary name and renamed, and the watermark only advances past days
+      that were all written, so an interrupted run is safe to repeat
+
+Requires pyarrow (pip install pyarrow), which the web application itself does not need.
+
+Usage: python database_to_parquet.py [--out DIR] [--workers N] [--chunk-size ROWS]
+                                     [--compression CODEC] [--until YYYY-MM-DD] [--full]
+'''
+
+# Import packages
+import argparse, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from modules.models import User, XP, db
+from modules.data_helpers import load_assignments_for_users
+from app import app
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Set globals
+output_dir = "data/parquet"
+watermark_file = "_watermark.json"
+assignment_user_batch = 1000
+
+def xp_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("username", pa.string()),
+        ("event_id", pa.string()),
+        ("question_id", pa.string()),
+        ("content_id", pa.string()),
+        ("curriculum_id", pa.string()),
+        ("dXP", pa.float64()),
+        ("possible_xp", pa.float64()),
+        ("difficulty", pa.float64()),
+        ("standard", pa.int32()),
+        ("objective", pa.int32()),
+        ("tags", pa.list_(pa.string())),
+        ("elapsed_time", pa.float64()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+def assignment_schema():
+    return pa.schema([
+        ("user_id", pa.int64()),
+        ("username", pa.string()),
+        ("content", pa.string()),
+        ("curriculum", pa.string()),
+        ("position", pa.int32()),
+        ("task_key", pa.string()),
+        ("difficulty", pa.float64()),
+        ("standard", pa.int32()),
+        ("objective", pa.int32()),
+        ("tags", pa.list_(pa.string())),
+    ])
+
+def tag_list(tags):
+    '''XP / question tags are JSON; keep lists as list<string> and drop anything else'''
+    return [str(tag) for tag in tags] if isinstance(tags, list) else None
+
+####################################################################################
+#### Watermark #####################################################################
+####################################################################################
+
+def read_watermark(out):
+    path = os.path.join(out, watermark_file)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_watermark(out, watermark):
+    path = os.path.join(out, watermark_file)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermark, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+####################################################################################
+#### Partition writers #############################################################
+####################################################################################
+
+def write_partition(path, schema, chunks, compression):
+    '''
+    Write an iterable of column dictionaries to one Parquet file, one row group per chunk
+
+    Returns: number of rows written
+
+    Notes: the file is written under a temporary name and renamed once complete
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = 0
+    with pq.ParquetWriter(path + ".tmp", schema, compression=compression) as writer:
+        for columns in chunks:
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(columns["user_id"])
+    os.replace(path + ".tmp", path)
+    return rows
+
+def xp_partitions(since, until):
+    '''
+    Find the UTC days with XP rows in [since, until)
+
+    Returns: list of (day as date, first XP.id, last XP.id, rows) ordered by day
+    '''
+    day = func.date(XP.timestamp)
+    query = db.session.query(day, func.min(XP.id), func.max(XP.id), func.count(XP.id))
+    if since:
+        query = query.filter(XP.timestamp >= datetime.combine(since, datetime.min.time()))
+    query = query.filter(XP.timestamp < datetime.combine(until, datetime.min.time()))
+
+    # sqlite returns the day as a string, Postgres as a date
+    return sorted(
+        (date.fromisoformat(str(value)[:10]), first_id, last_id, rows)
+        for value, first_id, last_id, rows in query.group_by(day).all()
+    )
+
+def export_xp_partition(out, day, first_id, last_id, chunk_size, compression):
+    '''Export one day of XP rows, chunk_size rows per round trip (run in a worker thread)'''
+    names = [field.name for field in xp_schema()]
+    start = datetime.combine(day, datetime.min.time())
+
+    with app.app_context():
+        query = (
+            db.session.query(XP.id, XP.user_id, User.username, XP.event_id, XP.question_id, XP.content_id,
+                             XP.curriculum_id, XP.dXP, XP.possible_xp, XP.difficulty, XP.standard, XP.objective,
+                             XP.tags, XP.elapsed_time, XP.timestamp)
+            .join(User, User.id == XP.user_id)
+            .filter(XP.id.between(first_id, last_id))
+            .filter(XP.timestamp >= start, XP.timestamp < start + timedelta(days=1))
+            .order_by(XP.id)
+        )
+
+        def chunks():
+            result = db.session.execute(query.statement.execution_options(yield_per=chunk_size))
+            try:
+                for rows in result.partitions(chunk_size):
+                    columns = {name: list(values) for name, values in zip(names, zip(*rows))}
+                    columns["tags"] = [tag_list(tags) for tags in columns["tags"]]
+                    yield columns
+            finally:
+                result.close()
+
+        path = os.path.join(out, "xp", f"date={day.isoformat()}", "part-0.parquet")
+        return write_partition(path, xp_schema(), chunks(), compression)
+
+def export_assignment_snapshot(out, day, chunk_size, compression):
+    '''
+    Export every user's assigned questions as one snapshot partition (run in a worker thread)
+
+    Notes: users are loaded assignment_user_batch at a time with load_assignments_for_users, which costs
+    a fixed number of queries per batch and bypasses the assignment cache so the export does not evict it.
+    Rows are written once chunk_size of them are buffered
+    '''
+    names = [field.name for field in assignment_schema()]
+
+    with app.app_context():
+        users = db.session.query(User.id, User.username).order_by(User.id).all()
+
+        def chunks():
+            rows = []
+            for i in range(0, len(users), assignment_user_batch):
+                batch = dict(users[i:i + assignment_user_batch])
+                for user_id, (user_assignments, _) in load_assignments_for_users(list(batch)).items():
+                    for content, curriculums in user_assignments.items():
+                        for curriculum, questions in curriculums.items():
+                            rows.extend((user_id, batch[user_id], content, curriculum, position, q["task_key"],
+                                         q["difficulty"], q["standard"], q["objective"], tag_list(q["tags"]))
+                                        for position, q in enumerate(questions))
+                while len(rows) >= chunk_size or (rows and i + assignment_user_batch >= len(users)):
+                    chunk, rows = rows[:chunk_size], rows[chunk_size:]
+                    yield {name: list(values) for name, values in zip(names, zip(*chunk))}
+
+        path = os.path.join(out, "assignments", f"snapshot_date={day.isoformat()}", "part-0.parquet")
+        return write_partition(path, assignment_schema(), chunks(), compression)
+
+####################################################################################
+#### Export run ####################################################################
+####################################################################################
+
+def export_to_parquet(out, workers=4, chunk_size=50000, compression="zstd", until=None, full=False):
+    '''
+    Export new XP days and today's assignment snapshot, then advance the watermark
+
+    Arg(s): out as output directory, workers as parallel partition writers, chunk_size as rows per
+            read / row group, compression as Parquet codec, until as exclusive last XP day
+            (default: today, UTC), full as bool to ignore the watermark
+
+    Returns: dictionary of export counts
+    '''
+    today = datetime.utcnow().date()
+    until = until or today
+    os.makedirs(out, exist_ok=True)
+    watermark = {} if full else read_watermark(out)
+    since = date.fromisoformat(watermark["xp"]) + timedelta(days=1) if watermark.get("xp") else None
+
+    with app.app_context():
+        partitions = xp_partitions(since, until)
+    snapshot = today.isoformat() if watermark.get("assignments") != today.isoformat() else None
+
+    print(f"Exporting {len(partitions)} XP partitions ({sum(p[3] for p in partitions)} rows)"
+          f"{' and an assignment snapshot' if snapshot else ''} to {out}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        assignment_job = pool.submit(export_assignment_snapshot, out, today, chunk_size, compression) if snapshot else None
+        xp_jobs = [(day, pool.submit(export_xp_partition, out, day, first_id, last_id, chunk_size, compression))
+                   for day, first_id, last_id, _ in partitions]
+
+        # Advance the XP watermark through the last day before the first failure
+        exported = failed = xp_rows = 0
+        for day, job in xp_jobs:
+            try:
+                xp_rows += job.result()
+                exported += 1
+                if not failed:
+                    watermark["xp"] = day.isoformat()
+            except Exception as e:
+                failed += 1
+                print(f"Failed to export XP for {day}: {e}")
+
+        # With every partition written the watermark moves up to the cutoff, so quiet days are not rescanned
+        if not failed:
+            watermark["xp"] = max(watermark.get("xp", ""), (until - timedelta(days=1)).isoformat())
+
+        assignment_rows = 0
+        if assignment_job:
+            try:
+                assignment_rows = assignment_job.result()
+                watermark["assignments"] = snapshot
+            except Exception as e:
+                failed += 1
+                print(f"Failed to export the assignment snapshot: {e}")
+
+    write_watermark(out, watermark)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {exported} XP partitions ({xp_rows} rows) and {assignment_rows} assignment rows "
+          f"in {elapsed:.1f}s; watermark {watermark}")
+
+    return {"xp_partitions": exported, "xp_rows": xp_rows, "assignment_rows": assignment_rows, "failed": failed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export XP and user assignments to date-partitioned Parquet")
+    parser.add_argument("--out", default=output_dir, help="output directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=4, help="partitions exported in parallel (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per read and row group (default: %(default)s)")
+    parser.add_argument("--compression", default="zstd", help="Parquet codec: zstd, snappy, gzip, none (default: %(default)s)")
+    parser.add_argument("--until", type=date.fromisoformat, help="export XP days before this date (default: today, UTC)")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and re-export every partition")
+    args = parser.parse_args()
+
+    if pq is None:
+        sys.exit("database_to_parquet.py needs pyarrow: pip install pyarrow")
+
+    result = export_to_parquet(args.out, args.workers, args.chunk_size, args.compression, args.until, args.full)
+    sys.exit(1 if result["failed"] else 0)
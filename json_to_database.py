@@ -1,6 +1,9 @@
 import json
 from sqlalchemy.exc import SQLAlchemyError
 from modules.models import Questions, db
+from modules.catalog import catalog
+from modules.cache import assignment_cache, question_cache
+from modules.data_helpers import fetch_catalog_user_ids
 from app import app
 
 
@@ -12,6 +15,7 @@ def import_questions_from_json(input_file):
         
         # Get the dictionary of questions
         questions_data = data.get("questions", {})
+        updated_ids = []
         
         for task_key, q_data in questions_data.items():
             # Look for an existing question with the same task_key
@@ -19,6 +23,7 @@ def import_questions_from_json(input_file):
             
             if question:
                 # Update the existing record
+                updated_ids.append(question.id)
                 question.code = q_data.get("code")
                 question.question = q_data.get("question")
                 question.answer = q_data.get("answer")
@@ -60,6 +65,9 @@ def import_questions_from_json(input_file):
         
         try:
             db.session.commit()
+            catalog.bump()
+            question_cache.invalidate(questions_data.keys())
+            assignment_cache.invalidate(fetch_catalog_user_ids(question_ids=updated_ids))
             print(f"Imported/Updated {len(questions_data)} questions from {input_file}")
         except SQLAlchemyError as e:
             db.session.rollback()
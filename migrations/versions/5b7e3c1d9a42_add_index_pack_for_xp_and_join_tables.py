@@ -0,0 +1,54 @@
+"""Add index pack for xp and join tables
+
+Revision ID: 5b7e3c1d9a42
+Revises: d429841c9490
+Create Date: 2026-10-18 09:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e3c1d9a42'
+down_revision = 'd429841c9490'
+branch_labels = None
+depends_on = None
+
+# Join tables that get a unique pair index - duplicates are removed first, keeping the oldest row
+UNIQUE_PAIRS = [
+    ('classroom_user', 'uq_classroom_user_user_id_classroom_id', ['user_id', 'classroom_id']),
+    ('classroom_content', 'uq_classroom_content_classroom_id_content_id', ['classroom_id', 'content_id']),
+    ('user_content', 'uq_user_content_user_id_content_id', ['user_id', 'content_id']),
+    ('user_curriculum', 'uq_user_curriculum_user_id_curriculum_id', ['user_id', 'curriculum_id']),
+]
+
+# Plain lookup indexes
+INDEXES = [
+    ('xp', 'ix_xp_user_id_timestamp_id', ['user_id', 'timestamp', 'id']),
+    ('classroom_user', 'ix_classroom_user_classroom_id', ['classroom_id']),
+    ('classroom', 'ix_classroom_admin_id', ['admin_id']),
+    ('curriculum_question', 'ix_curriculum_question_curriculum_id', ['curriculum_id']),
+    ('content_curriculum', 'ix_content_curriculum_content_id', ['content_id']),
+]
+
+
+def upgrade():
+    for table, name, columns in UNIQUE_PAIRS:
+        group_by = ', '.join(columns)
+        op.execute(sa.text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM {table} GROUP BY {group_by}) AS keepers)"
+        ))
+        op.create_index(name, table, columns, unique=True)
+
+    for table, name, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+
+    for table, name, columns in reversed(UNIQUE_PAIRS):
+        op.drop_index(name, table_name=table)
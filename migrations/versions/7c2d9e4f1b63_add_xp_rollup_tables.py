@@ -0,0 +1,78 @@
+"""Add xp rollup tables
+
+Revision ID: 7c2d9e4f1b63
+Revises: 5b7e3c1d9a42
+Create Date: 2026-10-18 11:03:27.904115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d9e4f1b63'
+down_revision = '5b7e3c1d9a42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate with `python rebuild_xp_rollups.py` after upgrading
+    op.create_table('xp_question_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.String(length=120), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('correct', sa.Boolean(), nullable=False),
+    sa.Column('incorrect', sa.Boolean(), nullable=False),
+    sa.Column('performance', sa.Float(), nullable=False),
+    sa.Column('xp', sa.Float(), nullable=False),
+    sa.Column('best_xp', sa.Float(), nullable=True),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('xp_question_rollup', schema=None) as batch_op:
+        batch_op.create_index('uq_xp_question_rollup_user_id_question_id', ['user_id', 'question_id'], unique=True)
+
+    op.create_table('xp_curriculum_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('content_id', sa.String(length=50), nullable=False),
+    sa.Column('curriculum_id', sa.String(length=50), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('xp', sa.Float(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('xp_curriculum_rollup', schema=None) as batch_op:
+        batch_op.create_index('uq_xp_curriculum_rollup_user_content_curriculum', ['user_id', 'content_id', 'curriculum_id'], unique=True)
+
+    op.create_table('xp_standard_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('content_id', sa.String(length=50), nullable=False),
+    sa.Column('standard', sa.Integer(), nullable=False),
+    sa.Column('objective', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('xp', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('xp_standard_rollup', schema=None) as batch_op:
+        batch_op.create_index('uq_xp_standard_rollup_user_content_standard_objective', ['user_id', 'content_id', 'standard', 'objective'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('xp_standard_rollup', schema=None) as batch_op:
+        batch_op.drop_index('uq_xp_standard_rollup_user_content_standard_objective')
+    op.drop_table('xp_standard_rollup')
+
+    with op.batch_alter_table('xp_curriculum_rollup', schema=None) as batch_op:
+        batch_op.drop_index('uq_xp_curriculum_rollup_user_content_curriculum')
+    op.drop_table('xp_curriculum_rollup')
+
+    with op.batch_alter_table('xp_question_rollup', schema=None) as batch_op:
+        batch_op.drop_index('uq_xp_question_rollup_user_id_question_id')
+    op.drop_table('xp_question_rollup')
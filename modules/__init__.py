@@ -1,3 +1,15 @@
 from .data_helpers import *
 from .app_helpers import *
+from .cache import MemoryBackend, RedisBackend, assignment_cache, question_cache, roster_cache, run_cache, grade_cache
+from .catalog import catalog
+from .roles import admin_roles
+from .tokens import token_revocations
+from .acl import visibility_index
+from .rollups import rebuild_xp_rollups
+from .xp_buffer import xp_buffer
+from .serialization import FastJSONProvider
+from .compression import GzipMiddleware, static_assets
+from .sandbox import SandboxBusy, run_snippet, sandbox_pool
+from .grading import project_grader
+from .passwords import HasherBusy, password_hasher
 from .models import db
\ No newline at end of file
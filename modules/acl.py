@@ -0,0 +1,189 @@
+# Import packages
+import logging, threading, time, heapq
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from modules.models import db, User, Classroom, ClassroomUser
+from modules.cache import MemoryBackend
+from modules.catalog import catalog
+from modules.roles import admin_roles
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def directory_page(usernames, user_ids, prefix='', limit=25, cursor=None):
+    '''
+    One page of a sorted username array
+
+    Args:
+        usernames (list): usernames in sorted order
+        user_ids (list): User.id of each username, same order
+        prefix (str): only usernames starting with prefix
+        limit (int): page size
+        cursor (str): the last username of the previous page (None for the first page)
+
+    Returns:
+        {'users': [{'id', 'username'}], 'nextCursor': str or None}
+    '''
+    start = bisect_right(usernames, cursor) if cursor and cursor >= prefix else bisect_left(usernames, prefix)
+    end = bisect_left(usernames, prefix + '\U0010ffff', lo=start) if prefix else len(usernames)
+    stop = min(start + limit, end)
+    users = [{'id': user_ids[i], 'username': usernames[i]} for i in range(start, stop)]
+    return {'users': users, 'nextCursor': usernames[stop - 1] if users and stop < end else None}
+
+class StudentSet:
+    '''
+    The students enrolled in any classroom of one teacher
+
+    Notes:
+        - ids is a frozenset for membership tests, by_username maps username -> User.id
+        - usernames/user_ids are sorted by username for the directory's bisect paging
+    '''
+    __slots__ = ('ids', 'by_username', 'usernames', 'user_ids')
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.usernames = [username for username, _ in rows]
+        self.user_ids = [user_id for _, user_id in rows]
+        self.by_username = dict(rows)
+        self.ids = frozenset(self.user_ids)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+class VisibilityIndex:
+    '''
+    Teacher -> student ACL index and the README's data visibility rules
+
+    Notes:
+        - System admins see every user and all content
+        - Teachers see the students enrolled in their classrooms, the content they created and
+          system created content
+        - Each teacher's StudentSet is built with one column-only query on first use and kept per
+          worker (least recently used dropped past max_teachers, rebuilt after ttl seconds)
+        - Every teacher has a version counter in the shared backend: enrollment changes, username
+          changes and user deletion call invalidate(teacher_ids) and every worker rebuilds that
+          teacher's set on next access. Read errors are logged and force a rebuild
+        - Content visibility is derived from the catalog snapshot (Content.creator_id) and the admin
+          role index, so it follows their versions without a query
+    '''
+    prefix = 'mps:acl:version:'
+
+    def __init__(self, backend=None, ttl=300, max_teachers=256):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.max_teachers = max_teachers
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def configure(self, backend=None, ttl=None, max_teachers=None):
+        '''Swap the version backend and set the limits (called once at app start up)'''
+        if backend is not None:
+            self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+        if max_teachers is not None:
+            self.max_teachers = max_teachers
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def key(self, teacher_id):
+        return f"{self.prefix}{teacher_id}"
+
+    def version(self, teacher_id):
+        try:
+            return int(self.backend.get(self.key(teacher_id)) or 0)
+        except Exception as e:
+            logger.warning(f"ACL version read failed: {e}")
+            return -1
+
+    def invalidate(self, teacher_ids):
+        '''Advance the version of every teacher in teacher_ids so every worker rebuilds their students'''
+        teacher_ids = {teacher_id for teacher_id in teacher_ids if teacher_id is not None}
+        for teacher_id in teacher_ids:
+            try:
+                self.backend.incr(self.key(teacher_id))
+            except Exception as e:
+                logger.error(f"ACL invalidation for teacher {teacher_id} failed: {e}")
+        with self._lock:
+            for teacher_id in teacher_ids:
+                self._entries.pop(teacher_id, None)
+        self.invalidations += len(teacher_ids)
+
+    def load(self, teacher_id):
+        '''StudentSet of teacher_id from one query on ClassroomUser/Classroom'''
+        rows = db.session.query(User.username, User.id).\
+            join(ClassroomUser, ClassroomUser.user_id == User.id).\
+            join(Classroom, Classroom.id == ClassroomUser.classroom_id).\
+            filter(Classroom.admin_id == teacher_id, User.username.isnot(None)).\
+            distinct().\
+            all()
+        return StudentSet(rows)
+
+    def students(self, teacher_id):
+        '''StudentSet of the students enrolled in any classroom of teacher_id'''
+        version = self.version(teacher_id)
+        with self._lock:
+            entry = self._entries.get(teacher_id)
+            if entry is not None and entry[0] == version >= 0 and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(teacher_id)
+                self.hits += 1
+                return entry[2]
+
+        student_set = self.load(teacher_id)
+        with self._lock:
+            self._entries[teacher_id] = (version, time.monotonic(), student_set)
+            self._entries.move_to_end(teacher_id)
+            while len(self._entries) > self.max_teachers:
+                self._entries.popitem(last=False)
+            self.builds += 1
+        return student_set
+
+    def can_view(self, admin_id, student_id, role=None):
+        '''
+        True when admin_id may see student_id's data
+
+        Notes: role is looked up in the admin role index unless the caller already knows it;
+               a user viewing their own data is left to the caller
+        '''
+        role = role or admin_roles.role(admin_id)
+        if role == 'system':
+            return True
+        if role == 'teacher':
+            return student_id in self.students(admin_id).ids
+        return False
+
+    def visible_content(self, admin_id, role=None):
+        '''Content.content_id of the content admin_id may assign, in Content.id order'''
+        role = role or admin_roles.role(admin_id)
+        snapshot = catalog.snapshot()
+        if role == 'system':
+            return list(snapshot.content_keys.values())
+        if role == 'teacher':
+            creators = {admin_id, *admin_roles.system_ids()}
+            return [key for _, key in heapq.merge(*(snapshot.creator_content.get(creator, ()) for creator in creators))]
+        return []
+
+    def page(self, teacher_id, prefix='', limit=25, cursor=None):
+        '''One directory page of a teacher's students (see directory_page)'''
+        student_set = self.students(teacher_id)
+        return directory_page(student_set.usernames, student_set.user_ids, prefix, limit, cursor)
+
+    def stats(self):
+        lookups = self.hits + self.builds
+        return {
+            'teachers': len(self._entries),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'builds': self.builds,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
+
+# Process-wide index - app.py swaps in the Redis backend for production
+visibility_index = VisibilityIndex()
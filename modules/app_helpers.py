@@ -1,7 +1,10 @@
 # Import packages
-import json, os, logging, bcrypt
-from flask import session, redirect, url_for
+import json, os, logging, csv, io, gzip
+from datetime import datetime
+from flask import session, redirect, url_for, request, Response, stream_with_context
 from functools import wraps
+from modules.serialization import dumps
+from modules.passwords import password_hasher
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -12,7 +15,7 @@ users = "https://raw.githubusercontent.com/montanus-wecib/MPS/refs/heads/main/da
 
 def hashit(password):
     '''function to hash+salt a raw password'''
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return password_hasher.hash(password)
     
 # def login_required(f):
 #     """Decorator to check if user is logged in."""
@@ -23,6 +26,89 @@ def hashit(password):
 #         return f(*args, **kwargs)  # Proceed with the original function if logged in
 #     return decorated_function
 
+def not_modified(etag):
+    '''Empty 304 response for a conditional GET whose ETag still matches'''
+    response = Response(status=304)
+    return with_etag(response, etag)
+
+def with_etag(response, etag):
+    '''Attach a strong ETag and force clients to revalidate before reusing the response'''
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def compressed_response(body, mimetype='application/json'):
+    '''Response for a bytes body, gzip encoded when the client accepts it'''
+    response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+# Streaming export formats and their mimetypes
+EXPORT_FORMATS = {'json': 'application/json', 'jsonl': 'application/x-ndjson', 'ndjson': 'application/x-ndjson',
+                  'csv': 'text/csv'}
+
+def csv_value(value):
+    '''Flatten an export value into a CSV cell'''
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def stream_export(records, columns, fmt='json', filename=None, chunk_rows=500):
+    '''
+    Stream an iterable of dictionaries as a JSON array, JSON lines or CSV response
+    
+    Arg(s): records as iterable of dicts, columns as list of keys (CSV header and order),
+            fmt as a key of EXPORT_FORMATS, filename as optional download name,
+            chunk_rows as rows encoded per chunk written to the socket
+    
+    Notes:
+        - Rows are encoded as they are pulled from records, so memory does not grow with the export
+        - Raises ValueError for an unknown format
+    '''
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format {fmt}, expected one of {', '.join(EXPORT_FORMATS)}")
+    
+    def encode(record):
+        return dumps(record)
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(columns)
+        elif fmt == 'json':
+            buffer.write('[')
+        
+        for n, record in enumerate(records):
+            if fmt == 'csv':
+                writer.writerow([csv_value(record.get(column)) for column in columns])
+            elif fmt == 'json':
+                buffer.write((',' if n else '') + encode(record))
+            else:
+                buffer.write(encode(record) + '\n')
+            
+            if n % chunk_rows == chunk_rows - 1:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if fmt == 'json':
+            buffer.write(']')
+        yield buffer.getvalue()
+    
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    if filename:
+        extension = 'jsonl' if fmt == 'ndjson' else fmt
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
 class SourceArgError(Exception):
     def __init__(self, badargs):
         Exception.__init__(self, badargs)
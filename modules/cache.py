@@ -0,0 +1,501 @@
+# Import packages
+import logging, threading, time
+from collections import OrderedDict
+from modules.serialization import dumps, loads
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+####################################################################################
+#### Backends ######################################################################
+####################################################################################
+
+class MemoryBackend:
+    ''' In-process key/value store for development and single worker deployments '''
+    def __init__(self):
+        self._store = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._store.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._store[key]
+                return None
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._store[key] = (value, expires_at)
+
+    def set_many(self, items, ttl=None):
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._store.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires_at = self._store.get(key, (0, None))
+            value = int(value) + 1
+            self._store[key] = (value, expires_at)
+            return value
+
+class RedisBackend:
+    ''' Redis key/value store shared by every worker process in production '''
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return [value.decode('utf-8') if isinstance(value, bytes) else value for value in self.client.mget(keys)]
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl)
+
+    def set_many(self, items, ttl=None):
+        pipe = self.client.pipeline()
+        for key, value in items.items():
+            pipe.set(key, value, ex=ttl)
+        pipe.execute()
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+####################################################################################
+#### Caches ########################################################################
+####################################################################################
+
+class AssignmentCache:
+    '''
+    Materialized fetch_user_assignments results keyed by User.id
+
+    Notes:
+        - Entries are stored as JSON so both backends behave the same way
+        - Write helpers in data_helpers call invalidate() with the affected User.id values, including
+          catalog edits (only the users whose tree contains the edited content, curriculum or question)
+        - Backend errors are logged and treated as a miss so a cache outage never breaks a request
+        - ttl is a safety net for writes made outside the helpers (e.g. import scripts)
+    '''
+    prefix = 'mps:assignments:'
+
+    def __init__(self, backend=None, ttl=3600):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, backend, ttl=None):
+        '''Swap the backend (called once at app start up)'''
+        self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+
+    def key(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    def get(self, user_id):
+        '''Return (user_assignments, curriculum_order_map) or None on a miss'''
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids):
+        '''Return {User.id: (user_assignments, curriculum_order_map)} for the hits only'''
+        user_ids = list(dict.fromkeys(user_ids))
+        try:
+            values = self.backend.get_many([self.key(user_id) for user_id in user_ids])
+        except Exception as e:
+            logger.warning(f"Assignment cache read failed: {e}")
+            values = [None] * len(user_ids)
+
+        hits = {}
+        for user_id, value in zip(user_ids, values):
+            entry = loads(value) if value is not None else None
+            if entry is None:
+                self.misses += 1
+                continue
+            self.hits += 1
+            user_assignments, curriculum_order_map = entry['assignments']
+            hits[user_id] = (user_assignments, curriculum_order_map)
+
+        return hits
+
+    def set(self, user_id, assignments):
+        self.set_many({user_id: assignments})
+
+    def set_many(self, assignments):
+        '''Store {User.id: (user_assignments, curriculum_order_map)}'''
+        try:
+            items = {self.key(user_id): dumps({'assignments': value})
+                     for user_id, value in assignments.items()}
+            self.backend.set_many(items, self.ttl)
+        except Exception as e:
+            logger.warning(f"Assignment cache write failed: {e}")
+
+    def invalidate(self, user_ids):
+        '''Drop the cached assignments for every User.id in user_ids and advance their generation'''
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids:
+            return
+        try:
+            self.backend.delete(*[self.key(user_id) for user_id in user_ids])
+            for user_id in user_ids:
+                self.backend.incr(f"{self.prefix}generation:{user_id}")
+            self.invalidations += len(user_ids)
+        except Exception as e:
+            logger.error(f"Assignment cache invalidation failed: {e}")
+
+    def generation(self, user_id):
+        '''Counter that changes every time the user's assignments are invalidated'''
+        try:
+            return int(self.backend.get(f"{self.prefix}generation:{user_id}") or 0)
+        except Exception as e:
+            logger.warning(f"Assignment generation read failed: {e}")
+            return None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations
+        }
+
+class RosterCache:
+    '''
+    Classroom rosters (enrolled usernames and emails) keyed by Classroom.code
+
+    Notes:
+        - Optional: a ttl of 0 turns it off and every lookup is a miss
+        - Stored as JSON in the shared backend, so one worker's query serves all of them
+        - Enrollment, username/email changes and user deletion call invalidate() with the codes of
+          the affected classrooms; ttl bounds what a read racing one of those writes can leave behind
+        - Backend errors are logged and treated as a miss
+    '''
+    prefix = 'mps:roster:'
+
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, backend=None, ttl=None):
+        '''Swap the backend and/or set the ttl (called once at app start up)'''
+        if backend is not None:
+            self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+
+    def key(self, class_code):
+        return f"{self.prefix}{class_code}"
+
+    def get_many(self, class_codes):
+        '''Return {Classroom.code: {'usernames': [...], 'emails': [...]}} for the hits only'''
+        class_codes = list(dict.fromkeys(class_codes))
+        if not self.ttl:
+            self.misses += len(class_codes)
+            return {}
+        try:
+            values = self.backend.get_many([self.key(code) for code in class_codes])
+        except Exception as e:
+            logger.warning(f"Roster cache read failed: {e}")
+            values = [None] * len(class_codes)
+
+        hits = {code: loads(value) for code, value in zip(class_codes, values) if value is not None}
+        self.hits += len(hits)
+        self.misses += len(class_codes) - len(hits)
+        return hits
+
+    def set_many(self, rosters):
+        if not self.ttl or not rosters:
+            return
+        try:
+            self.backend.set_many({self.key(code): dumps(roster) for code, roster in rosters.items()}, self.ttl)
+        except Exception as e:
+            logger.warning(f"Roster cache write failed: {e}")
+
+    def invalidate(self, class_codes):
+        '''Drop the cached rosters of every Classroom.code in class_codes'''
+        class_codes = {code for code in class_codes if code is not None}
+        if not class_codes:
+            return
+        try:
+            self.backend.delete(*[self.key(code) for code in class_codes])
+            self.invalidations += len(class_codes)
+        except Exception as e:
+            logger.error(f"Roster cache invalidation failed: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations
+        }
+
+class QuestionCache:
+    '''
+    Bounded in-process LRU of serialized question responses keyed by Questions.task_key
+
+    Notes:
+        - Values are the JSON response bytes, so a hit skips the query, the ORM row and serialization
+        - Entries carry the version of their task_key in the shared backend; invalidate() drops the
+          task keys in this worker and advances their versions, so a write in one worker is a miss
+          in all the others without touching any other question
+        - The least recently used entry is evicted once max_entries are held
+    '''
+    prefix = 'mps:question:version:'
+
+    def __init__(self, max_entries=1000, backend=None):
+        self.max_entries = max_entries
+        self.backend = backend or MemoryBackend()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries=None, backend=None):
+        '''Resize the cache and/or swap the version backend (called once at app start up)'''
+        with self._lock:
+            if backend is not None:
+                self.backend = backend
+                self._entries.clear()
+            if max_entries is not None:
+                self.max_entries = max_entries
+            self._evict()
+
+    def versions(self, task_keys):
+        '''{task_key: shared version} for task_keys (-1 for every key when the backend cannot be read)'''
+        task_keys = list(dict.fromkeys(task_keys))
+        try:
+            values = self.backend.get_many([f"{self.prefix}{task_key}" for task_key in task_keys])
+            return {task_key: int(value or 0) for task_key, value in zip(task_keys, values)}
+        except Exception as e:
+            logger.warning(f"Question version read failed: {e}")
+            return {task_key: -1 for task_key in task_keys}
+
+    def get(self, task_key, version=None):
+        '''Return the cached response bytes or None on a miss or version mismatch'''
+        with self._lock:
+            entry = self._entries.get(task_key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(task_key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, task_key, value, version=None):
+        with self._lock:
+            self._entries[task_key] = (version, value)
+            self._entries.move_to_end(task_key)
+            self._evict()
+
+    def invalidate(self, task_keys):
+        '''Drop the cached responses for every task_key in task_keys in every worker'''
+        task_keys = {task_key for task_key in task_keys if task_key is not None}
+        with self._lock:
+            for task_key in task_keys:
+                if self._entries.pop(task_key, None) is not None:
+                    self.invalidations += 1
+        for task_key in task_keys:
+            try:
+                self.backend.incr(f"{self.prefix}{task_key}")
+            except Exception as e:
+                logger.error(f"Question cache invalidation for {task_key} failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def _evict(self):
+        while len(self._entries) > max(self.max_entries, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': sum(len(value) for _, value in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+class RunResultCache:
+    '''
+    Bounded in-process cache of /run_code results keyed by a hash of the normalized source
+
+    Notes:
+        - grade_cache is a second instance holding project grades keyed by (code hash, test hash)
+        - Only snippets that pass modules.sandbox.snippet_key's determinism check get a key, so a hit
+          returns exactly what running the snippet again would print and skips the sandbox entirely
+        - Entries expire ttl seconds after they were stored; the least recently used entry is evicted
+          once max_entries are held or the stored output passes max_bytes
+        - get_or_run() coalesces concurrent misses on one key (a lab clicking Run on the same example),
+          so only the first caller runs the snippet and the others wait for its result
+    '''
+    def __init__(self, max_entries=2000, ttl=3600, max_bytes=32 * 2**20):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._running = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, max_entries=None, ttl=None, max_bytes=None):
+        '''Apply the app config (called once at app start up)'''
+        with self._lock:
+            for name, value in (('max_entries', max_entries), ('ttl', ttl), ('max_bytes', max_bytes)):
+                if value is not None:
+                    setattr(self, name, value)
+            self._evict()
+
+    def get(self, key):
+        '''Return a copy of the cached result or None on a miss or expired entry'''
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key, result):
+        with self._lock:
+            self._set(key, result)
+
+    def get_or_run(self, key, run, cacheable):
+        '''
+        Return the cached result for key, or call run() and cache its result when cacheable(result)
+
+        Args:
+            key: snippet hash, or None for a snippet that must always run
+            run: callable returning a sandbox result dictionary
+            cacheable: callable deciding whether a result may be stored
+
+        Returns: the result dictionary, with 'cached': True on a hit
+        '''
+        if key is None:
+            with self._lock:
+                self.uncacheable += 1
+            return run()
+
+        while True:
+            with self._lock:
+                result = self._get(key)
+                if result is not None:
+                    return result
+                running = self._running.get(key)
+                if running is None:
+                    running = self._running[key] = threading.Event()
+                    break
+                self.coalesced += 1
+            # Another request is running this snippet - wait for it, then look again
+            running.wait()
+
+        try:
+            result = run()
+            if cacheable(result):
+                self.set(key, result)
+            return result
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+            running.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return {**entry[2], 'cached': True}
+
+    def _set(self, key, result):
+        if key in self._entries:
+            self._drop(key)
+        size = sum(len(value) for value in result.values() if isinstance(value, str))
+        self._entries[key] = (time.monotonic() + self.ttl, size, dict(result))
+        self._bytes += size
+        self._evict()
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > max(self.max_entries, 0) or self._bytes > self.max_bytes):
+            key, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'uncacheable': self.uncacheable,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+# Process-wide cache objects - app.py swaps in the Redis backend for production
+assignment_cache = AssignmentCache()
+question_cache = QuestionCache()
+roster_cache = RosterCache()
+run_cache = RunResultCache()
+grade_cache = RunResultCache()
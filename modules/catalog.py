@@ -0,0 +1,193 @@
+# Import packages
+import logging, threading, time
+from collections import defaultdict, OrderedDict
+from modules.models import *
+from modules.cache import MemoryBackend
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Questions columns copied into the snapshot - an edit to any other column leaves the catalog as it is
+QUESTION_FIELDS = ('task_key', 'difficulty', 'standard', 'objective', 'tags')
+
+####################################################################################
+#### Classes #######################################################################
+####################################################################################
+
+class CatalogSnapshot:
+    '''
+    Immutable in-memory copy of the content -> curriculum -> question structure
+
+    Notes:
+        - Built from Content (with its creator), Curriculum, ContentCurriculum, CurriculumQuestion and the
+          Questions metadata columns (difficulty, standard, objective, tags)
+        - Curriculums keep ContentCurriculum.id order, questions keep CurriculumQuestion.id order
+        - Stamped with the catalog version that was current when the build started
+    '''
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.time()
+        self.content_keys = {}                          # Content.id -> Content.content_id
+        self.creator_content = defaultdict(list)        # Content.creator_id -> [(Content.id, Content.content_id)]
+        self.content_curricula = defaultdict(list)      # Content.id -> [Curriculum.id]
+        self.curriculum_keys = {}                       # Curriculum.id -> Curriculum.curriculum_id
+        self.curriculum_pks = {}                        # Curriculum.curriculum_id -> Curriculum.id
+        self.curriculum_questions = defaultdict(list)   # Curriculum.id -> [question metadata dict]
+        self.question_tags = {}                         # Questions.task_key -> tags
+
+    def load(self):
+        '''Populate the snapshot from the database with one query per table'''
+
+        for content_pk, content_key, creator_id in (
+            db.session.query(Content.id, Content.content_id, Content.creator_id).order_by(Content.id).all()
+        ):
+            self.content_keys[content_pk] = content_key
+            self.creator_content[creator_id].append((content_pk, content_key))
+
+        self.curriculum_keys = dict(db.session.query(Curriculum.id, Curriculum.curriculum_id).all())
+        self.curriculum_pks = {key: pk for pk, key in self.curriculum_keys.items()}
+
+        for content_pk, curriculum_pk in (
+            db.session.query(ContentCurriculum.content_id, ContentCurriculum.curriculum_id)
+            .order_by(ContentCurriculum.id)
+            .all()
+        ):
+            self.content_curricula[content_pk].append(curriculum_pk)
+
+        question_rows = db.session.query(Questions.id, Questions.task_key, Questions.difficulty,
+                                         Questions.standard, Questions.objective, Questions.tags).all()
+        questions = {}
+        for question_pk, task_key, difficulty, standard, objective, tags in question_rows:
+            questions[question_pk] = {"task_key": task_key,
+                                      "difficulty": difficulty,
+                                      "standard": standard,
+                                      "objective": objective,
+                                      "tags": tags}
+            self.question_tags[task_key] = tags
+
+        for curriculum_pk, question_pk in (
+            db.session.query(CurriculumQuestion.curriculum_id, CurriculumQuestion.question_id)
+            .order_by(CurriculumQuestion.id)
+            .all()
+        ):
+            if question_pk in questions:
+                self.curriculum_questions[curriculum_pk].append(questions[question_pk])
+
+        return self
+
+    def questions_for(self, curriculum_pk):
+        '''Copy of the question metadata for a Curriculum.id so callers cannot mutate the snapshot'''
+        return [dict(q, tags=list(q["tags"]) if isinstance(q["tags"], list) else q["tags"])
+                for q in self.curriculum_questions.get(curriculum_pk, [])]
+
+    def user_view(self, content_pks, custom_curriculum_pks):
+        '''
+        Build the fetch_user_assignments structure from a user's assigned ids
+
+        Arg(s): content_pks as iterable of Content.id, custom_curriculum_pks as ordered iterable of Curriculum.id
+
+        Returns: (user_assignments, curriculum_order_map)
+        '''
+        result = {}
+        for content_pk in sorted(content_pks):
+            if content_pk not in self.content_keys:
+                continue
+            result[self.content_keys[content_pk]] = OrderedDict(
+                (self.curriculum_keys[curriculum_pk], self.questions_for(curriculum_pk))
+                for curriculum_pk in self.content_curricula.get(content_pk, [])
+            )
+
+        custom_dict = OrderedDict(
+            (self.curriculum_keys[curriculum_pk], self.questions_for(curriculum_pk))
+            for curriculum_pk in custom_curriculum_pks if curriculum_pk in self.curriculum_keys
+        )
+
+        # Place custom curricula under the "custom" key in the outer dictionary.
+        if custom_dict:
+            result["custom"] = custom_dict
+
+        # Create curriculum order maps for the client to sort properly
+        curriculum_order_map = {content: list(currics.keys()) for content, currics in result.items()}
+
+        return result, curriculum_order_map
+
+    def task_list(self, curriculum_key):
+        '''Task keys for a Curriculum.curriculum_id, or None if the curriculum does not exist'''
+        curriculum_pk = self.curriculum_pks.get(curriculum_key)
+        if curriculum_pk is None:
+            return None
+        return [q["task_key"] for q in self.curriculum_questions.get(curriculum_pk, [])]
+
+    def tags(self, task_keys):
+        '''{task_key: tags} for every task_key in the catalog'''
+        return {task_key: self.question_tags[task_key] for task_key in task_keys if task_key in self.question_tags}
+
+class CurriculumCatalog:
+    '''
+    Process-wide, versioned holder of the current CatalogSnapshot
+
+    Notes:
+        - The version counter lives in the backend so a bump in one worker is seen by all workers
+        - Authoring helpers call bump() after committing structural or question metadata changes
+          that actually change something; a bump only rebuilds the snapshot, the assignment and
+          question caches are invalidated separately for the affected users and task keys
+        - snapshot() rebuilds lazily when the shared version no longer matches the local copy
+    '''
+    version_key = 'mps:catalog:version'
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def configure(self, backend):
+        '''Swap the version backend (called once at app start up)'''
+        self.backend = backend
+        self._snapshot = None
+
+    def version(self):
+        try:
+            return int(self.backend.get(self.version_key) or 0)
+        except Exception as e:
+            logger.warning(f"Catalog version read failed: {e}")
+            # Without a shared version the only safe snapshot is a fresh one
+            return -1
+
+    def bump(self):
+        '''Advance the catalog version so every worker rebuilds on next access'''
+        try:
+            self.backend.incr(self.version_key)
+        except Exception as e:
+            logger.error(f"Catalog version bump failed: {e}")
+        self._snapshot = None
+
+    def snapshot(self):
+        '''Return a CatalogSnapshot that matches the current version'''
+        version = self.version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version and version >= 0:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version or version < 0:
+                snapshot = CatalogSnapshot(version).load()
+                self._snapshot = snapshot
+                self.rebuilds += 1
+
+        return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'built_at': snapshot.built_at if snapshot else None,
+            'content': len(snapshot.content_keys) if snapshot else 0,
+            'curriculums': len(snapshot.curriculum_keys) if snapshot else 0,
+            'questions': len(snapshot.question_tags) if snapshot else 0,
+            'rebuilds': self.rebuilds
+        }
+
+# Process-wide catalog object - app.py swaps in the Redis backend for production
+catalog = CurriculumCatalog()
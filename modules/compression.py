@@ -0,0 +1,276 @@
+# Import packages
+import gzip, hashlib, logging, mimetypes, os, re, zlib
+from flask import request, Response
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, quote_etag, unquote_etag
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing (images, audio and fonts are already compressed)
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+                          'application/json', 'application/x-ndjson', 'application/xml', 'image/svg+xml'}
+
+def accepts_gzip(accept_encoding):
+    '''True when an Accept-Encoding header value allows gzip'''
+    return parse_accept_header(accept_encoding)['gzip'] > 0
+
+####################################################################################
+#### Response compression ##########################################################
+####################################################################################
+
+class GzipMiddleware:
+    '''
+    WSGI middleware that gzip encodes responses for clients that accept it
+
+    Notes:
+        - Buffered responses (with a Content-Length) are compressed only from min_size bytes up
+        - Streamed responses (/api/xp_for_teacher, the exports) are compressed chunk by chunk with a
+          sync flush, so rows still reach the client as they are produced
+        - Only COMPRESSIBLE_MIMETYPES are touched; responses that already carry a Content-Encoding
+          (precompressed static files, /curriculum_bundle), HEAD requests, 204/206/304 responses and
+          Cache-Control: no-transform pass through unchanged
+        - Every COMPRESSIBLE_MIMETYPES response and every 304 gets Vary: Accept-Encoding, compressed or
+          not, so shared caches never mix the two encodings
+        - A strong ETag on a gzip body (ours or precompressed) gets etag_suffix, since the bytes differ
+          from the identity body. The suffix is stripped from If-None-Match before the app sees it, so
+          views keep comparing their own ETags, and put back on the 304 that answers a gzip validator
+    '''
+    etag_suffix = '-gzip'
+
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        if not accepts_gzip(environ.get('HTTP_ACCEPT_ENCODING')):
+            def identity(status, headers, exc_info=None):
+                headers = Headers(headers)
+                if self._compressible_type(headers) or status[:3] == '304':
+                    self._vary(headers)
+                return start_response(status, headers.to_wsgi_list(), exc_info)
+            return self.app(environ, identity)
+
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and self.etag_suffix in if_none_match:
+            environ['HTTP_IF_NONE_MATCH'] = re.sub(re.escape(self.etag_suffix) + '"', '"', if_none_match)
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return start_response(status, headers, exc_info) if exc_info else self._no_write
+
+        body = self.app(environ, capture)
+        status, headers, exc_info = captured
+        if exc_info:
+            return body
+
+        headers = Headers(headers)
+        if self._compressible_type(headers) or status[:3] == '304':
+            self._vary(headers)
+
+        if not self._compressible(status, headers):
+            etag = self._gzip_etag(headers.get('ETag'))
+            if etag and (headers.get('Content-Encoding') == 'gzip' or
+                         (status[:3] == '304' and etag in (if_none_match or ''))):
+                headers['ETag'] = etag
+            start_response(status, headers.to_wsgi_list())
+            return body
+
+        if 'Content-Length' not in headers:
+            self._encode(headers)
+            start_response(status, headers.to_wsgi_list())
+            return self._stream(body)
+
+        try:
+            data = b''.join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+        if len(data) < self.min_size:
+            start_response(status, headers.to_wsgi_list())
+            return [data]
+
+        compressed = gzip.compress(data, compresslevel=self.level)
+        self._encode(headers)
+        headers['Content-Length'] = str(len(compressed))
+        self._record(len(data), len(compressed))
+        start_response(status, headers.to_wsgi_list())
+        return [compressed]
+
+    def _compressible(self, status, headers):
+        if status[:3] in ('204', '206', '304') or headers.get('Content-Encoding') or headers.get('Content-Range'):
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        return self._compressible_type(headers)
+
+    @staticmethod
+    def _compressible_type(headers):
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return mimetype in COMPRESSIBLE_MIMETYPES
+
+    @staticmethod
+    def _vary(headers):
+        vary = headers.get('Vary', '')
+        if 'accept-encoding' not in vary.lower():
+            headers['Vary'] = ', '.join(filter(None, [vary, 'Accept-Encoding']))
+
+    def _gzip_etag(self, etag):
+        '''The gzip variant of a strong ETag header value (None for a missing or weak ETag)'''
+        if not etag:
+            return None
+        value, weak = unquote_etag(etag)
+        if weak or value.endswith(self.etag_suffix):
+            return None
+        return quote_etag(value + self.etag_suffix)
+
+    def _encode(self, headers):
+        headers['Content-Encoding'] = 'gzip'
+        etag = self._gzip_etag(headers.get('ETag'))
+        if etag:
+            headers['ETag'] = etag
+
+    def _stream(self, body):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        size_in = size_out = 0
+        try:
+            for chunk in body:
+                if not chunk:
+                    continue
+                size_in += len(chunk)
+                out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                size_out += len(out)
+                yield out
+            out = compressor.flush()
+            size_out += len(out)
+            yield out
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self._record(size_in, size_out)
+
+    def _record(self, size_in, size_out):
+        self.compressed += 1
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+
+    @staticmethod
+    def _no_write(data):
+        raise RuntimeError("GzipMiddleware does not support the WSGI write() callable")
+
+    def stats(self):
+        return {
+            'min_size': self.min_size,
+            'compressed': self.compressed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+        }
+
+####################################################################################
+#### Static assets #################################################################
+####################################################################################
+
+class StaticAsset:
+    ''' One static file held in memory as-is and gzip encoded '''
+    def __init__(self, path, level):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.mtime = os.path.getmtime(path)
+        self.digest = hashlib.sha256(self.data).hexdigest()[:16]
+        self.gzip = gzip.compress(self.data, compresslevel=level, mtime=0)
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+class StaticAssets:
+    '''
+    Precompressed, content-hashed JS/CSS/JSON static files
+
+    Notes:
+        - init_app() reads and gzips every file with an extension in `extensions` once at start up
+        - url_for('static', filename=...) appends ?v=<content hash> for those files, so templates get
+          URLs that change whenever the file does
+        - A request carrying the current hash is served with a far-future, immutable Cache-Control;
+          without it (e.g. fetch('/static/...') in the JS) the response must be revalidated, which the
+          content hash ETag turns into a 304
+        - Other static files (images, sounds) go to Flask's own static view
+        - In debug mode a file whose mtime changed is reloaded on its next request
+    '''
+    extensions = ('.js', '.css', '.json')
+
+    def __init__(self, max_age=31536000, level=9):
+        self.max_age = max_age
+        self.level = level
+        self.folder = None
+        self.assets = {}
+        self._fallback = None
+        self._debug = False
+
+    def init_app(self, app, max_age=None):
+        if max_age is not None:
+            self.max_age = max_age
+        self.folder = app.static_folder
+        self._debug = app.debug
+        self.build()
+        self._fallback = app.view_functions['static']
+        app.view_functions['static'] = self.serve
+        app.url_defaults(self.url_defaults)
+
+    def build(self):
+        '''Read, hash and gzip every matching file under the static folder'''
+        self.assets = {}
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith(self.extensions):
+                    path = os.path.join(root, name)
+                    filename = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                    self.assets[filename] = StaticAsset(path, self.level)
+        size = sum(len(asset.data) for asset in self.assets.values())
+        gzipped = sum(len(asset.gzip) for asset in self.assets.values())
+        logger.info(f"Precompressed {len(self.assets)} static files: {size} -> {gzipped} bytes")
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            asset = self.assets.get(values.get('filename'))
+            if asset is not None:
+                values['v'] = asset.digest
+
+    def serve(self, filename):
+        asset = self.assets.get(filename)
+        if asset is None:
+            return self._fallback(filename=filename)
+
+        if self._debug:
+            path = os.path.join(self.folder, filename)
+            if os.path.exists(path) and os.path.getmtime(path) != asset.mtime:
+                asset = self.assets[filename] = StaticAsset(path, self.level)
+
+        if request.args.get('v') == asset.digest:
+            cache_control = f'public, max-age={self.max_age}, immutable'
+        else:
+            cache_control = 'no-cache'
+
+        if asset.digest in request.if_none_match:
+            response = Response(status=304)
+        elif accepts_gzip(request.headers.get('Accept-Encoding')):
+            response = Response(asset.gzip, mimetype=asset.mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(asset.data, mimetype=asset.mimetype)
+
+        response.set_etag(asset.digest)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+# Process-wide static asset table - app.py binds it to the app
+static_assets = StaticAssets()
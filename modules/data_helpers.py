@@ -1,18 +1,48 @@
 # Import packages
-import bcrypt, itertools
+import itertools, hashlib, json, base64, binascii, sys, math
 from flask import session, redirect, url_for, jsonify, has_request_context
 from modules.models import *
+from modules.cache import assignment_cache, question_cache, roster_cache
+from modules.catalog import catalog, QUESTION_FIELDS
+from modules.rollups import build_xp_summary
+from modules.xp_buffer import xp_buffer
+from modules.passwords import HasherBusy, password_hasher
+from modules.roles import admin_roles
+from modules.tokens import token_revocations
+from modules.acl import visibility_index
+from modules.serialization import encode
+from sqlalchemy import func, or_, and_
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
 from functools import wraps
-from werkzeug.exceptions import Forbidden, BadRequest, Unauthorized
+from werkzeug.exceptions import Forbidden, BadRequest, Unauthorized, ServiceUnavailable
 from collections import defaultdict, OrderedDict
 
 ####################################################################################
 #### Default Variables #############################################################
 ####################################################################################
 
+# Maximum number of students returned by one /get_student_profiles request
+STUDENT_PROFILE_BATCH_LIMIT = 100
+
+# Default and maximum number of XP rows per page of an incremental XP sync
+XP_PAGE_SIZE = 1000
+XP_PAGE_SIZE_MAX = 5000
+
+# Rows fetched per round trip when streaming XP exports
+XP_STREAM_BATCH = 2000
+
+# Maximum number of XP events accepted by one /update_xp request and the columns a client may set
+XP_BATCH_LIMIT = 200
+XP_EVENT_FIELDS = ('dXP', 'question_id', 'curriculum_id', 'content_id', 'possible_xp', 'difficulty',
+                   'standard', 'objective', 'tags', 'elapsed_time')
+
+# XP event fields checked one event at a time: number columns and string columns with their length
+XP_FLOAT_FIELDS = ('dXP', 'possible_xp', 'difficulty', 'elapsed_time')
+XP_INT_FIELDS = ('standard', 'objective')
+XP_STRING_FIELDS = {'question_id': 120, 'curriculum_id': 50, 'content_id': 50}
+
 ####################################################################################
 #### Classes #######################################################################
 ####################################################################################
@@ -113,43 +143,56 @@ def login_required(f):
 #### Functions# ####################################################################
 ####################################################################################
 
-def verify(username, password):
+def verify(username, password, logger=None):
     """Verify username and password"""
     try:
-        user_crud = CRUDHelper(User)
-        user = user_crud.read(username=username)[0]
+        user = User.query.filter_by(username=username).first()
 
         if user is None:
             return "Username not found"  # Return a user-friendly message
 
-        # Check if the password matches
-        if bcrypt.checkpw(password.encode('utf-8'), user.password_hash):
+        # Check if the password matches (on the bcrypt executor)
+        if password_hasher.check(password, user.password_hash):
+            rehash_password(user, password, logger)
             return True  # Return True if the password matches
 
         return "Invalid password"  # Return a message for invalid password
 
+    except HasherBusy:
+        raise
+
     except Exception as e:
         return f"Error verifying user: {e}"  # General error message
 
+def rehash_password(user, password, logger=None):
+    '''
+    Replace a user's password hash made with an older bcrypt cost after a successful login
+    
+    Notes: a failure is logged and the old hash kept, the login still succeeds
+    '''
+    try:
+        new_hash = password_hasher.upgrade(password, user.password_hash)
+        if new_hash is not None:
+            user.password_hash = new_hash
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if logger:
+            logger.warning(f"Could not rehash the password of {user.username}: {e}")
+
 def build_session(username, logger=None):
-    '''This function builds requred session data'''
-    ### No change needed for new schema ###
+    '''
+    This function builds requred session data
+    
+    Notes: one query for the user.id - the role and system_ids come from the cached admin role index
+    '''
     
     # Get the user.id
-    user = User.query.filter_by(username=username).first()
-    user_id = user.id
+    user_id = db.session.query(User.id).filter(User.username == username).scalar()
     
-    # Fetch admin status of user
-    try:
-        admin = Admin.query.filter_by(id=user_id).first()
-        role = admin.role
-    except:
-        role = "student"
-                
-    # Fetch the user.ids of all system level admin
-    admin_crud = CRUDHelper(Admin)
-    records = admin_crud.read()
-    system_ids = [record.id for record in records if record.role == 'system']
+    # Fetch admin status of user and the user.ids of all system level admin
+    role = admin_roles.role(user_id)
+    system_ids = admin_roles.system_ids()
         
     # Build session variables
     session['username'] = username
@@ -161,6 +204,69 @@ def build_session(username, logger=None):
     # Force the session to update
     session.modified = True
 
+def fetch_api_claims(username, logger=None):
+    '''
+    This function builds the claims signed into an /api/login access token
+    
+    Returns: dictionary with user_id, role and classrooms (the Classroom.code values a teacher manages,
+             "*" for system admin, [] for students)
+    
+    Notes: the API routes rebuild the session from these claims instead of the database, so any
+           change to them must revoke the user's tokens (token_revocations.revoke)
+    '''
+    
+    user_id = db.session.query(User.id).filter(User.username == username).scalar()
+    role = admin_roles.role(user_id)
+    
+    if role == 'system':
+        classrooms = '*'
+    elif role == 'teacher':
+        classrooms = [code for (code,) in db.session.query(Classroom.code)
+                      .filter(Classroom.admin_id == user_id).order_by(Classroom.code)]
+    else:
+        classrooms = []
+    
+    return {'user_id': user_id, 'role': role, 'classrooms': classrooms}
+
+def build_api_session(username, claims, logger=None):
+    '''
+    This function builds the session data for an /api/* request from its access token claims
+    
+    Notes:
+        - No database access: user_id and role come from the signed claims, system_ids from the
+          cached admin role index
+        - Tokens issued before the claims were added fall back to build_session
+    '''
+    
+    if 'role' not in claims:
+        return build_session(username, logger)
+    
+    session['username'] = username
+    session['is_admin'] = claims['role'] in ('teacher', 'system')
+    session['user_id'] = claims['user_id']
+    session['system_ids'] = admin_roles.system_ids()
+    session['role'] = claims['role']
+    session.modified = True
+
+def check_user_access(user_id, logger=None):
+    '''
+    This function checks that the caller may read another user's data
+    
+    Raises: Forbidden unless the caller is the user, a system admin, or a teacher with the user
+            enrolled in one of their classrooms
+    '''
+    
+    role = session.get('role')
+    caller_id = session.get('user_id')
+    
+    if caller_id == user_id or role == 'system':
+        return
+    
+    if role == 'teacher' and visibility_index.can_view(caller_id, user_id, role):
+        return
+    
+    raise Forbidden(f"Not authorized for user {user_id}")
+
 def fetch_current_curriculum(username):
     '''
     function to find the current curriculum
@@ -198,28 +304,17 @@ def fetch_usernames():
 
     try:
         if role == 'teacher':
-            # Initialize my_usernames
-            my_usernames = []
-
-            # Query all students enrolled in classrooms of the teacher
-            students = db.session.query(User.username).\
-                join(ClassroomUser, ClassroomUser.user_id == User.id).\
-                join(Classroom, Classroom.id == ClassroomUser.classroom_id).\
-                filter(Classroom.admin_id == user_id).\
-                all()
-
-            # Extract the usernames from the query result
-            my_usernames = [username[0] for username in students]
+            # Students enrolled in classrooms of the teacher, sorted by username (ACL index)
+            my_usernames = visibility_index.students(user_id).usernames
 
             if my_usernames:
-                return sorted(my_usernames)
+                return list(my_usernames)
             else:
                 raise BadRequest("You need to have 1 or more students enrolled in 1 or more classrooms!")
 
         elif role == 'system':
-            # System users see all usernames in the database
-            users = User.query.all()
-            return sorted([user.username for user in users])
+            # System users see all usernames in the database (username column only)
+            return [username for (username,) in db.session.query(User.username).order_by(User.username)]
 
         else:
             raise Unauthorized("Not Authorized!")
@@ -233,6 +328,72 @@ def fetch_usernames():
     except Exception as e:
         raise e     
 
+def fetch_user_directory(prefix='', limit=25, cursor=None):
+    '''
+    Function to page through the usernames a teacher or system admin can see
+    
+    Args:
+        prefix (str): only usernames starting with prefix (case sensitive)
+        limit (int): page size
+        cursor (str): nextCursor of the previous page, None for the first page
+    
+    Returns:
+        {'users': [{'id', 'username'}], 'nextCursor': str or None}
+    
+    Notes:
+        - called in the /user_directory route for the user_data.html typeahead
+        - Only User.id and User.username are selected, never the whole user row
+        - System admin page through the username index: a range scan from the prefix (or cursor)
+          that stops after limit + 1 rows
+        - Teachers page through the sorted in-memory array of their students (modules.acl)
+    
+    '''
+    user_id = session.get('user_id')
+    role = session.get('role')
+    
+    if role == 'teacher':
+        return visibility_index.page(user_id, prefix, limit, cursor)
+    
+    elif role == 'system':
+        query = db.session.query(User.id, User.username).filter(User.username.startswith(prefix, autoescape=True))
+        
+        # The lower bound lets the database seek into the username index
+        if cursor and cursor >= prefix:
+            query = query.filter(User.username > cursor)
+        else:
+            query = query.filter(User.username >= prefix)
+        
+        rows = query.order_by(User.username).limit(limit + 1).all()
+        users = [{'id': id, 'username': username} for id, username in rows[:limit]]
+        return {'users': users, 'nextCursor': users[-1]['username'] if len(rows) > limit else None}
+    
+    else:
+        raise Unauthorized("Not Authorized!")
+
+def fetch_visible_user_ids(usernames):
+    '''
+    Function to resolve the usernames the caller may see
+    
+    Arg(s): usernames as list
+    
+    Returns: dictionary username -> User.id, only for visible users that exist
+    
+    Notes:
+        - Teachers are answered from the ACL index without a query
+        - System admin see every user: one column-only query for the requested usernames
+    '''
+    user_id = session.get('user_id')
+    role = session.get('role')
+    
+    if role == 'teacher':
+        by_username = visibility_index.students(user_id).by_username
+        return {username: by_username[username] for username in usernames if username in by_username}
+    
+    elif role == 'system' and usernames:
+        return dict(db.session.query(User.username, User.id).filter(User.username.in_(set(usernames))).all())
+    
+    return {}
+
 def fetch_user_ids():
     '''
     Function to fetch all User.id for a teacher or system admin
@@ -250,18 +411,8 @@ def fetch_user_ids():
 
     try:
         if role == 'teacher':
-            # Initialize my_usernames
-            my_ids = []
-
-            # Query all students enrolled in classrooms of the teacher
-            students = db.session.query(User.id).\
-                join(ClassroomUser, ClassroomUser.user_id == User.id).\
-                join(Classroom, Classroom.id == ClassroomUser.classroom_id).\
-                filter(Classroom.admin_id == user_id).\
-                all()
-
-            # Extract the usernames from the query result
-            my_ids = [id[0] for id in students]
+            # Students enrolled in classrooms of the teacher (ACL index)
+            my_ids = visibility_index.students(user_id).ids
 
             if my_ids:
                 return sorted(my_ids)
@@ -269,9 +420,8 @@ def fetch_user_ids():
                 raise BadRequest("You need to have 1 or more students enrolled in 1 or more classrooms!")
 
         elif role == 'system':
-            # System users see all usernames in the database
-            users = User.query.all()
-            return sorted([user.id for user in users])
+            # System users see all user ids in the database
+            return [id for (id,) in db.session.query(User.id).order_by(User.id)]
 
         else:
             raise Unauthorized("Not Authorized!")
@@ -301,6 +451,8 @@ def initialize_user_sessionStorage_data(logger=None):
     Notes:
         - This function initializes the client side sessionStorage data
         - This is student related data (i.e., coursework related)
+        - One column-only query: assignments reach the client through /get_user_profile, so only
+          the fields returned here are read
     '''
     
     try:
@@ -308,71 +460,17 @@ def initialize_user_sessionStorage_data(logger=None):
         # Get the user.id from session data
         user_id = session.get('user_id')
         
-        # Call the fetch_user_data function to get all programming for user
-        
-        
-        # Query all classrooms this user is enrolled in
-        all_classrooms = {c.classroom_id for c in ClassroomUser.query.with_entities(ClassroomUser.classroom_id).filter_by(user_id=user_id).all()}
-        
-        # Query all content_id that are assigned to all classroom_id in ClassroomContent
-        all_classroom_content_ids = {c.content_id for c in ClassroomContent.query.with_entities(ClassroomContent.content_id).filter(ClassroomContent.classroom_id.in_(all_classrooms)).all()} if all_classrooms else set()
-        
-        # Query all content_id that are assigned directly to the user in UserContent
-        all_user_content_ids = {c.content_id for c in UserContent.query.with_entities(UserContent.content_id).filter_by(user_id=user_id).all()}
-        
-        # Combine both sets
-        all_user_content = all_classroom_content_ids | all_user_content_ids
-        
-        # Query Content table to get the content_id for each Content.id
-        content_query = Content.query.with_entities(Content.content_id).filter(Content.id.in_(all_user_content)).all()
-        
-        # Extract content_id values
-        assigned_content = [c[0] for c in content_query]
-
-        # Now query curriculums - all curriculums assigned to assigned_content plus any from CurriculumUser
-        # First get all curriculums assigned to all_user_content
-        # Query all content_id that are assigned to all classroom_id in ClassroomContent
-        all_content_curriculum_ids = {c.curriculum_id for c in ContentCurriculum.query.with_entities(ContentCurriculum.curriculum_id).filter(ContentCurriculum.content_id.in_(all_user_content)).all()} if all_user_content else set()
-        
-        # Now query all user_curriculum_ids
-        # Query all content_id that are assigned directly to the user in UserContent
-        all_user_curriculum_ids = {c.curriculum_id for c in UserCurriculum.query.with_entities(UserCurriculum.curriculum_id).filter_by(user_id=user_id).all()}
-        
-        # combine both sets
-        all_user_curriculums = all_content_curriculum_ids | all_user_curriculum_ids
-        
-        # Query Curriculum table to get the curriculum_id for each Curriculum.id
-        curriculum_query = Curriculum.query.with_entities(Curriculum.curriculum_id).filter(Curriculum.id.in_(all_user_curriculums)).all()
-        
-        # Extract the curriculum id values
-        assigned_curriculums = [c[0] for c in curriculum_query]
-
-        # Query the User table for the other session data
-        user = User.query.filter_by(id=user_id).first()
-        
-        # logger.debug(f"assignedContent: {assigned_content}")
-        # logger.debug(f"assignedCurriculums: {assigned_curriculums}")
-        # logger.debug(f"completedCurriculums: {user.completed_curriculums}")
-        # logger.debug(f"contentScores: {user.content_scores}")
-        # logger.debug(f"correctAnswers: {user.correct_answers}")
-        # logger.debug(f"currentQuestion: {user.current_question}")
-        # logger.debug(f"curriculumScores: {user.curriculum_scores}")
-        # logger.debug(f"incorrectAnswers: {user.incorrect_answers}")
-        # logger.debug(f"xp: {user.xp}")
-        # logger.debug(f"updatedAt: {user.updated_at}")
+        # Query the User table for the session data
+        user = (
+            db.session.query(User.current_curriculum, User.current_question, User.updated_at)
+            .filter(User.id == user_id)
+            .first()
+        )
         
         # Update session data with the basic fields
         session_data = {
-                        #"assignedContent": assigned_content,
-                        #"assignedCurriculums": assigned_curriculums,
-                        #"completedCurriculums": user.completed_curriculums,
-                        #"contentScores": user.content_scores,
-                        #"correctAnswers": user.correct_answers,
                         "currentCurriculum": user.current_curriculum,
                         "currentQuestionId": user.current_question,
-                        #"curriculumScores": user.curriculum_scores,
-                        #"incorrectAnswers": user.incorrect_answers,
-                        #"xp": user.xp,
                         "updatedAt": user.updated_at
                         }
         
@@ -456,124 +554,195 @@ def create_new_user(username, password, email):
     except Exception as e:
         raise e
 
+def fetch_classroom_user_ids(class_ids):
+    '''Fetch the User.id of every student enrolled in the given Classroom.id values'''
+    
+    if not class_ids:
+        return set()
+    
+    rows = db.session.query(ClassroomUser.user_id).filter(ClassroomUser.classroom_id.in_(class_ids)).all()
+    return {row[0] for row in rows}
+
+def fetch_catalog_user_ids(content_ids=(), curriculum_ids=(), question_ids=()):
+    '''
+    Fetch the User.id of every user whose assignment tree contains any of the given catalog rows
+    
+    Arg(s): content_ids as Content.id values, curriculum_ids as Curriculum.id values,
+            question_ids as Questions.id values
+    
+    Returns: set of User.id
+    
+    Notes:
+        - Questions reach users through their curriculums, curriculums through their content or a
+          custom assignment (UserCurriculum), content through classrooms or a direct assignment
+        - Used to invalidate the assignment cache after a catalog edit instead of flushing it
+    '''
+    
+    curriculum_ids = set(curriculum_ids)
+    if question_ids:
+        rows = db.session.query(CurriculumQuestion.curriculum_id).\
+            filter(CurriculumQuestion.question_id.in_(set(question_ids))).all()
+        curriculum_ids.update(row[0] for row in rows)
+    
+    content_ids = set(content_ids)
+    if curriculum_ids:
+        rows = db.session.query(ContentCurriculum.content_id).\
+            filter(ContentCurriculum.curriculum_id.in_(curriculum_ids)).all()
+        content_ids.update(row[0] for row in rows)
+    
+    user_ids = set()
+    if content_ids:
+        classroom_users = (
+            db.session.query(ClassroomUser.user_id)
+            .join(ClassroomContent, ClassroomContent.classroom_id == ClassroomUser.classroom_id)
+            .filter(ClassroomContent.content_id.in_(content_ids))
+        )
+        direct_users = db.session.query(UserContent.user_id).filter(UserContent.content_id.in_(content_ids))
+        user_ids.update(row[0] for row in classroom_users.union(direct_users).all())
+    
+    if curriculum_ids:
+        rows = db.session.query(UserCurriculum.user_id).\
+            filter(UserCurriculum.curriculum_id.in_(curriculum_ids)).all()
+        user_ids.update(row[0] for row in rows)
+    
+    return user_ids
+
 def fetch_user_assignments(user_id, logger=None):
     '''
-    Function to build a dictionary of all user content/curriculum assignments
+    Function to fetch the user content/curriculum assignments through the assignment cache
 
     Arg(s): user_id as int (User.id), logger as app.logger
-    
-    Returns:
-        Nested Dictionary where outer keys are assigned content
-        Inner keys are assigned curriculums
-        Values are lists of task keys
-        
+
+    Returns: (user_assignments, curriculum_order_map) - see load_assignments_for_users
+
     Notes:
-        - The function first accessed assigned content from classroom assignments via ClassroomContent & ClassroomUser
-        - Then custom content and curriculum assignments are accessed from UserContent & UserCurriclum
-        - task_key are accessed from curriculum_question
-        
+        - Cached per User.id in modules.cache.assignment_cache
+        - Write helpers that change assignments, or the catalog structure under them, invalidate only
+          the affected users (see fetch_catalog_user_ids)
+    '''
+    return fetch_assignments_for_users([user_id], logger)[user_id]
 
+def fetch_assignments_for_users(user_ids, logger=None):
     '''
-    # A set to hold unique Content.content_id values for the user.
-    user_content_ids = set()
+    Batch version of fetch_user_assignments
+    
+    Arg(s): user_ids as list of User.id, logger as app.logger
+    
+    Returns: dictionary User.id -> (user_assignments, curriculum_order_map)
+    
+    Notes:
+        - Cache hits are read in one backend round trip
+        - All misses are loaded together with a fixed number of queries
+        - Misses are only stored when the catalog version did not move while they were built, so a
+          tree built from a snapshot that a concurrent edit replaced is never cached
+    '''
+    assignments = assignment_cache.get_many(user_ids)
+    
+    missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in assignments]
+    if missing:
+        version = catalog.version()
+        loaded = load_assignments_for_users(missing, logger)
+        if version >= 0 and catalog.version() == version:
+            assignment_cache.set_many(loaded)
+        assignments.update(loaded)
+
+    return assignments
 
-    # Get Content assigned via classrooms.
+def fetch_assignment_ids_for_users(user_ids):
+    '''
+    Function to fetch the ids each user is assigned
+    
+    Returns: dictionary User.id -> (content_ids as set of Content.id, custom_curriculum_ids as list of Curriculum.id)
+    
+    Notes:
+        - Content comes from classroom assignments (ClassroomContent & ClassroomUser) and direct
+          assignments (UserContent) in a single UNION query grouped by user
+        - Custom curriculums come from UserCurriculum in assignment order
+    '''
+    
+    assignment_ids = {user_id: (set(), []) for user_id in user_ids}
+    
     classroom_contents = (
-        db.session.query(Content)
-        .join(ClassroomContent, ClassroomContent.content_id == Content.id)
-        .join(Classroom, Classroom.id == ClassroomContent.classroom_id)
-        .join(ClassroomUser, ClassroomUser.classroom_id == Classroom.id)
-        .filter(ClassroomUser.user_id == user_id)
-        .all()
+        db.session.query(ClassroomUser.user_id, ClassroomContent.content_id)
+        .join(ClassroomContent, ClassroomContent.classroom_id == ClassroomUser.classroom_id)
+        .filter(ClassroomUser.user_id.in_(assignment_ids))
     )
-    for content in classroom_contents:
-        user_content_ids.add(content.content_id)
-
-    # Get Content assigned directly to the user.
     direct_contents = (
-        db.session.query(Content)
-        .join(UserContent, UserContent.content_id == Content.id)
-        .filter(UserContent.user_id == user_id)
-        .all()
+        db.session.query(UserContent.user_id, UserContent.content_id)
+        .filter(UserContent.user_id.in_(assignment_ids))
     )
-    for content in direct_contents:
-        user_content_ids.add(content.content_id)
-
-    # Prepare the result dictionary.
-    # Outer keys: Content.content_id (strings), plus a "custom" key for curricula not tied to any Content.
-    result = {content_id: OrderedDict() for content_id in user_content_ids}
-
-    #For each classroom-related Content, get the associated curriculums via ContentCurriculum.
-    for content_id in user_content_ids:
-        # Retrieve the Content row (we assume content_id is unique in Content).
-        content_obj = db.session.query(Content).filter_by(content_id=content_id).first()
-        if not content_obj:
-            continue
+    for user_id, content_id in classroom_contents.union(direct_contents).all():
+        assignment_ids[user_id][0].add(content_id)
+    
+    for user_id, curriculum_id in (
+        db.session.query(UserCurriculum.user_id, UserCurriculum.curriculum_id)
+        .filter(UserCurriculum.user_id.in_(assignment_ids))
+        .order_by(UserCurriculum.id)
+        .all()
+    ):
+        assignment_ids[user_id][1].append(curriculum_id)
+    
+    return assignment_ids
+
+def load_user_assignments(user_id, logger=None):
+    '''Uncached fetch_user_assignments - see load_assignments_for_users'''
+    return load_assignments_for_users([user_id], logger)[user_id]
 
+def load_assignments_for_users(user_ids, logger=None):
+    '''
+    Function to build a dictionary of all content/curriculum assignments for each user
+
+    Arg(s): user_ids as list of User.id, logger as app.logger
+    
+    Returns:
+        Dictionary User.id -> (user_assignments, curriculum_order_map) where user_assignments is a
+        Nested Dictionary where outer keys are assigned content
+        Inner keys are assigned curriculums
+        Values are lists of task keys
         
-        # Get curriculums assigned to this content.
-        content_curricula = (
-            db.session.query(Curriculum)
-            .join(ContentCurriculum, ContentCurriculum.curriculum_id == Curriculum.id)
-            .filter(ContentCurriculum.content_id == content_obj.id)
-            .order_by(ContentCurriculum.id)
-            .all()
-        )
-        for curriculum in content_curricula:
-            # For each curriculum, get the Questions.task_key values via CurriculumQuestion.
-            question_data = (
-                db.session.query(Questions.task_key, Questions.difficulty, Questions.standard, Questions.objective, Questions.tags)
-                .join(CurriculumQuestion, CurriculumQuestion.question_id == Questions.id)
-                .filter(CurriculumQuestion.curriculum_id == curriculum.id)
-                .all()
-            )
-            # Extract the task_key data from the tuples
-            result[content_id][curriculum.curriculum_id]= [
-                {"task_key": qk,
-                 "difficulty": difficulty,
-                 "standard": standard,
-                 "objective": objective,
-                 "tags": tags}
-                for (qk, difficulty, standard, objective, tags) in question_data
-            ]
+    Notes:
+        - Only the users' assigned Content.id / Curriculum.id values are queried (two queries)
+        - The content -> curriculum -> question structure is read from the shared catalog snapshot,
+          so the query count grows with neither the number of users nor the size of their assignments
+    '''
+    
+    assignment_ids = fetch_assignment_ids_for_users(user_ids)
+    snapshot = catalog.snapshot()
+    
+    return {user_id: snapshot.user_view(content_ids, custom_curriculum_ids)
+            for user_id, (content_ids, custom_curriculum_ids) in assignment_ids.items()}
 
-    # Handle custom curricula: these are assigned to the user via UserCurriculum.
-    custom_curricula = (
-        db.session.query(Curriculum)
-        .join(UserCurriculum, UserCurriculum.curriculum_id == Curriculum.id)
-        .filter(UserCurriculum.user_id == user_id)
-        .all()
+def fetch_profile_etag(user_id, xp_username, *data_parts):
+    '''
+    Function to build a strong ETag for a /get_user_profile, /get_student_profile or /xp_summary response
+    
+    Arg(s): user_id as int (assignments owner), xp_username as string (XP owner),
+            data_parts - any other data the response is built from (e.g. the current curriculum)
+    
+    Returns: hex digest as string
+    
+    Notes:
+        - The ETag is the version of the user's data, not of one response: the XP cursor and page
+          size are left out, so a client that already holds the latest XP gets a 304 whatever cursor
+          it polls with, and the first poll after paging through /xp_sync is a 304 too
+        - Assignment version = the user's assignment cache generation, which every assignment and
+          catalog edit that reaches the user advances
+        - XP version = latest XP.timestamp and XP.id for xp_username (one aggregate query)
+        - Profile version = User.updated_at of user_id
+    '''
+    
+    last_timestamp, last_id = (
+        db.session.query(func.max(XP.timestamp), func.max(XP.id))
+        .join(User, User.id == XP.user_id)
+        .filter(User.username == xp_username)
+        .one()
     )
+    updated_at = db.session.query(User.updated_at).filter(User.id == user_id).scalar()
     
-    custom_dict = OrderedDict()
-    for curriculum in custom_curricula:
-        # For each custom curriculum, get the question data
-        question_data = (
-            db.session.query(Questions.task_key, Questions.difficulty, Questions.standard, Questions.objective, Questions.tags)
-            .join(CurriculumQuestion, CurriculumQuestion.question_id == Questions.id)
-            .filter(CurriculumQuestion.curriculum_id == curriculum.id)
-            .all()
-        )
-        # Extract the task key data from the tuples
-        custom_dict[curriculum.curriculum_id] = [
-            {"task_key": qk,
-             "difficulty": difficulty,
-             "standard": standard,
-             "objective": objective,
-             "tags": tags}
-            for (qk, difficulty, standard, objective, tags) in question_data
-        ]    
-
-    # Place custom curricula under the "custom" key in the outer dictionary.
-    if custom_dict:
-        result["custom"] = custom_dict
-
-    # Create curriculum order maps for the client to sort properly
-    curriculum_order_map = {}
-    for content, currics in result.items():
-        curriculum_order_map[content] = list(currics.keys())
-    
-    return result, curriculum_order_map
+    parts = [assignment_cache.generation(user_id), user_id, updated_at, xp_username,
+             last_timestamp, last_id, *data_parts]
+    
+    return hashlib.sha256("|".join(str(part) for part in parts).encode('utf-8')).hexdigest()
 
 def fetch_user_data(username, logger=None):
     '''
@@ -637,9 +806,7 @@ def fetch_tags_data(questions, logger=None):
     dict : {task_key: [tags]} for each task_key in the input list
     '''
     try:
-        results = db.session.query(Questions.task_key, Questions.tags)\
-                            .filter(Questions.task_key.in_(questions)).all()
-        return {task_key: tags for task_key, tags in results}
+        return catalog.snapshot().tags(questions)
 
     except Exception as e:
         if logger:
@@ -687,7 +854,7 @@ def update_user_data(username, changes, logger=None):
     for key, value in changes.items():
         if key == 'password' and value:  # Special handling for password field
             key = 'password_hash'
-            value = bcrypt.hashpw(value.encode('utf-8'), bcrypt.gensalt())
+            value = password_hasher.hash(value)
             
         if key in defaults and not value:
             value = defaults[key]
@@ -731,6 +898,7 @@ def update_user_data(username, changes, logger=None):
     
     if assigned_curriculums or removed_curriculums:
         db.session.commit()
+        assignment_cache.invalidate([user_id])
 
     if updates:
         try:
@@ -738,51 +906,74 @@ def update_user_data(username, changes, logger=None):
         except Exception as e:
             logger.debug(f"Error updating user {username}: {e}")
             raise e
+        
+        # A new password retires the user's API tokens
+        if 'password_hash' in updates:
+            token_revocations.revoke(user.id)
+        
+        # Rosters list usernames and emails, the ACL index usernames
+        if 'username' in updates or 'email' in updates:
+            classrooms = fetch_user_classrooms(user.id)
+            roster_cache.invalidate([code for code, _ in classrooms])
+            if 'username' in updates:
+                visibility_index.invalidate([admin_id for _, admin_id in classrooms])
 
 def delete_user(username, logger=None):
-    '''Function to delete a user based on username'''
+    '''
+    Function to delete a user based on username
     
-    # Fetch usernames
-    my_users = fetch_usernames()
+    Notes: system admin can delete any user, teachers only students enrolled in their classrooms
+    '''
     
-    if username in my_users:
+    # Create CRUDHelper oblect
+    user_crud = CRUDHelper(User)
+    user = User.query.filter_by(username=username).first()
     
-        # Create CRUDHelper oblect
-        user_crud = CRUDHelper(User)
-        user = user_crud.read(username=username)[0]
+    if user and visibility_index.can_view(session.get('user_id'), user.id, session.get('role')):
         
         try:
             id = user.id
+            classrooms = fetch_user_classrooms(id)
+            for rollup in (XPQuestionRollup, XPCurriculumRollup, XPStandardRollup):
+                db.session.query(rollup).filter(rollup.user_id == id).delete(synchronize_session=False)
             user_crud.delete(id)
+            assignment_cache.invalidate([id])
+            token_revocations.revoke(id)
+            roster_cache.invalidate([code for code, _ in classrooms])
+            visibility_index.invalidate([admin_id for _, admin_id in classrooms])
+            if admin_roles.role(id) != 'student':
+                admin_roles.bump()
         except Exception as e:
             logger.debug(f"Error deleting user {username}: {e}")
 
 def fetch_curriculum_task_list(curriculum_id, logger=None):
-    '''This function fetches the array of tasks for a given curriculum'''
-    ### CHANGE needed for new schema ###
-    
-    try:
-        # Get the Curriculum.id from the curriculum_id
-        curriculum_id = db.session.query(Curriculum.id).filter_by(curriculum_id = curriculum_id).scalar()
-        
-        # Get all tasks assigned to that Curriculum.id from the CurriculumQuestions table
-        if curriculum_id:
-            c_questions = db.session.query(CurriculumQuestion.question_id).filter_by(curriculum_id=curriculum_id).all()
-            question_ids = [q[0] for q in c_questions]
-            
-        # From question ids above get task_keys from Questions table
-        if question_ids:
-            questions = db.session.query(Questions.task_key).filter(Questions.id.in_(question_ids)).all()
-            task_list = [t[0] for t in questions]
-        
-        # Return the task_list
-        return task_list
-    
-    except IntegrityError as ie:
-        raise ie
-    
-    except Exception as e:
-        raise e
+    '''This function fetches the array of tasks for a given curriculum from the catalog snapshot'''
+    
+    task_list = catalog.snapshot().task_list(curriculum_id)
+    
+    if task_list is None:
+        raise ValueError(f"Curriculum '{curriculum_id}' not found.")
+    
+    # Return the task_list
+    return task_list
+
+def question_payload(record):
+    '''The fetch_question response dictionary for a Questions row'''
+    return {
+        'Content': record.content_id,
+        'Standard': record.standard,
+        'Objective': record.objective,
+        'Code': record.code,
+        'Question': record.question,
+        'Answer': record.answer,
+        'Distractor1': record.distractor_1,
+        'Distractor2': record.distractor_2,
+        'Distractor3': record.distractor_3,
+        'Description': record.description,
+        'Video': record.video,
+        'Difficulty': record.difficulty,
+        'Tags': record.tags
+    }
 
 def fetch_question(question_id, logger=None):
     '''
@@ -793,7 +984,6 @@ def fetch_question(question_id, logger=None):
     '''
     
     q_crud = CRUDHelper(Questions)
-    q_content = {}
     
     try:
         record = q_crud.read(task_key = question_id)[0]
@@ -803,26 +993,115 @@ def fetch_question(question_id, logger=None):
         #q_content['Content'] = content_query.content_id
         
         # The rest of the items come from the user CRUD
-        q_content['Content'] = record.content_id
-        q_content['Standard'] = record.standard
-        q_content['Objective'] = record.objective
-        q_content['Code'] = record.code
-        q_content['Question'] = record.question
-        q_content['Answer'] = record.answer
-        q_content['Distractor1'] = record.distractor_1
-        q_content['Distractor2'] = record.distractor_2
-        q_content['Distractor3'] = record.distractor_3
-        q_content['Description'] = record.description
-        q_content['Video'] = record.video
-        q_content['Difficulty'] = record.difficulty
-        q_content['Tags'] = record.tags
+        q_content = question_payload(record)
     except IndexError as ie:
         return f"Question ID not in database: {ie}"
     except Exception as e:
         return f"Unexpected error: {e}"
     else:
         return q_content
-        
+
+def fetch_question_json(question_id, logger=None):
+    '''
+    Function to fetch the serialized fetch_question response through the question cache
+    
+    Returns: JSON response body as bytes
+    
+    Notes:
+        - Hits are served from modules.cache.question_cache without touching the database
+        - Only found questions are cached; error messages are rebuilt on every request
+        - No caching while the question's shared version is unavailable (version < 0)
+    '''
+    version = question_cache.versions([question_id])[question_id]
+    body = question_cache.get(question_id, version) if version >= 0 else None
+    if body is not None:
+        return body
+    
+    question_data = fetch_question(question_id, logger)
+    body = encode(question_data)
+    if isinstance(question_data, dict) and version >= 0:
+        question_cache.set(question_id, body, version)
+    
+    return body
+
+def fetch_questions_json(question_ids, logger=None):
+    '''
+    Batch version of fetch_question_json
+    
+    Arg(s): question_ids as list of Questions.task_key
+    
+    Returns: dictionary task_key -> JSON bytes for every question that exists
+    
+    Notes: versions are read in one backend round trip, cache misses are loaded together with one query
+    '''
+    versions = question_cache.versions(question_ids)
+    bodies = {}
+    for question_id, version in versions.items():
+        body = question_cache.get(question_id, version) if version >= 0 else None
+        if body is not None:
+            bodies[question_id] = body
+    
+    missing = [question_id for question_id in dict.fromkeys(question_ids) if question_id not in bodies]
+    if missing:
+        for record in Questions.query.filter(Questions.task_key.in_(missing)).all():
+            body = encode(question_payload(record))
+            bodies[record.task_key] = body
+            if versions.get(record.task_key, -1) >= 0:
+                question_cache.set(record.task_key, body, versions[record.task_key])
+    
+    return bodies
+
+def fetch_curriculum_bundle(curriculum_id, logger=None):
+    '''
+    Function to build the task list and every question payload of a curriculum as one response
+    
+    Arg(s): curriculum_id as Curriculum.curriculum_id
+    
+    Returns: (body as JSON bytes, version as hex string)
+    
+    Notes:
+        - Body: {"curriculum", "version", "taskList", "questions": {task_key: fetch_question payload}}
+        - The version is a SHA-256 of the task list and the question payloads, so it changes exactly
+          when the curriculum's content does and serves as the ETag
+        - Question payloads are reused as cached bytes (fetch_questions_json)
+        - Raises ValueError for an unknown curriculum (see fetch_curriculum_task_list)
+    '''
+    task_list = fetch_curriculum_task_list(curriculum_id)
+    questions = fetch_questions_json(task_list, logger)
+    
+    digest = hashlib.sha256()
+    for task_key in task_list:
+        digest.update(encode(task_key))
+        digest.update(questions.get(task_key, b'null'))
+    version = digest.hexdigest()
+    
+    body = b''.join([
+        b'{"curriculum":', encode(curriculum_id),
+        b',"version":', encode(version),
+        b',"taskList":', encode(task_list),
+        b',"questions":{', b','.join(encode(task_key) + b':' + questions[task_key]
+                                          for task_key in task_list if task_key in questions),
+        b'}}'
+    ])
+    
+    return body, version
+        
+def fetch_project_test(task_key, logger=None):
+    '''
+    This function fetches the test suite of a project for the grader
+
+    Returns: Projects.test source ('' when the project has no tests yet)
+
+    Raises: ValueError when no project has this task_key
+    '''
+
+    row = db.session.query(Projects.test).filter(Projects.task_key == task_key).first()
+
+    if row is None:
+        raise ValueError(f"Project '{task_key}' not found.")
+
+    return row.test or ''
+
 def fetch_task_keys(user_id, logger=None):
     ''' Fetches task keys'''
     
@@ -861,9 +1140,19 @@ def update_question(question_id, question_data, logger=None):
             logger.warning(error_message)
             return error_message
 
+        # Question metadata (difficulty, standard, objective, tags) is part of the catalog
+        record = question[0]
+        catalog_changed = any(field in question_data and question_data[field] != getattr(record, field)
+                              for field in QUESTION_FIELDS)
+        
         # Use the question's id to perform the update
-        q_crud.update(id=question[0].id, **question_data)
+        q_crud.update(id=record.id, **question_data)
         logger.info(f"Question '{question_id}' updated successfully.")
+        
+        question_cache.invalidate([question_id, question_data.get('task_key')])
+        if catalog_changed:
+            catalog.bump()
+            assignment_cache.invalidate(fetch_catalog_user_ids(question_ids=[record.id]))
         return "Question successfully updated."
 
     except Exception as e:
@@ -883,102 +1172,550 @@ def new_question(question_data, username, logger=None):
         
         # Use the create method to add the new question details
         new_record = q_crud.create(**question_data)
+        catalog.bump()
+        question_cache.invalidate([question_data.get('task_key')])
         return "Question successfully created."
     
     except Exception as e:
         logger.error(f"Error adding new question: {e}")
         
+def xp_event_record(event):
+    '''
+    Validate one /update_xp event into XP column values
+    
+    Arg(s): event as dict
+    
+    Returns: (record, error) - record is a dictionary of XP_EVENT_FIELDS, error a message or None
+    
+    Notes:
+        - Numbers may arrive as JSON numbers or numeric strings; strings must fit their XP column
+        - elapsed_time is required because XP.elapsed_time is not nullable
+    '''
+    if not isinstance(event, dict):
+        return None, "XP event must be an object"
+    
+    event_id = event.get('event_id')
+    if event_id is not None and (not isinstance(event_id, str) or not 0 < len(event_id) <= 64):
+        return None, "event_id must be a string of at most 64 characters"
+    
+    if event.get('elapsed_time') is None:
+        return None, "elapsed_time is required"
+    
+    record = {field: event.get(field) for field in XP_EVENT_FIELDS}
+    try:
+        for field in XP_FLOAT_FIELDS + XP_INT_FIELDS:
+            value = record[field]
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError
+            record[field] = int(value) if field in XP_INT_FIELDS else float(value)
+            if not math.isfinite(record[field]):
+                raise ValueError
+    except (ValueError, OverflowError):
+        return None, f"{field} must be a number"
+    
+    for field, length in XP_STRING_FIELDS.items():
+        value = record[field]
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int)) or len(str(value)) > length:
+            return None, f"{field} must be a string of at most {length} characters"
+        record[field] = str(value)
+    
+    return record, None
+
+def normalize_xp_events(xp_data, user_id):
+    '''
+    Function to validate an /update_xp payload into XP insert dictionaries
+    
+    Arg(s): xp_data as dict (one event), list of dicts or {"events": [...]}, user_id as User.id
+    
+    Returns: (events, rejected)
+        - events: list of dictionaries with the XP columns, user_id, event_id and a server timestamp
+        - rejected: list of {'index', 'event_id', 'error'} for the events that failed validation
+    
+    Notes:
+        - event_id is an optional client-generated idempotency key (at most 64 characters)
+        - Events are validated one at a time (see xp_event_record), so one malformed event never
+          blocks the rest of the payload; only a payload that is not 1..XP_BATCH_LIMIT events is a 400
+        - Unknown keys are ignored
+    '''
+    
+    if isinstance(xp_data, dict) and isinstance(xp_data.get('events'), list):
+        xp_data = xp_data['events']
+    events = xp_data if isinstance(xp_data, list) else [xp_data]
+    
+    if not events or len(events) > XP_BATCH_LIMIT:
+        raise BadRequest(f"Send between 1 and {XP_BATCH_LIMIT} XP events per request.")
+    
+    received_at = datetime.utcnow()
+    normalized = []
+    rejected = []
+    for index, event in enumerate(events):
+        record, error = xp_event_record(event)
+        if error:
+            event_id = event.get('event_id') if isinstance(event, dict) else None
+            rejected.append({'index': index, 'event_id': event_id, 'error': error})
+            continue
+        
+        record.update({'user_id': user_id, 'event_id': event.get('event_id'), 'timestamp': received_at})
+        normalized.append(record)
+    
+    return normalized, rejected
+
 def update_xp_data(xp_data, logger=None):
     '''
     Function to update the XP table
     
-    Args: xp_data as dict, logger as app.logger
+    Args: xp_data as dict or list of dicts (see normalize_xp_events), logger as app.logger
+    
+    Returns: (number of events stored, list of rejected events - see normalize_xp_events)
+    
+    Raises: ServiceUnavailable when the events could not be committed (the client must resend)
     
     Notes:
         The required contents of the xp_dict are:
         dXP: float, question_id: string, elapsed_time: float, difficulty: float, possible_xp: float
         
-        Function queries the content_id, curriculum_id, standard, objective, tags    
+        Events go to the group commit buffer (modules.xp_buffer), which commits them with
+        multi-row inserts and updates the XP rollups in the same transaction; this call returns
+        only after that transaction has committed
     '''
     
+    # Get user_id
+    user_id = session.get('user_id')
+    if user_id is None:
+        raise Unauthorized("Please log in again")
+    
     try:
+        events, rejected = normalize_xp_events(xp_data, user_id)
+        if rejected:
+            logger.warning(f"Rejected {len(rejected)} malformed XP events from user {user_id}: {rejected[0]['error']}")
+        return xp_buffer.write(events), rejected
         
-        # Get username
-        user_id = session.get('user_id')
-        
-        # Add username to the xp_data dictionary
-        xp_data.update({'user_id': user_id})
-        
-        # Create the CRUDHelper for XP table
-        xp_crud = CRUDHelper(XP)
-        xp_crud.create(**xp_data)
-       
-        return "XP Table successfully updated"
+    except TimeoutError:
+        logger.warning(f"XP commit for user {user_id} timed out")
+        raise ServiceUnavailable("XP events were not stored yet, please resend.")
         
     except SQLAlchemyError as se:
         logger.error(f"SQL Error: {se}")
+        raise ServiceUnavailable("XP events could not be stored, please resend.")
+        
+    except BadRequest:
         raise
         
     except Exception as e:
         logger.error(f"Unexpected Error: {e}")
         raise
 
-def fetch_xp_data(username, last_fetched_date, logger=None):
+def fetch_xp_summary(user_id):
+    '''
+    Function to fetch the precomputed dashboard summaries for a user
+    
+    Arg(s): user_id as User.id
+    
+    Returns: dictionary from modules.rollups.build_xp_summary
+    
+    Notes:
+        Reads the XP rollups plus the (cached) assignments, never the raw XP history
+    '''
+    user_assignments, curriculum_order_map = fetch_user_assignments(user_id)
+    
+    summary = build_xp_summary(user_id, user_assignments)
+    summary['curriculumOrderMap'] = curriculum_order_map
+    
+    return summary
+
+def encode_xp_cursor(timestamp, xp_id):
+    '''Opaque keyset cursor for the XP row (timestamp, XP.id)'''
+    raw = json.dumps([timestamp.replace(tzinfo=None).isoformat(), xp_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_xp_cursor(cursor):
+    '''
+    Decode an XP cursor into (timestamp, XP.id)
+    
+    Notes:
+        - None or "" starts from the beginning of the history
+        - A plain ISO date (the legacy lastUpdate value) keeps the old strictly-after semantics
+    '''
+    if not cursor:
+        return datetime.min, 0
+    
+    try:
+        timestamp, xp_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(xp_id)
+    except (ValueError, TypeError, binascii.Error):
+        return datetime.fromisoformat(cursor), sys.maxsize
+
+def xp_record(entry):
+    '''Client-facing dictionary for an XP row'''
+    return {
+        "dXP": entry.dXP,
+        "possible_xp": entry.possible_xp,
+        "question_id": entry.question_id,
+        "curriculum_id": entry.curriculum_id,
+        "content_id": entry.content_id,
+        "difficulty": entry.difficulty,
+        "standard": entry.standard,
+        "objective": entry.objective,
+        "elapsed_time": entry.elapsed_time,
+        "timestamp": entry.timestamp.replace(tzinfo=None)
+    }
+
+# Keys of an xp_record dictionary, in order
+XP_RECORD_FIELDS = ("dXP", "possible_xp", "question_id", "curriculum_id", "content_id", "difficulty",
+                    "standard", "objective", "elapsed_time", "timestamp")
+
+# Columns needed to build xp_record dictionaries
+XP_RECORD_COLUMNS = (XP.id, XP.dXP, XP.possible_xp, XP.question_id, XP.curriculum_id, XP.content_id,
+                     XP.difficulty, XP.standard, XP.objective, XP.elapsed_time, XP.timestamp)
+
+def xp_page(entries, limit):
+    '''
+    Build a fetch_xp_data page from up to limit + 1 XP rows ordered by (timestamp, id)
+    
+    Notes: the extra row only tells whether there is more XP after the page
+    '''
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    last_entry = entries[-1]
+    
+    return {
+        "xpData": [xp_record(entry) for entry in entries],
+        "mostRecentDatetime": last_entry.timestamp.replace(tzinfo=None).isoformat(),  # Return as ISO 8601 string
+        "nextCursor": encode_xp_cursor(last_entry.timestamp, last_entry.id),
+        "hasMore": has_more
+    }
+
+def fetch_xp_data(username, cursor, logger=None, limit=None):
     """
-    Function to fetch incremental XP data for a user
+    Function to fetch one page of incremental XP data for a user
     
-    Arg(s): last_fetched_date as datetime, logger as app.logger
+    Arg(s): username as string, cursor as opaque cursor string (or legacy ISO date),
+            logger as app.logger, limit as int page size
     
     Returns:
-        - dXP as float, curriculum_id as string, elapsed_time as float,
-        - content_id as string, p
+        None if there is no XP after the cursor, otherwise a dictionary with
+        - xpData: list of XP records ordered by (timestamp, id)
+        - mostRecentDatetime: ISO timestamp of the last record in the page
+        - nextCursor: cursor to send back for the next page
+        - hasMore: True if more XP exists after this page
     
+    Notes:
+        - Keyset pagination on (timestamp, id) so rows sharing a timestamp are never skipped
+        - Only the needed columns are selected, no ORM objects are built
     """
     
+    limit = max(1, min(int(limit or XP_PAGE_SIZE), XP_PAGE_SIZE_MAX))
+    
     try:
         
-        last_fetched_date = datetime.fromisoformat(last_fetched_date)
-                
+        last_timestamp, last_id = decode_xp_cursor(cursor)
+        
         new_xp_entries = (
-            db.session.query(XP)
-            .join(User)
-            .filter(User.username==username, XP.timestamp > last_fetched_date)
+            db.session.query(*XP_RECORD_COLUMNS)
+            .join(User, User.id == XP.user_id)
+            .filter(User.username == username)
+            .filter(or_(XP.timestamp > last_timestamp,
+                        and_(XP.timestamp == last_timestamp, XP.id > last_id)))
+            .order_by(XP.timestamp, XP.id)
+            .limit(limit + 1)
             .all()
         )
         
         # Check if there are any new entries
-        if new_xp_entries:
-            # Find the most recent timestamp in the new entries
-            most_recent_timestamp = max(entry.timestamp.replace(tzinfo=None) for entry in new_xp_entries)
-            
-            # Prepare the new XP data for return (with relevant fields)
-            xp_data = [{
-                "dXP": entry.dXP,
-                "possible_xp": entry.possible_xp,
-                "question_id": entry.question_id,
-                "curriculum_id": entry.curriculum_id,
-                "content_id": entry.content_id,
-                "difficulty": entry.difficulty,
-                "standard": entry.standard,
-                "objective": entry.objective,
-                "elapsed_time": entry.elapsed_time,
-                "timestamp": entry.timestamp.replace(tzinfo=None)
-            } for entry in new_xp_entries]
-            
-            # Return the data and the most recent timestamp
-            return {
-                "xpData": xp_data,
-                "mostRecentDatetime": most_recent_timestamp.isoformat()  # Return as ISO 8601 string
-            }
-        else:
-            # No new data, return None or an empty response
+        if not new_xp_entries:
             return None
+        
+        return xp_page(new_xp_entries, limit)
 
+    except ValueError as ve:
+        if logger:
+            logger.warning(f"Invalid XP cursor {cursor}: {ve}")
+        return None
+    
     except Exception as e:
         # Handle any exceptions
-        print(f"Error fetching XP data: {e}")
+        if logger:
+            logger.error(f"Error fetching XP data: {e}")
         return None
 
+def fetch_xp_data_for_users(user_ids, cursor, logger=None, limit=None):
+    '''
+    Batch version of fetch_xp_data keyed by User.id
+    
+    Arg(s): user_ids as list of User.id, cursor as opaque cursor string (or legacy ISO date),
+            logger as app.logger, limit as int page size per user
+    
+    Returns: dictionary User.id -> fetch_xp_data page for users with XP after the cursor
+    
+    Notes:
+        - One column-only query for every user instead of one ORM query per user
+        - Only the first page of each user is read (row_number per user, same limit as fetch_xp_data);
+          the rest is paged with the user's nextCursor through fetch_xp_data
+        - Raises ValueError for a malformed cursor
+    '''
+    
+    limit = max(1, min(int(limit or XP_PAGE_SIZE), XP_PAGE_SIZE_MAX))
+    last_timestamp, last_id = decode_xp_cursor(cursor)
+    
+    row_number = func.row_number().over(partition_by=XP.user_id, order_by=(XP.timestamp, XP.id))
+    ranked = (
+        db.session.query(XP.user_id, *XP_RECORD_COLUMNS, row_number.label('row_number'))
+        .filter(XP.user_id.in_(user_ids))
+        .filter(or_(XP.timestamp > last_timestamp,
+                    and_(XP.timestamp == last_timestamp, XP.id > last_id)))
+        .subquery()
+    )
+    
+    xp_rows = (
+        db.session.query(ranked)
+        .filter(ranked.c.row_number <= limit + 1)
+        .order_by(ranked.c.user_id, ranked.c.timestamp, ranked.c.id)
+        .all()
+    )
+    
+    return {user_id: xp_page(list(entries), limit)
+            for user_id, entries in itertools.groupby(xp_rows, key=lambda row: row.user_id)}
+
+# Columns a user XP export may select, in default order
+XP_EXPORT_COLUMNS = {
+    "question_id": XP.question_id,
+    "content_id": XP.content_id,
+    "curriculum_id": XP.curriculum_id,
+    "dXP": XP.dXP,
+    "possible_xp": XP.possible_xp,
+    "difficulty": XP.difficulty,
+    "standard": XP.standard,
+    "objective": XP.objective,
+    "tags": XP.tags,
+    "elapsed_time": XP.elapsed_time,
+    "timestamp": XP.timestamp
+}
+
+# Columns a user assignment export may select, in default order
+ASSIGNMENT_EXPORT_COLUMNS = ("content", "curriculum", "task_key", "difficulty", "standard", "objective", "tags")
+
+def parse_export_columns(columns, allowed):
+    '''
+    Turn a comma separated column list into an ordered list of allowed column names
+    
+    Notes: None or "" selects every allowed column; an unknown name raises BadRequest
+    '''
+    if not columns:
+        return list(allowed)
+    
+    selected = [column.strip() for column in columns.split(',') if column.strip()]
+    unknown = [column for column in selected if column not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown column(s) {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    
+    return selected
+
+def parse_export_list(value):
+    '''Comma separated filter value -> list of values (None when the filter is not set)'''
+    values = [item.strip() for item in (value or '').split(',') if item.strip()]
+    return values or None
+
+def export_user_xp_rows(user_id, start=None, end=None, content=None, curriculum=None, columns=None):
+    '''
+    Stream a user's XP rows for export
+    
+    Arg(s): user_id as User.id, start/end as optional ISO datetimes (start inclusive, end exclusive),
+            content/curriculum as optional comma separated XP.content_id / XP.curriculum_id values,
+            columns as list of XP_EXPORT_COLUMNS names
+    
+    Returns: generator of dictionaries holding only the selected columns, oldest first
+    
+    Notes:
+        - Only the selected columns are read, XP_STREAM_BATCH rows per round trip (yield_per)
+        - Bad dates raise BadRequest before anything is streamed
+    '''
+    
+    query = (
+        db.session.query(*(XP_EXPORT_COLUMNS[column].label(column) for column in columns))
+        .filter(XP.user_id == user_id)
+        .order_by(XP.timestamp, XP.id)
+    )
+    
+    try:
+        if start:
+            query = query.filter(XP.timestamp >= datetime.fromisoformat(start))
+        if end:
+            query = query.filter(XP.timestamp < datetime.fromisoformat(end))
+    except ValueError:
+        raise BadRequest("start and end must be ISO dates or datetimes")
+    
+    if parse_export_list(content):
+        query = query.filter(XP.content_id.in_(parse_export_list(content)))
+    if parse_export_list(curriculum):
+        query = query.filter(XP.curriculum_id.in_(parse_export_list(curriculum)))
+    
+    def stream():
+        result = db.session.execute(query.statement.execution_options(yield_per=XP_STREAM_BATCH))
+        try:
+            for row in result:
+                yield dict(row._mapping)
+        finally:
+            result.close()
+    
+    return stream()
+
+def export_user_assignment_rows(user_id, content=None, curriculum=None, columns=None):
+    '''
+    Stream a user's assigned questions for export, one row per (content, curriculum, question)
+    
+    Arg(s): user_id as User.id, content/curriculum as optional comma separated filters,
+            columns as list of ASSIGNMENT_EXPORT_COLUMNS names
+    
+    Returns: generator of dictionaries holding only the selected columns
+    
+    Notes:
+        Assignments have no dates, so this export has no date range; the structure comes from
+        the assignment cache / catalog snapshot rather than the database
+    '''
+    
+    user_assignments, _ = fetch_user_assignments(user_id)
+    contents = parse_export_list(content)
+    curriculums = parse_export_list(curriculum)
+    
+    def stream():
+        for content_id, assigned in user_assignments.items():
+            if contents and content_id not in contents:
+                continue
+            for curriculum_id, questions in assigned.items():
+                if curriculums and curriculum_id not in curriculums:
+                    continue
+                for q in questions:
+                    row = {"content": content_id, "curriculum": curriculum_id, **q}
+                    yield {column: row[column] for column in columns}
+    
+    return stream()
+
+def fetch_classroom_usernames(class_code, logger=None):
+    '''
+    Function to fetch the usernames enrolled in a classroom the current admin may see
+    
+    Notes:
+        - Teachers only see classrooms they manage, system admin see all classrooms
+    '''
+    
+    user_id = session.get('user_id')
+    role = session.get('role')
+    
+    if role not in ('teacher', 'system'):
+        raise Unauthorized("Not Authorized!")
+    
+    query = (
+        db.session.query(User.username)
+        .join(ClassroomUser, ClassroomUser.user_id == User.id)
+        .join(Classroom, Classroom.id == ClassroomUser.classroom_id)
+        .filter(Classroom.code == class_code)
+    )
+    if role == 'teacher':
+        query = query.filter(Classroom.admin_id == user_id)
+    
+    return sorted(row[0] for row in query.all())
+
+def fetch_rosters(class_codes, logger=None):
+    '''
+    Roster service: the students enrolled in each classroom
+    
+    Arg(s): class_codes as iterable of Classroom.code, logger as app.logger
+    
+    Returns: {Classroom.code: {'usernames': [...], 'emails': [...]}} for every code given (empty lists
+             for a classroom without students or an unknown code)
+    
+    Notes:
+        - Cached rosters come from roster_cache; the rest are read with one joined, column-only
+          query for all of them, so the cost no longer depends on the size of the User table
+        - Callers check access to the classrooms first
+    '''
+    
+    class_codes = list(dict.fromkeys(class_codes))
+    rosters = roster_cache.get_many(class_codes)
+    missing = [code for code in class_codes if code not in rosters]
+    
+    if missing:
+        loaded = {code: {'usernames': [], 'emails': []} for code in missing}
+        rows = (
+            db.session.query(Classroom.code, User.username, User.email)
+            .join(ClassroomUser, ClassroomUser.classroom_id == Classroom.id)
+            .join(User, User.id == ClassroomUser.user_id)
+            .filter(Classroom.code.in_(missing))
+            .order_by(Classroom.code, User.id)
+        )
+        for code, username, email in rows:
+            if username:
+                loaded[code]['usernames'].append(username)
+            if email:
+                loaded[code]['emails'].append(email)
+        roster_cache.set_many(loaded)
+        rosters.update(loaded)
+    
+    return {code: rosters[code] for code in class_codes}
+
+def fetch_user_classrooms(user_id):
+    '''(Classroom.code, Classroom.admin_id) of every classroom a user is enrolled in (for roster/ACL invalidation)'''
+    return db.session.query(Classroom.code, Classroom.admin_id).\
+        join(ClassroomUser, ClassroomUser.classroom_id == Classroom.id).\
+        filter(ClassroomUser.user_id == user_id).\
+        all()
+
+def fetch_student_profiles(usernames, last_fetched_date, logger=None):
+    '''
+    Function to build /get_student_profile payloads for many students at once
+    
+    Arg(s): usernames as list, last_fetched_date as XP cursor or ISO string, logger as app.logger
+    
+    Returns: dictionary username -> profile (same keys as the /get_student_profile data)
+    
+    Notes:
+        - Users, XP and assignment ids are each fetched with one grouped query keyed by User.id
+        - XP is the first page after last_fetched_date per student; xpNextCursor/xpHasMore page the
+          rest through /xp_sync
+        - Assignment structure comes from the assignment cache / catalog snapshot
+    '''
+    
+    users = (
+        db.session.query(User.id, User.username, User.current_curriculum)
+        .filter(User.username.in_(usernames))
+        .all()
+    )
+    user_ids = [user.id for user in users]
+    
+    if not user_ids:
+        return {}
+    
+    assignments = fetch_assignments_for_users(user_ids, logger)
+    xp_by_user = fetch_xp_data_for_users(user_ids, last_fetched_date, logger)
+    
+    profiles = {}
+    for user in users:
+        user_assignments, curriculum_order_map = assignments[user.id]
+        current_content = next((content for content, currics in user_assignments.items()
+                                if user.current_curriculum in currics), None)
+        
+        profile = {
+            'userAssignments': user_assignments,
+            'curriculumOrderMap': curriculum_order_map,
+            'xpUsername': user.username,
+            'currentContent': current_content
+        }
+        
+        xp_data = xp_by_user.get(user.id)
+        if xp_data:
+            profile.update({'xpData': xp_data['xpData'],
+                            'xpLastFetchedDatetime': xp_data['mostRecentDatetime'],
+                            'xpNextCursor': xp_data['nextCursor'],
+                            'xpHasMore': xp_data['hasMore']})
+        
+        profiles[user.username] = profile
+    
+    return profiles
+
 def fetch_admin_content(username, logger=None):
     '''
     Fetch content, base curriculums, and custom curriculums for an admin.
@@ -1147,7 +1884,6 @@ def fetch_classroom_data(class_code, logger=None):
     try:
         
         # Fetch the user.id and admin status for filtering
-        system_ids = session.get('system_ids')
         user_id = session.get('user_id')
         role = session.get('role')
         
@@ -1162,26 +1898,13 @@ def fetch_classroom_data(class_code, logger=None):
         class_id = classroom.id
         
         # Verify the user.id is system or the creator of the class_code
-        if not (user_id == admin_id or role in ('system', 'teacher')):
+        if not (user_id == admin_id or role == 'system'):
             raise Exception(f"User does not have access to classroom {class_code}")
         
-        # User CRUDHelper to get records via ClassroomUser
-        cu_helper = CRUDHelper(ClassroomUser)
-        cu_users = cu_helper.read(classroom_id=class_id)
-        
-        # Extract the user IDs from ClassroomUser records
-        student_ids = [cu.user_id for cu in cu_users]
-        
-        # User CRUDHelper to get records from User
-        u_helper = CRUDHelper(User)
-        students = u_helper.read()
-        students = [student for student in students if student.id in student_ids]
-        
-        # Extract student emails from User records
-        student_emails = [student.email for student in students if student.email]
-
-        # Extract student usernames from User records
-        student_usernames = [student.username for student in students if student.username]
+        # Enrolled student usernames and emails from the roster service
+        roster = fetch_rosters([class_code], logger)[class_code]
+        student_usernames = roster['usernames']
+        student_emails = roster['emails']
         
         # Get content already assigned to this classroom
         content_query = db.session.query(ClassroomContent.content_id).filter_by(classroom_id=class_id).all()
@@ -1191,18 +1914,8 @@ def fetch_classroom_data(class_code, logger=None):
         content_query = Content.query.filter(Content.id.in_(content_ids)).all()
         assigned_content = [c.content_id for c in content_query]
         
-        # Query all content areas filtered for teachers - all for system admin
-        if role == 'system':
-            available_content = Content.query.with_entities(Content.content_id).all()
-        else:
-            available_content = (
-                Content.query
-                .filter((Content.creator_id == user_id) | (Content.creator_id.in_(system_ids)))
-                .with_entities(Content.content_id)
-                .all()
-            )
-        
-        available_content = [c[0] for c in available_content]
+        # Content the admin may assign: their own and system content for teachers, all for system admin
+        available_content = visibility_index.visible_content(user_id, role)
         
         return{'usernames': student_usernames, 'emails': student_emails, 'availableContent': available_content, 'assignedContent': assigned_content}
         
@@ -1253,6 +1966,8 @@ def add_classroom_assignments(class_code, assignments, logger=None):
             # Fetch all users in one query and create a dictionary
             user_dict = {user.email: user for user in User.query.filter(User.email.in_(students)).all()}
             
+            # Get existing members to prevent duplicate ClassroomUser rows
+            existing_members = {row[0] for row in db.session.query(ClassroomUser.user_id).filter_by(classroom_id=class_id).all()}
             
             # Iterate through the list of student emails
             for email in students:
@@ -1264,9 +1979,13 @@ def add_classroom_assignments(class_code, assignments, logger=None):
                     status['not_found_emails'].append(email)
                     continue
                 
+                if user.id in existing_members:
+                    continue
+                
                 # Assign the user to the classroom by adding a new record in ClassroomUsers
                 classroom_user = ClassroomUser(classroom_id=classroom.id, user_id=user.id)
                 db.session.add(classroom_user)
+                existing_members.add(user.id)
                      
         if content:
     
@@ -1295,6 +2014,12 @@ def add_classroom_assignments(class_code, assignments, logger=None):
         return status
     
     db.session.commit()
+    
+    # New students and new content both change the assignments of the whole classroom
+    assignment_cache.invalidate(fetch_classroom_user_ids([class_id]))
+    if students:
+        roster_cache.invalidate([class_code])
+        visibility_index.invalidate([classroom.admin_id])
 
     return status    
 
@@ -1333,6 +2058,9 @@ def remove_classroom_assignments(class_code, removals, logger=None):
         
     # Extract the Classroom.id
     class_id = classroom.id
+    
+    # Users whose cached assignments change - removed students plus the remaining class
+    affected_user_ids = fetch_classroom_user_ids([class_id])
         
     try:
         
@@ -1369,6 +2097,10 @@ def remove_classroom_assignments(class_code, removals, logger=None):
             ).delete(synchronize_session=False)
     
         db.session.commit()
+        assignment_cache.invalidate(affected_user_ids)
+        if students:
+            roster_cache.invalidate([class_code])
+            visibility_index.invalidate([classroom.admin_id])
 
         return status
 
@@ -1395,6 +2127,7 @@ def add_new_content(item_id, table, username, logger=None):
             c_CRUD = CRUDHelper(Content)
             # Add the new content_id
             c_CRUD.create(content_id = item_id, creator_id=user.id)
+            catalog.bump()
             # Return a success message
             return f"content_id {item_id} added to the database"
         
@@ -1403,6 +2136,7 @@ def add_new_content(item_id, table, username, logger=None):
             c_CRUD = CRUDHelper(Curriculum)
             # Add the new curriculum_id
             c_CRUD.create(curriculum_id = item_id, creator_id=user.id)
+            catalog.bump()
             # Return a success message
             return f"curriculum_id {item_id} added to the database"
         
@@ -1475,9 +2209,17 @@ def update_content_assignments(data, logger=None):
                 db.session.delete(pairing)
                 logger.info(f"Removed pairing: Content ID {content_id}, Curriculum ID {pairing.curriculum_id}")
 
+        if new_curriculum_ids == existing_curriculum_ids:
+            logger.info("Content assignments unchanged.")
+            return
+
         # Commit changes to the database
         db.session.commit()
         logger.info("Content assignments successfully updated.")
+        
+        # Publish the new structure and drop the cached trees of the users assigned this content
+        catalog.bump()
+        assignment_cache.invalidate(fetch_catalog_user_ids(content_ids=[content_id]))
 
     except ValueError as ve:
         if logger:
@@ -1549,9 +2291,17 @@ def update_curriculum_assignments(data, logger=None):
                 db.session.delete(pairing)
                 logger.info(f"Removed pairing: Curriculum ID {curriculum_id}, Question ID {pairing.question_id}")
 
+        if new_question_ids == existing_question_ids:
+            logger.info("Curriculum assignments unchanged.")
+            return
+
         # Commit changes to the database
         db.session.commit()
         logger.info("Curriculum assignments successfully updated.")
+        
+        # Publish the new structure and drop the cached trees of the users that see this curriculum
+        catalog.bump()
+        assignment_cache.invalidate(fetch_catalog_user_ids(curriculum_ids=[curriculum_id]))
 
     except ValueError as ve:
         if logger:
@@ -1584,6 +2334,10 @@ def add_new_classroom(class_code, class_description, logger=None):
         # Create the new classroom record
         class_CRUD.create(code = class_code, name = class_description, admin_id = user_id)
         
+        # The teacher's classroom scope changed - API tokens carrying the old scope are retired
+        token_revocations.revoke(user_id)
+        roster_cache.invalidate([class_code])
+        
         # Return success message        
         return f"Classroom: {class_code} successfully added!"
     
@@ -1595,42 +2349,61 @@ def add_new_classroom(class_code, class_description, logger=None):
         logger.debug(f"Unexpected error writing classroom {class_code} to database: {e}")
         raise e
     
-def fetch_student_xp_for_teacher(logger=None):
+def fetch_student_xp_for_teacher(since=None, class_code=None, logger=None):
     '''
-    This function grabs raw xp data for all students assigned to a teacher (all classrooms)
+    This function streams raw xp data for the students in the caller's classrooms
+
+    Arg(s): since as optional ISO datetime string (only XP after it), class_code as optional
+            Classroom.code to limit the feed to one classroom, logger as app.logger
 
-    Arg(s): logger as app.logger
+    Returns: generator of XP records as dictionaries (username joined in), oldest first
 
-    Returns: XP data as a list of records as dictionaries
+    Notes:
+        - Teachers get students enrolled in any classroom they manage, system admin get everyone
+        - A class_code the caller does not manage raises Unauthorized
+        - Column-only query streamed with a server-side cursor, XP_STREAM_BATCH rows at a time
     '''
 
-    usernames = ['monty', 'amontanus', 'april']
+    user_id = session.get('user_id')
+    role = session.get('role')
 
-    try:
+    if role not in ('teacher', 'system'):
+        raise Unauthorized("Not Authorized!")
 
-        xp_query = (
-            db.session.query(XP)
-            .join(User)
-            .filter(User.username.in_(usernames))
-            .all()
+    query = (
+        db.session.query(User.username, *XP_RECORD_COLUMNS)
+        .select_from(XP)
+        .join(User, User.id == XP.user_id)
+        .order_by(XP.timestamp, XP.id)
+    )
+
+    if class_code:
+        classroom = Classroom.query.filter_by(code=class_code).first()
+        if classroom is None or (role == 'teacher' and classroom.admin_id != user_id):
+            raise Unauthorized(f"Not authorized for classroom {class_code}")
+        students = db.session.query(ClassroomUser.user_id).filter(ClassroomUser.classroom_id == classroom.id)
+        query = query.filter(XP.user_id.in_(students))
+
+    elif role == 'teacher':
+        students = (
+            db.session.query(ClassroomUser.user_id)
+            .join(Classroom, Classroom.id == ClassroomUser.classroom_id)
+            .filter(Classroom.admin_id == user_id)
         )
+        query = query.filter(XP.user_id.in_(students))
 
-        xp_data = [{
-                "username": entry.user.username,
-                "dXP": entry.dXP,
-                "possible_xp": entry.possible_xp,
-                "question_id": entry.question_id,
-                "curriculum_id": entry.curriculum_id,
-                "content_id": entry.content_id,
-                "difficulty": entry.difficulty,
-                "standard": entry.standard,
-                "objective": entry.objective,
-                "elapsed_time": entry.elapsed_time,
-                "timestamp": entry.timestamp.replace(tzinfo=None)
-            } for entry in xp_query]
-
-        return xp_data
-    
-    except Exception as e:
+    if since:
+        try:
+            query = query.filter(XP.timestamp > datetime.fromisoformat(since))
+        except ValueError:
+            raise BadRequest(f"Invalid since value {since}, expected an ISO datetime")
+
+    def stream():
+        result = db.session.execute(query.statement.execution_options(yield_per=XP_STREAM_BATCH))
+        try:
+            for entry in result:
+                yield {"username": entry.username, **xp_record(entry)}
+        finally:
+            result.close()
 
-        raise e
\ No newline at end of file
+    return stream()
\ No newline at end of file
@@ -0,0 +1,257 @@
+# Import packages
+import hashlib, json, logging, time
+from concurrent.futures import ThreadPoolExecutor
+from modules.cache import grade_cache
+from modules.sandbox import SandboxBusy, SandboxPool
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Characters of captured student output and of each test message kept in a grade
+MAX_OUTPUT = 4000
+MAX_MESSAGE = 500
+
+####################################################################################
+#### Grader ########################################################################
+####################################################################################
+
+# Runs inside a sandbox child: executes the submission, then the project's tests in a namespace of their own
+# seeded with the submission's top-level names, and writes the report to the sandbox's report pipe (fd 3)
+GRADER = r'''
+import contextlib, io, json, os, signal, time, types, unittest
+
+class TestTimeout(BaseException):
+    pass
+
+class CaseProblem(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _alarm(signum, frame):
+    raise TestTimeout()
+
+def _message(error):
+    if isinstance(error, TestTimeout):
+        return 'timeout', None
+    if isinstance(error, CaseProblem):
+        return error.status, str(error)
+    if isinstance(error, AssertionError):
+        return 'failed', str(error) or 'assertion failed'
+    return 'error', f"{type(error).__name__}: {error}"
+
+def _timed(fn, seconds):
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        fn()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _case(cls, method):
+    def run():
+        result = unittest.TestResult()
+        cls(method).run(result)
+        if result.skipped:
+            raise unittest.SkipTest(result.skipped[0][1])
+        if result.failures:
+            raise CaseProblem('failed', result.failures[0][1].strip().splitlines()[-1])
+        if result.errors:
+            raise CaseProblem('error', result.errors[0][1].strip().splitlines()[-1])
+    return run
+
+def _collect(before, namespace):
+    for name, value in list(namespace.items()):
+        if before.get(name) is value or not name.startswith(('test', 'Test')):
+            continue
+        if isinstance(value, types.FunctionType):
+            yield name, value
+        elif isinstance(value, type) and issubclass(value, unittest.TestCase):
+            for method in unittest.TestLoader().getTestCaseNames(value):
+                yield f"{name}.{method}", _case(value, method)
+
+def _grade(code, test, seconds, max_output, max_message):
+    report_pipe = os.fdopen(3, 'w')
+    signal.signal(signal.SIGALRM, _alarm)
+    report = {'tests': [], 'error': None}
+    submission = {'__name__': '__submission__'}
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            _timed(lambda: exec(compile(code, '<submission>', 'exec'), submission), seconds)
+        except BaseException as e:
+            report['error'] = 'submission: ' + (_message(e)[1] or f"timed out after {seconds:g}s")
+        else:
+            namespace = {name: value for name, value in submission.items() if not name.startswith('__')}
+            namespace['__name__'] = '__tests__'
+            before = dict(namespace)
+            try:
+                exec(compile(test, '<tests>', 'exec'), namespace)
+                tests = list(_collect(before, namespace))
+            except BaseException as e:
+                report['error'] = 'tests: ' + (_message(e)[1] or 'timed out')
+                tests = []
+            for name, fn in tests:
+                status, message = 'passed', None
+                start = time.perf_counter()
+                try:
+                    _timed(fn, seconds)
+                except unittest.SkipTest as e:
+                    status, message = 'skipped', str(e)
+                except BaseException as e:
+                    status, message = _message(e)
+                    if status == 'timeout':
+                        message = f"timed out after {seconds:g}s"
+                report['tests'].append({'name': name, 'status': status, 'ms': (time.perf_counter() - start) * 1000,
+                                        'message': message[:max_message] if message else None})
+    report['output'] = output.getvalue()[:max_output]
+    report_pipe.write(json.dumps(report))
+    report_pipe.close()
+'''
+
+def grader_source(code, test, test_seconds):
+    '''The program run in the sandbox to grade one submission'''
+    return f"{GRADER}\n_grade({code!r}, {test!r}, {test_seconds!r}, {MAX_OUTPUT}, {MAX_MESSAGE})\n"
+
+def source_hash(source):
+    return hashlib.sha256((source or '').encode('utf-8')).hexdigest()
+
+def grade_report(result):
+    '''
+    Turn a sandbox result (run with report=True) into a grade
+
+    Returns: dictionary with score (0-1 of the tests that ran), passed, total, tests (name, status,
+             ms, message per test), error, output, timed_out and run_ms (time spent in the tests)
+    '''
+    try:
+        report = json.loads(result['report'] or 'null')
+    except ValueError:
+        report = None
+
+    if not isinstance(report, dict):
+        # The grader never finished: wall-clock or CPU limit, or the submission killed the process
+        error = result['stderr'].strip().splitlines()[-1] if result['stderr'].strip() else 'Error: grading did not finish'
+        report = {'tests': [], 'error': error, 'output': ''}
+
+    counted = [test for test in report['tests'] if test['status'] != 'skipped']
+    passed = sum(test['status'] == 'passed' for test in counted)
+    return {
+        'score': passed / len(counted) if counted else 0.0,
+        'passed': passed,
+        'total': len(counted),
+        'tests': report['tests'],
+        'error': report['error'],
+        'output': report['output'],
+        'timed_out': result['timed_out'] or any(test['status'] == 'timeout' for test in report['tests']),
+        'run_ms': sum(test['ms'] for test in report['tests'])
+    }
+
+def cacheable_grade(grade):
+    '''Grades cut short by a time limit depend on load, so they are never cached'''
+    return not grade['timed_out'] and grade['error'] != 'Error: grading did not finish'
+
+####################################################################################
+#### Service #######################################################################
+####################################################################################
+
+class ProjectGrader:
+    '''
+    Server-side grading of project submissions against Projects.test
+
+    Notes:
+        - Projects.test is Python source defining `test_*` functions (plain asserts) and/or
+          unittest.TestCase classes; it runs in its own namespace seeded with the submission's
+          top-level names, so tests call the student's functions directly while the submission
+          cannot see or replace the tests through its globals
+        - Each grade runs in its own sandbox child of a dedicated SandboxPool (same rlimits and
+          wall-clock limit as /run_code, separate workers so a batch never queues students' Run
+          clicks); each test also gets test_seconds of wall-clock time
+        - Grades are cached in grade_cache by (sha256 of the code, sha256 of the test), so regrading
+          an unchanged submission, or the same code handed in twice, does not run again
+        - grade_batch() fans a classroom's submissions out over the pool's worker processes
+        - The grader hands its report back on the sandbox's report pipe, not stdout, so nothing the
+          submission prints can pass for a report and there is no marker in the program to find
+        - Needs the fork-based sandbox (see modules.sandbox.SUPPORTED); without it every grade
+          comes back as "grading did not finish"
+    '''
+    def __init__(self, size=4, test_seconds=2.0, max_batch=500, **pool_options):
+        self.pool = SandboxPool(size=size, **pool_options)
+        self.test_seconds = test_seconds
+        self.max_batch = max_batch
+        self.graded = 0
+        self.batches = 0
+
+    def configure(self, size=None, test_seconds=None, max_batch=None, **pool_options):
+        '''Apply the app config (called once at app start up, before the first grade)'''
+        for name, value in (('test_seconds', test_seconds), ('max_batch', max_batch)):
+            if value is not None:
+                setattr(self, name, value)
+        self.pool.configure(size=size, **pool_options)
+
+    def grade(self, code, test, cache=None):
+        '''
+        Grade one submission
+
+        Arg(s): code as the student's source, test as Projects.test, cache as an optional RunResultCache
+
+        Returns: grade dictionary (see grade_report) plus code_hash, test_hash and cached
+
+        Raises: SandboxBusy when the grading queue is full
+        '''
+        cache = cache or grade_cache
+        code_hash, test_hash = source_hash(code), source_hash(test)
+
+        def run():
+            return grade_report(self.pool.run(grader_source(code or '', test or '', self.test_seconds), report=True))
+
+        grade = cache.get_or_run(f"{code_hash}:{test_hash}", run, cacheable_grade)
+        self.graded += 1
+        return {**grade, 'code_hash': code_hash, 'test_hash': test_hash, 'cached': grade.get('cached', False)}
+
+    def grade_batch(self, submissions, test, cache=None):
+        '''
+        Grade a classroom's submissions in parallel
+
+        Arg(s): submissions as a list of {'username': str, 'code': str}, test as Projects.test
+
+        Returns: dictionary with results (one grade per submission, in order, with its username),
+                 graded, cached, seconds and grades_per_second
+
+        Raises: ValueError when submissions is malformed or larger than max_batch
+        '''
+        if not isinstance(submissions, list) or not all(isinstance(item, dict) for item in submissions):
+            raise ValueError("submissions must be a list of {'username', 'code'} objects")
+        if len(submissions) > self.max_batch:
+            raise ValueError(f"At most {self.max_batch} submissions per batch")
+
+        def grade_one(submission):
+            try:
+                grade = self.grade(submission.get('code', ''), test, cache)
+            except SandboxBusy as sb:
+                logger.warning(f"Grading {submission.get('username')} rejected: {sb}")
+                grade = {'score': 0.0, 'passed': 0, 'total': 0, 'tests': [], 'output': '', 'timed_out': False,
+                         'error': 'Error: the grader is busy, please regrade this submission', 'cached': False}
+            return {'username': submission.get('username'), **grade}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max(1, min(self.pool.size, len(submissions)))) as executor:
+            results = list(executor.map(grade_one, submissions))
+        seconds = time.perf_counter() - start
+        self.batches += 1
+
+        return {
+            'results': results,
+            'graded': len(results),
+            'cached': sum(result['cached'] for result in results),
+            'seconds': seconds,
+            'grades_per_second': len(results) / seconds if seconds else 0.0
+        }
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def stats(self):
+        return {'graded': self.graded, 'batches': self.batches, 'test_seconds': self.test_seconds,
+                'pool': self.pool.stats(), 'cache': grade_cache.stats()}
+
+# Process-wide grader - app.py applies the config
+project_grader = ProjectGrader()
@@ -23,6 +23,9 @@ class User(db.Model):
         return f'<User: {self.username}>'
 
 class Classroom(db.Model):
+    __table_args__ = (
+        db.Index('ix_classroom_admin_id', 'admin_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(120), unique=True, nullable=False, index=True)
     admin_id = db.Column(db.Integer, db.ForeignKey('admin.id'), nullable=False)
@@ -30,6 +33,10 @@ class Classroom(db.Model):
     admin = db.relationship('Admin', backref='classrooms')
 
 class ClassroomUser(db.Model):
+    __table_args__ = (
+        db.Index('uq_classroom_user_user_id_classroom_id', 'user_id', 'classroom_id', unique=True),
+        db.Index('ix_classroom_user_classroom_id', 'classroom_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     classroom_id = db.Column(db.Integer, db.ForeignKey('classroom.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -39,7 +46,12 @@ class ClassroomUser(db.Model):
     user = db.relationship('User', backref='classroom_users')
 
 class XP(db.Model):
+    __table_args__ = (
+        db.Index('ix_xp_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
+        db.Index('uq_xp_user_id_event_id', 'user_id', 'event_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(64))
     dXP = db.Column(db.Float)
     question_id = db.Column(db.String(120))
     content_id = db.Column(db.String(50))
@@ -55,6 +67,46 @@ class XP(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref='xp_entries')
 
+# XP rollups - maintained by modules.rollups in the same transaction as each XP insert
+class XPQuestionRollup(db.Model):
+    __table_args__ = (
+        db.Index('uq_xp_question_rollup_user_id_question_id', 'user_id', 'question_id', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    question_id = db.Column(db.String(120), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Boolean, nullable=False, default=False)
+    incorrect = db.Column(db.Boolean, nullable=False, default=False)
+    performance = db.Column(db.Float, nullable=False, default=0.0)
+    xp = db.Column(db.Float, nullable=False, default=0.0)
+    best_xp = db.Column(db.Float)
+    last_timestamp = db.Column(db.DateTime)
+
+class XPCurriculumRollup(db.Model):
+    __table_args__ = (
+        db.Index('uq_xp_curriculum_rollup_user_content_curriculum', 'user_id', 'content_id', 'curriculum_id', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content_id = db.Column(db.String(50), nullable=False, default='')
+    curriculum_id = db.Column(db.String(50), nullable=False, default='')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    xp = db.Column(db.Float, nullable=False, default=0.0)
+    last_timestamp = db.Column(db.DateTime)
+
+class XPStandardRollup(db.Model):
+    __table_args__ = (
+        db.Index('uq_xp_standard_rollup_user_content_standard_objective', 'user_id', 'content_id', 'standard', 'objective', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content_id = db.Column(db.String(50), nullable=False, default='')
+    standard = db.Column(db.Integer, nullable=False, default=0)
+    objective = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    xp = db.Column(db.Float, nullable=False, default=0.0)
+
 class Content(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content_id = db.Column(db.String(120), unique=True, index=True, nullable=False)
@@ -69,6 +121,9 @@ class Curriculum(db.Model):
 
 # Content ↔ Curriculum
 class ContentCurriculum(db.Model):
+    __table_args__ = (
+        db.Index('ix_content_curriculum_content_id', 'content_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=False)
     curriculum_id = db.Column(db.Integer, db.ForeignKey('curriculum.id'), unique=True, nullable=False)
@@ -78,6 +133,9 @@ class ContentCurriculum(db.Model):
 
 # User ↔ Content
 class UserContent(db.Model):
+    __table_args__ = (
+        db.Index('uq_user_content_user_id_content_id', 'user_id', 'content_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=False)
@@ -87,6 +145,9 @@ class UserContent(db.Model):
 
 # User ↔ Curriculum
 class UserCurriculum(db.Model):
+    __table_args__ = (
+        db.Index('uq_user_curriculum_user_id_curriculum_id', 'user_id', 'curriculum_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     curriculum_id = db.Column(db.Integer, db.ForeignKey('curriculum.id'), nullable=False)
@@ -96,6 +157,9 @@ class UserCurriculum(db.Model):
 
 # Classroom ↔ Content
 class ClassroomContent(db.Model):
+    __table_args__ = (
+        db.Index('uq_classroom_content_classroom_id_content_id', 'classroom_id', 'content_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     classroom_id = db.Column(db.Integer, db.ForeignKey('classroom.id'), nullable=False)
     content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=False)
@@ -105,6 +169,9 @@ class ClassroomContent(db.Model):
 
 # Curriculum ↔ Questions
 class CurriculumQuestion(db.Model):
+    __table_args__ = (
+        db.Index('ix_curriculum_question_curriculum_id', 'curriculum_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     curriculum_id = db.Column(db.Integer, db.ForeignKey('curriculum.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), unique=True, nullable=False)
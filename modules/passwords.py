@@ -0,0 +1,137 @@
+# Import packages
+import logging, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import bcrypt
+from modules.sandbox import percentiles
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class HasherBusy(Exception):
+    ''' Raised when too many password checks are already queued, or one waited too long '''
+
+class PasswordHasher:
+    '''
+    Bounded executor for bcrypt hashing and checking in the login paths
+
+    Notes:
+        - bcrypt releases the GIL, so `workers` threads hash on up to `workers` cores at once while
+          the rest of the request threads keep serving; a class logging in at the bell queues here
+          instead of taking every core
+        - At most max_queue checks wait for a thread; beyond that, or after queue_timeout seconds,
+          HasherBusy is raised (HTTP 503 with Retry-After on /login, /api/login, /add_new_user
+          and /update_user)
+        - hash() uses the configured cost (`rounds`); needs_rehash() tells verify() when a stored
+          hash was made with another cost so it can be replaced after a successful check
+        - stats() reports queue wait and hashing time over the last `window` calls
+    '''
+    def __init__(self, workers=4, max_queue=256, queue_timeout=10.0, rounds=12, window=500):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rounds = rounds
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._queue_waits = deque(maxlen=window)
+        self._hash_times = deque(maxlen=window)
+        self.checks = 0
+        self.hashes = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.peak_pending = 0
+
+    def configure(self, workers=None, max_queue=None, queue_timeout=None, rounds=None):
+        '''Apply the app config (called once at app start up, before the first login)'''
+        for name, value in (('workers', workers), ('max_queue', max_queue), ('queue_timeout', queue_timeout),
+                            ('rounds', rounds)):
+            if value is not None:
+                setattr(self, name, value)
+
+    def check(self, password, hashed):
+        '''True when password matches the bcrypt hash'''
+        return self._submit('checks', bcrypt.checkpw, password.encode('utf-8'), bytes(hashed))
+
+    def hash(self, password):
+        '''bcrypt hash of password at the configured cost'''
+        return self._submit('hashes', lambda password: bcrypt.hashpw(password, bcrypt.gensalt(self.rounds)),
+                            password.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        '''True when hashed was made with a cost other than the configured one'''
+        try:
+            return int(bytes(hashed).split(b'$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def upgrade(self, password, hashed):
+        '''New hash of a just-verified password when hashed used another cost, otherwise None'''
+        if not self.needs_rehash(hashed):
+            return None
+        new_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return new_hash
+
+    def _submit(self, counter, fn, *args):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy(f"{self._pending} password checks pending")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='bcrypt')
+            self._pending += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+
+        queued_at = time.perf_counter()
+        timings = []
+
+        def task():
+            started_at = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings.extend([started_at - queued_at, time.perf_counter() - started_at])
+
+        future = self._executor.submit(task)
+        try:
+            return future.result(timeout=self.queue_timeout)
+        except TimeoutError:
+            # Still queued: drop it so a login nobody waits for does not burn a core later
+            future.cancel()
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy(f"Password check not finished after {self.queue_timeout:g}s")
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if timings:
+                    self._queue_waits.append(timings[0])
+                    self._hash_times.append(timings[1])
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'rounds': self.rounds,
+                'pending': self._pending,
+                'peak_pending': self.peak_pending,
+                'max_queue': self.max_queue,
+                'checks': self.checks,
+                'hashes': self.hashes,
+                'rehashed': self.rehashed,
+                'rejected': self.rejected,
+                'queue_wait_ms': percentiles(sorted(self._queue_waits)),
+                'hash_ms': percentiles(sorted(self._hash_times))
+            }
+
+# Process-wide hasher - app.py applies the config
+password_hasher = PasswordHasher()
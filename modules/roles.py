@@ -0,0 +1,90 @@
+# Import packages
+import logging, threading, time
+from modules.models import db, Admin
+from modules.cache import MemoryBackend
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class AdminRoleIndex:
+    '''
+    Process-wide, versioned copy of the Admin table (Admin.id -> Admin.role)
+
+    Notes:
+        - The Admin table is a handful of teachers, so it is loaded whole with one query and
+          build_session reads roles and system_ids from memory instead of per login
+        - Like the catalog, the version counter lives in the backend so bump() in one worker
+          reloads every worker; call it after committing Admin changes
+        - Admin rows are also edited outside the app (SQL, import scripts), so a copy older than
+          ttl seconds is reloaded as well
+    '''
+    version_key = 'mps:admin_roles:version'
+
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self._roles = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def configure(self, backend=None, ttl=None):
+        '''Swap the version backend and set the ttl (called once at app start up)'''
+        if backend is not None:
+            self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+        self._roles = None
+
+    def version(self):
+        try:
+            return int(self.backend.get(self.version_key) or 0)
+        except Exception as e:
+            logger.warning(f"Admin role version read failed: {e}")
+            return -1
+
+    def bump(self):
+        '''Advance the version so every worker reloads on next access'''
+        try:
+            self.backend.incr(self.version_key)
+        except Exception as e:
+            logger.error(f"Admin role version bump failed: {e}")
+        self._roles = None
+
+    def roles(self):
+        '''{Admin.id: Admin.role} matching the current version'''
+        version = self.version()
+        roles = self._roles
+        if roles is not None and self._version == version >= 0 and time.monotonic() - self._loaded_at < self.ttl:
+            return roles
+
+        with self._lock:
+            if (self._roles is None or self._version != version or version < 0
+                    or time.monotonic() - self._loaded_at >= self.ttl):
+                self._roles = dict(db.session.query(Admin.id, Admin.role).all())
+                self._version = version
+                self._loaded_at = time.monotonic()
+                self.reloads += 1
+            return self._roles
+
+    def role(self, user_id):
+        '''Admin role of a user, 'student' for everyone else'''
+        return self.roles().get(user_id, 'student')
+
+    def system_ids(self):
+        '''User ids of every system level admin'''
+        return sorted(user_id for user_id, role in self.roles().items() if role == 'system')
+
+    def stats(self):
+        roles = self._roles
+        return {
+            'version': self._version,
+            'admins': len(roles) if roles is not None else 0,
+            'age_seconds': time.monotonic() - self._loaded_at if roles is not None else None,
+            'ttl': self.ttl,
+            'reloads': self.reloads
+        }
+
+# Process-wide index - app.py swaps in the Redis backend for production
+admin_roles = AdminRoleIndex()
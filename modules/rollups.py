@@ -0,0 +1,313 @@
+# Import packages
+import logging
+from collections import defaultdict
+from sqlalchemy import insert
+from modules.models import *
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+####################################################################################
+#### Incremental updates ###########################################################
+####################################################################################
+
+def next_performance(correct, incorrect, performance, dXP):
+    '''
+    Fold one answer into a question's (correct, incorrect, performance) state
+
+    Notes:
+        - Mirrors the PerformanceMap rules the dashboard applied to the raw history:
+          a correct answer scores 1.0, or 0.5 if the only earlier answers were incorrect
+        - Incorrect answers never change the score
+    '''
+    if dXP is None or dXP < 0:
+        return correct, True, performance
+    if not correct and incorrect:
+        return True, incorrect, 0.5
+    return True, incorrect, 1.0
+
+def rollup_keys(entry):
+    '''Normalized (question, content/curriculum, standard/objective) keys for an XP row'''
+    return (entry.question_id or '',
+            (entry.content_id or '', entry.curriculum_id or ''),
+            (entry.content_id or '', entry.standard or 0, entry.objective or 0))
+
+def apply_xp_rollups(entries):
+    '''
+    Add XP rows to their users' rollups inside the caller's transaction
+
+    Arg(s): entries as list of XP objects (or anything with the XP attributes) in answer order
+
+    Notes:
+        - Does not commit; the caller commits the XP rows and the rollups together
+        - One query per rollup table however many users the batch covers
+        - Existing rollup rows are locked in id order (SELECT ... FOR UPDATE on PostgreSQL) so
+          concurrent writers for the same user serialize instead of losing updates
+    '''
+    if not entries:
+        return
+
+    user_ids = {entry.user_id for entry in entries}
+    keys = [rollup_keys(entry) for entry in entries]
+
+    questions = {
+        (row.user_id, row.question_id): row for row in
+        db.session.query(XPQuestionRollup)
+        .filter(XPQuestionRollup.user_id.in_(user_ids),
+                XPQuestionRollup.question_id.in_({key[0] for key in keys}))
+        .order_by(XPQuestionRollup.id).with_for_update().all()
+    }
+    curriculums = {
+        (row.user_id, row.content_id, row.curriculum_id): row for row in
+        db.session.query(XPCurriculumRollup)
+        .filter(XPCurriculumRollup.user_id.in_(user_ids),
+                XPCurriculumRollup.curriculum_id.in_({key[1][1] for key in keys}))
+        .order_by(XPCurriculumRollup.id).with_for_update().all()
+    }
+    standards = {
+        (row.user_id, row.content_id, row.standard, row.objective): row for row in
+        db.session.query(XPStandardRollup)
+        .filter(XPStandardRollup.user_id.in_(user_ids),
+                XPStandardRollup.content_id.in_({key[2][0] for key in keys}))
+        .order_by(XPStandardRollup.id).with_for_update().all()
+    }
+
+    for entry, (question_id, curriculum_key, standard_key) in zip(entries, keys):
+        user_id = entry.user_id
+        dXP = entry.dXP or 0.0
+
+        question = questions.get((user_id, question_id))
+        if question is None:
+            question = questions[(user_id, question_id)] = XPQuestionRollup(
+                user_id=user_id, question_id=question_id, attempts=0, correct=False,
+                incorrect=False, performance=0.0, xp=0.0, best_xp=None)
+            db.session.add(question)
+        question.correct, question.incorrect, question.performance = next_performance(
+            question.correct, question.incorrect, question.performance, entry.dXP)
+        question.attempts += 1
+        question.xp += dXP
+        question.best_xp = dXP if question.best_xp is None else max(question.best_xp, dXP)
+        question.last_timestamp = entry.timestamp
+
+        curriculum = curriculums.get((user_id, *curriculum_key))
+        if curriculum is None:
+            curriculum = curriculums[(user_id, *curriculum_key)] = XPCurriculumRollup(
+                user_id=user_id, content_id=curriculum_key[0], curriculum_id=curriculum_key[1], attempts=0, xp=0.0)
+            db.session.add(curriculum)
+        curriculum.attempts += 1
+        curriculum.xp += dXP
+        curriculum.last_timestamp = entry.timestamp
+
+        standard = standards.get((user_id, *standard_key))
+        if standard is None:
+            standard = standards[(user_id, *standard_key)] = XPStandardRollup(
+                user_id=user_id, content_id=standard_key[0], standard=standard_key[1],
+                objective=standard_key[2], attempts=0, xp=0.0)
+            db.session.add(standard)
+        standard.attempts += 1
+        standard.xp += dXP
+
+####################################################################################
+#### Rebuild #######################################################################
+####################################################################################
+
+def rebuild_xp_rollups(user_ids=None, batch_size=5000):
+    '''
+    Regenerate the rollup tables from the raw XP table
+
+    Arg(s): user_ids as optional iterable of User.id (default: every user), batch_size as int
+
+    Returns: number of XP rows folded into the rollups
+
+    Notes:
+        - Streams XP in (user_id, timestamp, id) order and folds each user in memory,
+          so memory is bounded by one user's distinct questions rather than the table
+        - Deletes and re-inserts in a single transaction; run it after editing XP
+          outside the app (e.g. update_xp.py)
+    '''
+    user_ids = set(user_ids) if user_ids is not None else None
+    tables = (XPQuestionRollup, XPCurriculumRollup, XPStandardRollup)
+
+    try:
+        for model in tables:
+            query = db.session.query(model)
+            if user_ids is not None:
+                query = query.filter(model.user_id.in_(user_ids))
+            query.delete(synchronize_session=False)
+
+        xp_query = (
+            db.session.query(XP.user_id, XP.question_id, XP.content_id, XP.curriculum_id,
+                             XP.standard, XP.objective, XP.dXP, XP.timestamp)
+            .order_by(XP.user_id, XP.timestamp, XP.id)
+        )
+        if user_ids is not None:
+            xp_query = xp_query.filter(XP.user_id.in_(user_ids))
+
+        rows = {model: [] for model in tables}
+        current_user = None
+        folded = 0
+
+        def flush(user_id, questions, curriculums, standards):
+            rows[XPQuestionRollup].extend(dict(state, user_id=user_id, question_id=key) for key, state in questions.items())
+            rows[XPCurriculumRollup].extend(dict(state, user_id=user_id, content_id=key[0], curriculum_id=key[1])
+                                            for key, state in curriculums.items())
+            rows[XPStandardRollup].extend(dict(state, user_id=user_id, content_id=key[0], standard=key[1], objective=key[2])
+                                          for key, state in standards.items())
+            for model in tables:
+                if len(rows[model]) >= batch_size:
+                    db.session.execute(insert(model), rows[model])
+                    rows[model] = []
+
+        for entry in xp_query.yield_per(batch_size):
+            if entry.user_id != current_user:
+                if current_user is not None:
+                    flush(current_user, questions, curriculums, standards)
+                current_user = entry.user_id
+                questions = defaultdict(lambda: {'attempts': 0, 'correct': False, 'incorrect': False,
+                                                 'performance': 0.0, 'xp': 0.0, 'best_xp': None,
+                                                 'last_timestamp': None})
+                curriculums = defaultdict(lambda: {'attempts': 0, 'xp': 0.0, 'last_timestamp': None})
+                standards = defaultdict(lambda: {'attempts': 0, 'xp': 0.0})
+
+            question_id, curriculum_key, standard_key = rollup_keys(entry)
+            dXP = entry.dXP or 0.0
+
+            question = questions[question_id]
+            question['correct'], question['incorrect'], question['performance'] = next_performance(
+                question['correct'], question['incorrect'], question['performance'], entry.dXP)
+            question['attempts'] += 1
+            question['xp'] += dXP
+            question['best_xp'] = dXP if question['best_xp'] is None else max(question['best_xp'], dXP)
+            question['last_timestamp'] = entry.timestamp
+
+            curriculum = curriculums[curriculum_key]
+            curriculum['attempts'] += 1
+            curriculum['xp'] += dXP
+            curriculum['last_timestamp'] = entry.timestamp
+
+            standard = standards[standard_key]
+            standard['attempts'] += 1
+            standard['xp'] += dXP
+            folded += 1
+
+        if current_user is not None:
+            flush(current_user, questions, curriculums, standards)
+        for model in tables:
+            if rows[model]:
+                db.session.execute(insert(model), rows[model])
+
+        db.session.commit()
+        return folded
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"XP rollup rebuild failed: {e}")
+        raise
+
+####################################################################################
+#### Summaries #####################################################################
+####################################################################################
+
+def score(earned, possible):
+    return {'scoreEarned': earned, 'totalPossible': possible, 'percent': earned / possible * 100 if possible > 0 else 0}
+
+def build_xp_summary(user_id, user_assignments):
+    '''
+    Build the dashboard summaries for a user from the rollups and their assignments
+
+    Arg(s): user_id as User.id, user_assignments as the fetch_user_assignments dictionary
+
+    Returns: dictionary with totalXP, attempts, lastActivity, performanceMap, curriculumXP,
+             overall, content, curriculum, standardObjective, tagSummary and completedCurriculums
+
+    Notes:
+        - overall/content/curriculum/standardObjective match calculateKPIs in dashboard_script.js,
+          scoring each assigned question at difficulty / 3 times its PerformanceMap multiplier
+        - standardObjective groups by the question's own standard.objective
+        - Three indexed queries regardless of how much XP history the user has
+    '''
+    question_rows = (
+        db.session.query(XPQuestionRollup.question_id, XPQuestionRollup.correct, XPQuestionRollup.performance,
+                         XPQuestionRollup.best_xp, XPQuestionRollup.last_timestamp)
+        .filter(XPQuestionRollup.user_id == user_id).all()
+    )
+    curriculum_rows = (
+        db.session.query(XPCurriculumRollup.curriculum_id, XPCurriculumRollup.xp, XPCurriculumRollup.attempts)
+        .filter(XPCurriculumRollup.user_id == user_id).all()
+    )
+    standard_rows = (
+        db.session.query(XPStandardRollup.content_id, XPStandardRollup.standard, XPStandardRollup.objective,
+                         XPStandardRollup.xp, XPStandardRollup.attempts)
+        .filter(XPStandardRollup.user_id == user_id).all()
+    )
+
+    performance_map = {row.question_id: row.performance for row in question_rows if row.correct}
+    # Completion counts a question once it has earned positive XP (timeouts score 0)
+    earned_questions = {row.question_id for row in question_rows if (row.best_xp or 0) > 0}
+    timestamps = [row.last_timestamp for row in question_rows if row.last_timestamp is not None]
+
+    curriculum_xp = defaultdict(lambda: {'earnedXP': 0.0, 'attempts': 0})
+    for curriculum_id, xp, attempts in curriculum_rows:
+        curriculum_xp[curriculum_id]['earnedXP'] += xp
+        curriculum_xp[curriculum_id]['attempts'] += attempts
+
+    standard_xp = {(content_id, f"{standard}.{objective}"): (xp, attempts)
+                   for content_id, standard, objective, xp, attempts in standard_rows}
+
+    overall = [0.0, 0.0]
+    content_scores = {}
+    curriculum_scores = {}
+    standard_scores = {}
+    tag_summary = {}
+    completed = []
+
+    for content, curriculums in user_assignments.items():
+        content_score = content_scores.setdefault(content, [0.0, 0.0])
+        content_standards = standard_scores.setdefault(content, {})
+        content_tags = {}
+
+        for curriculum, questions in curriculums.items():
+            curriculum_score = curriculum_scores.setdefault(curriculum, [0.0, 0.0])
+            if questions and all(q['task_key'] in earned_questions for q in questions):
+                completed.append(curriculum)
+
+            for q in questions:
+                possible = (q['difficulty'] or 0) / 3
+                earned = possible * performance_map.get(q['task_key'], 0)
+                for total in (overall, content_score, curriculum_score,
+                              content_standards.setdefault(f"{q['standard']}.{q['objective']}", [0.0, 0.0])):
+                    total[0] += earned
+                    total[1] += possible
+
+                for tag in q['tags'] if isinstance(q['tags'], list) else []:
+                    tag_entry = content_tags.setdefault(tag, {'questions': [], 'potentialXP': 0.0, 'earnedXP': 0.0})
+                    if q['task_key'] not in tag_entry['questions']:
+                        tag_entry['questions'].append(q['task_key'])
+                    tag_entry['potentialXP'] += possible
+                    tag_entry['earnedXP'] += earned
+
+        for tag_entry in content_tags.values():
+            tag_entry['percent'] = tag_entry['earnedXP'] / tag_entry['potentialXP'] * 100 if tag_entry['potentialXP'] > 0 else 0
+        if content_tags:
+            tag_summary[content] = content_tags
+
+    standard_objective = {}
+    for content, standards in standard_scores.items():
+        standard_objective[content] = {}
+        for so_key, (earned, possible) in standards.items():
+            xp, attempts = standard_xp.get((content, so_key), (0.0, 0))
+            standard_objective[content][so_key] = dict(score(earned, possible), earnedXP=xp, attempts=attempts)
+
+    return {
+        'totalXP': sum(entry['earnedXP'] for entry in curriculum_xp.values()),
+        'attempts': sum(entry['attempts'] for entry in curriculum_xp.values()),
+        'lastActivity': max(timestamps).isoformat() if timestamps else None,
+        'performanceMap': performance_map,
+        'curriculumXP': dict(curriculum_xp),
+        'overall': score(*overall),
+        'content': {content: score(*totals) for content, totals in content_scores.items()},
+        'curriculum': {curriculum: score(*totals) for curriculum, totals in curriculum_scores.items()},
+        'standardObjective': standard_objective,
+        'tagSummary': tag_summary,
+        'completedCurriculums': completed
+    }
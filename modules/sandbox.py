@@ -0,0 +1,359 @@
+# Import packages
+import ast, atexit, hashlib, json, logging, os, select, signal, struct, subprocess, sys, threading, time
+from collections import deque
+from modules.cache import run_cache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The pool needs fork() and rlimits in the worker
+SUPPORTED = hasattr(os, 'fork') and sys.platform != 'win32'
+
+# Frame header shared with sandbox_worker: 4 byte big-endian body length
+FRAME = struct.Struct('>I')
+
+class SandboxBusy(Exception):
+    ''' Raised when the run queue is full or a queued run waited too long for a worker '''
+
+####################################################################################
+#### Workers #######################################################################
+####################################################################################
+
+class SandboxWorker:
+    '''
+    Handle on one modules/sandbox_worker.py process
+
+    Notes:
+        - The worker talks length-prefixed JSON over its stdin/stdout pipes (see sandbox_worker)
+        - Replies are read with os.read() into our own buffer: the worker writes the started frame
+          and the result back to back, and select() on a buffered reader would miss the second one
+        - child is the pid of the run in progress (from the worker's started frame), so kill() can
+          take the sandboxed process group down along with a worker that stopped answering
+    '''
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py')
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, '-I', self.script], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, close_fds=True)
+        self.runs = 0
+        self.ready = False
+        self.child = None
+        self._buffer = bytearray()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def request(self, message, timeout):
+        '''Send one run request and wait up to timeout seconds for the reply (None on timeout/crash)'''
+        deadline = time.monotonic() + timeout
+        try:
+            if not self.ready:
+                if self._read(timeout) is None:
+                    return None
+                self.ready = True
+            body = json.dumps(message).encode('utf-8')
+            self.process.stdin.write(FRAME.pack(len(body)) + body)
+            self.process.stdin.flush()
+            reply = self._read(max(0, deadline - time.monotonic()))
+            if reply is not None and 'child' in reply:
+                self.child = reply['child']
+                reply = self._read(max(0, deadline - time.monotonic()))
+            if reply is not None:
+                self.child = None
+            return reply
+        except (OSError, ValueError) as e:
+            logger.warning(f"Sandbox worker {self.process.pid} failed: {e}")
+            return None
+
+    def _read(self, timeout):
+        '''Next frame from the worker, or None on timeout or EOF'''
+        deadline = time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        while True:
+            if len(self._buffer) >= FRAME.size:
+                size = FRAME.size + FRAME.unpack_from(self._buffer)[0]
+                if len(self._buffer) >= size:
+                    body = bytes(self._buffer[FRAME.size:size])
+                    del self._buffer[:size]
+                    return json.loads(body)
+            ready, _, _ = select.select([fd], [], [], max(0, deadline - time.monotonic()))
+            if not ready:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return None
+            self._buffer += chunk
+
+    def stop(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def kill(self):
+        '''Kill the worker and the process group of the run it was supervising, if any'''
+        if self.child:
+            try:
+                os.killpg(self.child, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            self.child = None
+        self.process.kill()
+        self.process.wait()
+
+####################################################################################
+#### Pool ##########################################################################
+####################################################################################
+
+class SandboxPool:
+    '''
+    Per-process pool of warm sandbox workers behind /run_code
+
+    Notes:
+        - Workers are started on first use (scripts importing app never fork a pool) and kept warm
+        - Each run is executed in a fresh fork of a worker with CPU, memory, file size and process
+          rlimits plus a wall-clock limit (see sandbox_worker)
+        - A worker is replaced after max_runs runs, or straight away if it stops answering
+        - Admission control: at most `size` runs execute at once, at most max_queue more wait, and a
+          waiter gives up after queue_timeout seconds; both cases raise SandboxBusy (HTTP 503)
+        - stats() reports queue wait, run time and utilization over the last `window` runs
+    '''
+    def __init__(self, size=4, max_queue=16, queue_timeout=10.0, max_runs=200, cpu_seconds=5,
+                 wall_seconds=10.0, memory_mb=256, max_output=65536, window=500):
+        self.size = size
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_runs = max_runs
+        self.limits = {'cpu_seconds': cpu_seconds, 'wall_seconds': wall_seconds, 'memory_mb': memory_mb,
+                       'max_output': max_output}
+        self._idle = []
+        self._started = False
+        self._busy = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._queue_waits = deque(maxlen=window)
+        self._run_times = deque(maxlen=window)
+        self.runs = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.peak_waiting = 0
+
+    def configure(self, size=None, max_queue=None, queue_timeout=None, max_runs=None, **limits):
+        '''Apply the app config (called once at app start up, before the first run)'''
+        for name, value in (('size', size), ('max_queue', max_queue), ('queue_timeout', queue_timeout),
+                            ('max_runs', max_runs)):
+            if value is not None:
+                setattr(self, name, value)
+        self.limits.update({name: value for name, value in limits.items() if value is not None})
+
+    def start(self):
+        with self._cond:
+            if not self._started:
+                self._idle = [SandboxWorker() for _ in range(self.size)]
+                self._started = True
+                atexit.register(self.shutdown)
+
+    def run(self, code, report=False):
+        '''
+        Run code in a sandbox worker
+
+        Arg(s): code as the program, report to give it a report pipe on fd 3 (see sandbox_worker)
+
+        Returns: dictionary with stdout, stderr, returncode, timed_out, cpu_time, max_rss_kb, plus
+                 report (what the program wrote to fd 3, None if nothing came back) when requested
+
+        Raises: SandboxBusy when the queue is full or no worker frees up within queue_timeout
+        '''
+        if not SUPPORTED:
+            result = run_unpooled(code, self.limits['wall_seconds'])
+            return {**result, 'report': None} if report else result
+        self.start()
+
+        queued_at = time.perf_counter()
+        with self._cond:
+            if not self._idle and self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise SandboxBusy(f"{self._busy} runs in progress and {self._waiting} queued")
+            self._waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self._waiting)
+            try:
+                if not self._cond.wait_for(lambda: self._idle, timeout=self.queue_timeout):
+                    self.rejected += 1
+                    raise SandboxBusy(f"No sandbox worker free after {self.queue_timeout:g}s")
+            finally:
+                self._waiting -= 1
+            worker = self._idle.pop()
+            self._busy += 1
+
+        started_at = time.perf_counter()
+        result = None
+        try:
+            if not worker.alive():
+                self.crashed += 1
+                worker = SandboxWorker()
+
+            message = {'code': code, **self.limits}
+            if report:
+                message['report'] = True
+            result = worker.request(message, self.limits['wall_seconds'] + 5)
+            if result is None:
+                # The worker itself hung or died - replace it and report the run as failed
+                self.crashed += 1
+                worker.kill()
+                worker = SandboxWorker()
+                result = {'stdout': '', 'stderr': 'Error: the code runner stopped responding', 'returncode': -1,
+                          'timed_out': True, 'cpu_time': 0.0, 'max_rss_kb': 0}
+                if report:
+                    result['report'] = None
+
+            worker.runs += 1
+            if worker.runs >= self.max_runs:
+                self.recycled += 1
+                worker.stop()
+                worker = SandboxWorker()
+        finally:
+            finished_at = time.perf_counter()
+            with self._cond:
+                self._idle.append(worker)
+                self._busy -= 1
+                self.runs += 1
+                self.timeouts += bool(result and result['timed_out'])
+                self._queue_waits.append(started_at - queued_at)
+                self._run_times.append(finished_at - started_at)
+                self._cond.notify()
+
+        return result
+
+    def shutdown(self):
+        with self._cond:
+            workers, self._idle = self._idle, []
+            self._started = False
+        for worker in workers:
+            worker.stop()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._queue_waits)
+            run_times = sorted(self._run_times)
+            return {
+                'supported': SUPPORTED,
+                'size': self.size,
+                'busy': self._busy,
+                'waiting': self._waiting,
+                'utilization': self._busy / self.size if self.size else 0.0,
+                'max_queue': self.max_queue,
+                'peak_waiting': self.peak_waiting,
+                'runs': self.runs,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'queue_wait_ms': percentiles(waits),
+                'run_ms': percentiles(run_times),
+                'limits': dict(self.limits)
+            }
+
+def percentiles(samples):
+    '''p50/p99/max in ms of a sorted list of seconds'''
+    if not samples:
+        return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {'p50': pick(0.5), 'p99': pick(0.99), 'max': samples[-1] * 1000}
+
+def run_unpooled(code, wall_seconds):
+    '''Fallback for platforms without fork/rlimits: one interpreter per run with a wall-clock timeout only'''
+    try:
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=wall_seconds)
+        return {'stdout': result.stdout, 'stderr': result.stderr, 'returncode': result.returncode,
+                'timed_out': False, 'cpu_time': 0.0, 'max_rss_kb': 0}
+    except subprocess.TimeoutExpired:
+        return {'stdout': '', 'stderr': f"Error: time limit exceeded ({wall_seconds:g}s)", 'returncode': -9,
+                'timed_out': True, 'cpu_time': 0.0, 'max_rss_kb': 0}
+
+####################################################################################
+#### Result cache ##################################################################
+####################################################################################
+
+# Modules whose functions give the same answer on every run
+PURE_MODULES = {'__future__', 'abc', 'array', 'bisect', 'cmath', 'collections', 'copy', 'dataclasses', 'decimal',
+                'enum', 'fractions', 'functools', 'heapq', 'itertools', 'json', 'keyword', 'math', 'numbers',
+                'operator', 're', 'statistics', 'string', 'textwrap', 'typing'}
+
+# Builtins that read input, touch files, run generated code or expose addresses and hash seeds
+IMPURE_NAMES = {'__builtins__', '__import__', 'breakpoint', 'compile', 'eval', 'exec', 'globals', 'hash', 'help',
+                'id', 'input', 'locals', 'open', 'vars'}
+
+# Attributes that lead from ordinary objects back to modules, frames and builtins
+IMPURE_ATTRIBUTES = {'__builtins__', '__code__', '__globals__', '__import__', '__loader__', '__spec__',
+                     '__subclasses__', 'f_back', 'f_globals', 'gi_frame', 'tb_frame'}
+
+def is_deterministic(tree):
+    '''
+    Determinism check for a parsed snippet
+
+    Args:
+        tree: ast.Module of the snippet
+
+    Returns: True when the snippet only imports PURE_MODULES and never names an IMPURE_NAMES builtin
+             or an IMPURE_ATTRIBUTES attribute
+
+    Notes: this decides what may be cached, it is not a security boundary (the sandbox is) - a snippet
+           that hides its I/O from the check only caches its own output
+    '''
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split('.')[0] not in PURE_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or '').split('.')[0] not in PURE_MODULES:
+                return False
+        elif isinstance(node, ast.Name) and node.id in IMPURE_NAMES:
+            return False
+        elif isinstance(node, ast.Attribute) and node.attr in IMPURE_ATTRIBUTES:
+            return False
+    return True
+
+def snippet_key(code):
+    '''
+    Content address of a snippet for run_cache
+
+    Returns: sha256 hex digest of the normalized source, or None when the snippet does not parse or
+             fails is_deterministic
+
+    Notes: the source is normalized to its AST, so spacing, quoting and comments do not change the key;
+           the line number of every node is kept because tracebacks report them
+    '''
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    if not is_deterministic(tree):
+        return None
+    lines = ','.join(str(getattr(node, 'lineno', '')) for node in ast.walk(tree))
+    return hashlib.sha256(f"{ast.dump(tree)}|{lines}".encode('utf-8')).hexdigest()
+
+def cacheable_result(result):
+    '''Only runs that finished on their own are cached: not timed out, killed, or out of CPU or memory'''
+    return not result['timed_out'] and result['returncode'] in (0, 1) and 'MemoryError' not in result['stderr']
+
+def run_snippet(code, pool=None, cache=None):
+    '''
+    Run code through the result cache and the sandbox pool
+
+    Returns: the sandbox result dictionary ('cached': True when it came from the cache)
+
+    Raises: SandboxBusy as SandboxPool.run does (never on a cache hit)
+    '''
+    pool = pool or sandbox_pool
+    cache = cache or run_cache
+    return cache.get_or_run(snippet_key(code), lambda: pool.run(code), cacheable_result)
+
+# Process-wide pool - app.py applies the config
+sandbox_pool = SandboxPool()
@@ -0,0 +1,191 @@
+'''
+Warm sandbox worker for /run_code (started by modules.sandbox.SandboxPool, never imported by the app)
+
+Protocol: length-prefixed JSON frames on stdin/stdout (4 byte big-endian length, then UTF-8 JSON)
+    request:  {"code": str, "cpu_seconds": int, "wall_seconds": float, "memory_mb": int, "max_output": int,
+               "report": bool (optional)}
+    started:  {"child": int} - the forked child's pid (also its process group), sent before the run
+    response: {"stdout": str, "stderr": str, "returncode": int, "timed_out": bool, "cpu_time": float,
+               "max_rss_kb": int, "report": str (only when requested)}
+
+Notes:
+    - The worker is a warm "zygote": commonly used modules are imported once at start up, then each
+      run forks a child that inherits the warm interpreter, so a run costs a fork instead of an
+      interpreter start
+    - Every run gets a fresh child, so student code cannot leave state behind for the next student
+    - The child runs in its own session with RLIMIT_CPU, RLIMIT_AS, RLIMIT_FSIZE and RLIMIT_NPROC
+      applied, stdin at /dev/null and stdout/stderr on pipes read by the worker
+    - The worker enforces the wall-clock limit and kills the child's process group when it expires,
+      also when the child has closed its stdout/stderr and only sleeps (no EOF-based shortcut)
+    - The pool kills the child's process group itself (pid from the started frame) if it has to
+      abandon a worker that stopped answering
+    - Output beyond max_output bytes per stream is discarded
+    - With "report" the child also gets a third pipe on fd 3, returned separately from stdout, so a
+      program (the project grader) can hand back a result that nothing it prints can pass for
+'''
+
+# Import packages
+import json, os, resource, select, signal, struct, sys, time, traceback
+
+# Imported once here so student code finds them already loaded in the forked child
+import collections, datetime, functools, itertools, math, random, re, statistics, string  # noqa: F401
+
+FRAME = struct.Struct('>I')
+
+# Bytes kept from the report pipe
+MAX_REPORT = 2**20
+
+def read_frame(stream):
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None
+    return json.loads(stream.read(FRAME.unpack(header)[0]))
+
+def write_frame(stream, message):
+    body = json.dumps(message).encode('utf-8')
+    stream.write(FRAME.pack(len(body)) + body)
+    stream.flush()
+
+def run_child(code, cpu_seconds, memory_mb, out_w, err_w, report_w=None):
+    '''Runs in the forked child: apply the limits, execute the code and exit'''
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out_w, 1)
+    os.dup2(err_w, 2)
+    if report_w is not None:
+        os.dup2(report_w, 3)
+    os.closerange(3 if report_w is None else 4, 1024)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 2**20, memory_mb * 2**20))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (2**20, 2**20))
+    try:
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    except (ValueError, OSError):
+        pass
+
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', closefd=False)
+    sys.stderr = open(2, 'w', closefd=False)
+
+    status = 0
+    try:
+        exec(compile(code, '<string>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        # Drop this frame so the traceback looks like `python -c`
+        kind, value, tb = sys.exc_info()
+        traceback.print_exception(kind, value, tb.tb_next)
+        status = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(status)
+
+def run(request, started=None):
+    '''
+    Fork a child for one request and collect its output, exit status and resource use
+
+    Notes: started(pid) is called right after the fork; the child is reaped only here, so its pid
+           (and process group id) cannot be reused before this returns
+    '''
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    report_r, report_w = os.pipe() if request.get('report') else (None, None)
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        run_child(request['code'], request['cpu_seconds'], request['memory_mb'], out_w, err_w, report_w)
+
+    os.close(out_w)
+    os.close(err_w)
+    if report_w is not None:
+        os.close(report_w)
+    if started:
+        started(pid)
+    max_output = request['max_output']
+    deadline = time.monotonic() + request['wall_seconds']
+    buffers = {out_r: bytearray(), err_r: bytearray()}
+    limits = {out_r: max_output, err_r: max_output}
+    open_fds = [out_r, err_r]
+    if report_r is not None:
+        buffers[report_r] = bytearray()
+        limits[report_r] = MAX_REPORT
+        open_fds.append(report_r)
+    timed_out = False
+    waited = 0
+    poll = 0.001
+
+    # Read until both pipes close, then poll for the exit - both bounded by the deadline
+    while not waited:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        if open_fds:
+            ready, _, _ = select.select(open_fds, [], [], remaining)
+            for fd in ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    open_fds.remove(fd)
+                elif len(buffers[fd]) < limits[fd]:
+                    buffers[fd] += chunk[:limits[fd] - len(buffers[fd])]
+        else:
+            waited, status, usage = os.wait4(pid, os.WNOHANG)
+            if not waited:
+                time.sleep(min(poll, remaining))
+                poll = min(poll * 2, 0.05)
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        _, status, usage = os.wait4(pid, 0)
+    for fd in buffers:
+        os.close(fd)
+
+    returncode = os.waitstatus_to_exitcode(status)
+    stderr = buffers[err_r].decode('utf-8', 'replace')
+    if timed_out:
+        stderr += f"\nError: time limit exceeded ({request['wall_seconds']:g}s)"
+    elif returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        stderr += f"\nError: CPU time limit exceeded ({request['cpu_seconds']}s)"
+
+    response = {
+        'stdout': buffers[out_r].decode('utf-8', 'replace'),
+        'stderr': stderr,
+        'returncode': returncode if not timed_out else -signal.SIGKILL,
+        'timed_out': timed_out,
+        'cpu_time': usage.ru_utime + usage.ru_stime,
+        'max_rss_kb': usage.ru_maxrss
+    }
+    if report_r is not None:
+        response['report'] = buffers[report_r].decode('utf-8', 'replace')
+    return response
+
+def main():
+    # Keep the protocol on private descriptors so nothing printed by accident can corrupt it
+    requests = os.fdopen(os.dup(0), 'rb')
+    responses = os.fdopen(os.dup(1), 'wb')
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    write_frame(responses, {'ready': os.getpid()})
+    while True:
+        request = read_frame(requests)
+        if request is None:
+            break
+        write_frame(responses, run(request, lambda pid: write_frame(responses, {'child': pid})))
+
+if __name__ == "__main__":
+    main()
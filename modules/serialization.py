@@ -0,0 +1,74 @@
+# Import packages
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+####################################################################################
+#### Encoding ######################################################################
+####################################################################################
+
+# Name of the encoder in use
+BACKEND = 'orjson' if orjson else 'json'
+
+def default(value):
+    '''Fallback for values neither encoder handles natively'''
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return str(value)
+
+def encode(obj):
+    '''
+    Serialize obj to compact UTF-8 JSON bytes
+
+    Notes:
+        - Uses orjson when it is installed, the standard library otherwise
+        - Datetimes become ISO 8601 strings with either encoder (naive values stay naive)
+        - Key order is insertion order, non-string keys are converted to strings
+        - Anything orjson rejects (e.g. integers beyond 64 bits) is retried with the standard library
+    '''
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+def dumps(obj):
+    '''encode() as a str'''
+    return encode(obj).decode('utf-8')
+
+def loads(data):
+    '''Parse JSON from str or bytes'''
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONProvider(JSONProvider):
+    '''
+    Flask JSON provider backed by encode() / loads()
+
+    Notes:
+        - app.py installs it as app.json, so jsonify, request.get_json and every JSON response use it
+        - response() writes the encoded bytes straight into the response without a str round trip
+    '''
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(encode(obj) + b'\n', mimetype='application/json')
@@ -0,0 +1,76 @@
+# Import packages
+import logging, time
+from modules.cache import MemoryBackend
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class TokenRevocations:
+    '''
+    Short-lived revocation list for the /api/* access tokens
+
+    Notes:
+        - Access tokens carry the caller's user_id, role and classroom scope as claims, so a change
+          to any of them must retire the tokens already issued: revoke(user_id) records the time,
+          and every token of that user issued up to then is refused
+        - iat is whole seconds, so tokens also carry issued_at (claims(), time.time() at issue) and
+          are compared on it: a re-login in the same second as the revocation is accepted, a token
+          issued just before it in that second is not. Tokens without issued_at fall back to iat
+        - Entries live only as long as an access token does (ttl = JWT_ACCESS_TOKEN_EXPIRES), so the
+          list stays as small as the set of users changed in the last few minutes
+        - The backend is shared by every worker in production (Redis); a backend error is logged and
+          the token accepted, as an outage must not lock every API client out
+    '''
+    prefix = 'mps:jwt:revoked:'
+
+    def __init__(self, backend=None, ttl=900):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.revocations = 0
+        self.refused = 0
+
+    def configure(self, backend=None, ttl=None):
+        '''Swap the backend and set the ttl (called once at app start up)'''
+        if backend is not None:
+            self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+
+    def key(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    def claims(self):
+        '''Extra claims to sign into a new access token'''
+        return {'issued_at': time.time()}
+
+    def revoke(self, user_id):
+        '''Refuse every token issued to user_id until now'''
+        try:
+            self.backend.set(self.key(user_id), time.time(), self.ttl)
+            self.revocations += 1
+        except Exception as e:
+            logger.error(f"Token revocation for user {user_id} failed: {e}")
+
+    def is_revoked(self, claims):
+        '''True when the token's user was revoked at or after the token was issued (issued_at, else iat)'''
+        if claims.get('user_id') is None:
+            return False
+        try:
+            revoked_at = self.backend.get(self.key(claims['user_id']))
+        except Exception as e:
+            logger.warning(f"Token revocation read failed: {e}")
+            return False
+        if revoked_at is None:
+            return False
+        issued_at = claims.get('issued_at', claims.get('iat', 0))
+        if float(issued_at) <= float(revoked_at):
+            self.refused += 1
+            return True
+        return False
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'ttl': self.ttl, 'revocations': self.revocations,
+                'refused': self.refused}
+
+# Process-wide revocation list - app.py swaps in the Redis backend for production
+token_revocations = TokenRevocations()
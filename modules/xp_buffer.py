@@ -0,0 +1,259 @@
+# Import packages
+import atexit, logging, threading, time
+from concurrent.futures import Future
+from types import SimpleNamespace
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from modules.models import *
+from modules.rollups import apply_xp_rollups
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+####################################################################################
+#### Group commit ##################################################################
+####################################################################################
+
+def write_xp_events(events):
+    '''
+    Insert a batch of XP events and fold them into the rollups in one transaction
+
+    Arg(s): events as list of XP column dictionaries (user_id, event_id, timestamp, ...)
+
+    Returns: (written, duplicates) as ints
+
+    Notes:
+        - Events whose (user_id, event_id) is already stored, or repeated in the batch, are skipped
+          so client retries never double count
+        - Rows go out as one multi-row INSERT instead of one commit per answer
+        - Retried once on IntegrityError (another worker stored the same event or rollup row first)
+    '''
+    for attempt in range(2):
+        try:
+            seen = set()
+            fresh = []
+            for event in events:
+                key = (event['user_id'], event['event_id'])
+                if event['event_id'] is not None and key in seen:
+                    continue
+                seen.add(key)
+                fresh.append(event)
+
+            event_ids = {event['event_id'] for event in fresh if event['event_id'] is not None}
+            if event_ids:
+                stored = set(
+                    db.session.query(XP.user_id, XP.event_id)
+                    .filter(XP.user_id.in_({event['user_id'] for event in fresh}), XP.event_id.in_(event_ids))
+                    .all()
+                )
+                fresh = [event for event in fresh if (event['user_id'], event['event_id']) not in stored]
+
+            if fresh:
+                db.session.execute(insert(XP), fresh)
+                apply_xp_rollups([SimpleNamespace(**event) for event in fresh])
+            db.session.commit()
+            return len(fresh), len(events) - len(fresh)
+
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+
+        except Exception:
+            db.session.rollback()
+            raise
+
+####################################################################################
+#### Write-behind buffer ###########################################################
+####################################################################################
+
+class XPWriteBuffer:
+    '''
+    Per-process group commit buffer for XP events
+
+    Notes:
+        - add() queues one request's events and returns a Future that resolves once the transaction
+          holding them has committed; /update_xp waits on it (write()), so no event is acknowledged
+          before it is durable and a worker restart can only lose unacknowledged events
+        - A background thread commits a lone waiting request straight away; when several are waiting
+          it group commits them once max_batch events are queued or the oldest has waited max_delay
+          seconds, so concurrent requests share one transaction without slowing down a quiet worker
+        - A request's events are never split across transactions: a batch takes whole requests up
+          to max_batch events (one larger request is a batch of its own)
+        - When a group transaction fails, each of its requests is retried in a transaction of its
+          own, so only the request that cannot be stored fails; a failed Future is never retried or
+          dropped here - the client still holds the events and resends them (event_ids make the
+          resend safe)
+        - Until configure() is called (scripts, benchmarks) or when max_delay is 0, add()
+          writes synchronously in the caller's app context
+    '''
+    def __init__(self, max_batch=250, max_delay=0.25, commit_timeout=10):
+        self.app = None
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.commit_timeout = commit_timeout
+        self._requests = []                     # [(events, future, queued_at)] oldest first
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.received = 0
+        self.written = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.failures = 0
+        self.failed = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+
+    def configure(self, app, max_batch=None, max_delay=None, commit_timeout=None):
+        '''Bind the Flask app used by the flush thread (called once at app start up)'''
+        self.app = app
+        if max_batch is not None:
+            self.max_batch = max_batch
+        if max_delay is not None:
+            self.max_delay = max_delay
+        if commit_timeout is not None:
+            self.commit_timeout = commit_timeout
+        atexit.register(self.drain)
+
+    def add(self, events):
+        '''Queue XP event dictionaries for the next group commit; the Future resolves to len(events)'''
+        future = Future()
+        if not events:
+            future.set_result(0)
+            return future
+
+        with self._cond:
+            self.received += len(events)
+
+        if self.app is None or self.max_delay <= 0:
+            start = time.perf_counter()
+            try:
+                written, duplicates = write_xp_events(events)
+            except Exception as e:
+                self._record_failure(len(events))
+                future.set_exception(e)
+                return future
+            self._record(len(events), written, duplicates, (time.perf_counter() - start) * 1000)
+            future.set_result(len(events))
+            return future
+
+        with self._cond:
+            self._requests.append((events, future, time.monotonic()))
+            self._queued += len(events)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='xp-write-buffer', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def write(self, events):
+        '''
+        Queue events and wait until they are committed
+
+        Returns: number of events stored (duplicates included)
+
+        Raises: TimeoutError after commit_timeout seconds (the events may still commit later), or
+                the exception of the failed transaction
+        '''
+        return self.add(events).result(self.commit_timeout)
+
+    def flush(self):
+        '''Group commit the oldest waiting requests, up to max_batch events (returns the number of events attempted)'''
+        with self._flush_lock:
+            with self._cond:
+                take, size = 0, 0
+                while take < len(self._requests) and (not take or size + len(self._requests[take][0]) <= self.max_batch):
+                    size += len(self._requests[take][0])
+                    take += 1
+                requests, self._requests = self._requests[:take], self._requests[take:]
+                self._queued -= size
+            if not requests:
+                return 0
+
+            batch = [event for events, _, _ in requests for event in events]
+            with self.app.app_context():
+                if len(requests) == 1:
+                    self._commit(requests[0])
+                    return len(batch)
+
+                start = time.perf_counter()
+                try:
+                    written, duplicates = write_xp_events(batch)
+                except Exception as e:
+                    # Find the request(s) that broke the transaction instead of failing all of them
+                    logger.warning(f"XP group commit of {len(requests)} requests failed, retrying each alone: {e}")
+                    for request in requests:
+                        self._commit(request)
+                    return len(batch)
+
+            self._record(len(batch), written, duplicates, (time.perf_counter() - start) * 1000)
+            for events, future, _ in requests:
+                future.set_result(len(events))
+            return len(batch)
+
+    def _commit(self, request):
+        '''Write one request in its own transaction and resolve its Future'''
+        events, future, _ = request
+        start = time.perf_counter()
+        try:
+            written, duplicates = write_xp_events(events)
+        except Exception as e:
+            self._record_failure(len(events))
+            logger.error(f"XP commit failed, {len(events)} events must be resent: {e}")
+            future.set_exception(e)
+            return
+        self._record(len(events), written, duplicates, (time.perf_counter() - start) * 1000)
+        future.set_result(len(events))
+
+    def drain(self):
+        '''Flush until the buffer is empty'''
+        while self.flush():
+            pass
+
+    def _record(self, size, written, duplicates, elapsed_ms):
+        with self._cond:
+            self.written += written
+            self.duplicates += duplicates
+            self.batches += 1
+            self.last_batch_size = size
+            self.last_flush_ms = elapsed_ms
+
+    def _record_failure(self, size):
+        with self._cond:
+            self.failures += 1
+            self.failed += size
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._requests:
+                    self._cond.wait()
+                wait = self.max_delay - (time.monotonic() - self._requests[0][2])
+                if len(self._requests) > 1 and self._queued < self.max_batch and wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            self.flush()
+
+    def pending(self):
+        with self._cond:
+            return self._queued
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': self._queued,
+                'waiting_requests': len(self._requests),
+                'received': self.received,
+                'written': self.written,
+                'duplicates': self.duplicates,
+                'batches': self.batches,
+                'failures': self.failures,
+                'failed': self.failed,
+                'last_batch_size': self.last_batch_size,
+                'last_flush_ms': self.last_flush_ms
+            }
+
+# Process-wide buffer object - app.py binds it to the app
+xp_buffer = XPWriteBuffer()
@@ -0,0 +1,21 @@
+import sys
+from modules.models import User
+from modules.rollups import rebuild_xp_rollups
+from app import app
+
+
+def rebuild(usernames):
+    with app.app_context():
+        user_ids = None
+        if usernames:
+            user_ids = [user_id for (user_id,) in User.query.with_entities(User.id).filter(User.username.in_(usernames))]
+            print(f"Rebuilding XP rollups for {len(user_ids)} of {len(usernames)} users")
+        else:
+            print("Rebuilding XP rollups for every user")
+
+        folded = rebuild_xp_rollups(user_ids)
+        print(f"Folded {folded} XP records into the rollup tables")
+
+# Usage: python rebuild_xp_rollups.py [username ...]
+if __name__ == "__main__":
+    rebuild(sys.argv[1:])
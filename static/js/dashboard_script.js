@@ -9,14 +9,21 @@ let curriculumOrderMap;
 let questionDifficultyMap;
 let tag;
 let summary;
+let xpSummary = null;
 window.standardsData = {};
 
 //-----------------------------------------------------------------------------------------------------------------
 
+// Content-hashed URL of standards.json from the page (cached by the browser until it changes)
+function standardsURL() {
+    const meta = document.querySelector('meta[name="standards-url"]');
+    return meta ? meta.content : '/static/data/standards.json';
+}
+
 // Async function to fetch standards data
 async function loadStandardsData() {
   try {
-    const response = await fetch('/static/data/standards.json');
+    const response = await fetch(standardsURL());
     const data = await response.json();
     window.standardsData = data;
   } catch (error) {
@@ -161,6 +168,7 @@ function calculateKPIs(xpData) {
 // This function gets all data needed for dashboard from server
 async function fetchDashboardData() {
     let lastUpdate = localStorage.getItem("xpLastFetchedDatetime") || "1970-01-01";
+    let xpCursor = localStorage.getItem("xpCursor") || "";
     let xpUsername = localStorage.getItem("xpUsername") || "default_xpusername";
     const username = sessionStorage.getItem("username") || "default_username";
 
@@ -168,16 +176,36 @@ async function fetchDashboardData() {
         localStorage.setItem("xpLastFetchedDatetime", "1970-01-01");
         localStorage.setItem("xpUsername", username);
         localStorage.removeItem("xpData");
+        localStorage.removeItem("profileETag");
+        localStorage.removeItem("profileData");
+        localStorage.removeItem("xpCursor");
         xpUsername = username;
         lastUpdate = "1970-01-01";
+        xpCursor = "";
     }
 
-    const params = new URLSearchParams({ lastUpdate, xpUsername });
+    // Prefer the keyset cursor, fall back to the legacy timestamp for older clients' storage
+    const params = new URLSearchParams(xpCursor ? { cursor: xpCursor, xpUsername } : { lastUpdate, xpUsername });
+
+    // Send the stored ETag so an unchanged profile comes back as an empty 304
+    const headers = {};
+    const storedETag = localStorage.getItem("profileETag");
+    const storedProfile = localStorage.getItem("profileData");
+    if (storedETag && storedProfile) headers["If-None-Match"] = storedETag;
 
     try {
-        const response = await fetch(`/get_user_profile?${params.toString()}`);
+        const response = await fetch(`/get_user_profile?${params.toString()}`, { headers, cache: "no-store" });
+        if (response.status === 304) return JSON.parse(storedProfile);
         if (!response.ok) throw new Error(`Fetch failed: ${response.status}`);
         const data = await response.json();
+
+        // Keep the profile without the xp increment (that is merged into xpData) for the next 304
+        const etag = response.headers.get("ETag");
+        if (etag) {
+            const { xpData, xpLastFetchedDatetime, xpNextCursor, xpHasMore, ...profile } = data.data;
+            localStorage.setItem("profileETag", etag);
+            localStorage.setItem("profileData", JSON.stringify(profile));
+        }
         return data.data;  // let the calling function unpack .userAssignments, .xpData, etc.
     } catch (error) {
         console.error("Dashboard fetch failed:", error);
@@ -187,6 +215,61 @@ async function fetchDashboardData() {
 
 //-----------------------------------------------------------------------------------------------------------------
 
+// Function to fetch the next page of XP history after a cursor
+async function fetchXPPage(xpUsername, cursor) {
+    const params = new URLSearchParams({ xpUsername, cursor });
+    try {
+        const response = await fetch(`/xp_sync?${params.toString()}`, { cache: "no-store" });
+        if (!response.ok) throw new Error(`Fetch failed: ${response.status}`);
+        return await response.json();
+    } catch (error) {
+        console.error("XP page fetch failed:", error);
+        return null;
+    }
+}
+
+//-----------------------------------------------------------------------------------------------------------------
+
+// Function to fetch the server-side XP summaries (performance map, KPIs, tags, completion)
+async function fetchXPSummary() {
+    const headers = {};
+    const storedETag = localStorage.getItem("xpSummaryETag");
+    const storedSummary = localStorage.getItem("xpSummary");
+    if (storedETag && storedSummary) headers["If-None-Match"] = storedETag;
+
+    try {
+        const response = await fetch("/xp_summary", { headers, cache: "no-store" });
+        if (response.status === 304) return JSON.parse(storedSummary);
+        if (!response.ok) throw new Error(`Fetch failed: ${response.status}`);
+        const data = await response.json();
+
+        const etag = response.headers.get("ETag");
+        if (etag) {
+            localStorage.setItem("xpSummaryETag", etag);
+            localStorage.setItem("xpSummary", JSON.stringify(data));
+        }
+        return data;
+    } catch (error) {
+        console.error("XP summary fetch failed:", error);
+        return null;
+    }
+}
+
+//-----------------------------------------------------------------------------------------------------------------
+
+// Function to store the server-side XP summaries where the panels expect them
+function applyXPSummary(data) {
+    if (!data || data.xpUsername !== sessionStorage.getItem("username")) return null;
+
+    totalXP = data.totalXP;
+    sessionStorage.setItem("PerformanceMap", JSON.stringify(data.performanceMap));
+    sessionStorage.setItem("completedCurriculums", JSON.stringify(data.completedCurriculums));
+    localStorage.setItem("tagSummary", JSON.stringify(data.tagSummary));
+    return data;
+}
+
+//-----------------------------------------------------------------------------------------------------------------
+
 // Function to fetch user content/curriculum/question assignments and create global variables
 // Function will also save the xp history for the student in sessionStorage
 async function setupDashboardSession() {
@@ -261,9 +344,27 @@ async function setupDashboardSession() {
 
     if (data.xpData) {
         const existingXP = JSON.parse(localStorage.getItem("xpData")) || [];
-        const merged = [...existingXP, ...data.xpData];
+        let merged = [...existingXP, ...data.xpData];
+        let lastFetched = data.xpLastFetchedDatetime;
+        let cursor = data.xpNextCursor;
+        let hasMore = data.xpHasMore;
+
+        // Stream the rest of the history in bounded pages
+        while (hasMore && cursor) {
+            const page = await fetchXPPage(data.xpUsername, cursor);
+            if (!page || !page.xpData.length) break;
+            merged = merged.concat(page.xpData);
+            lastFetched = page.xpLastFetchedDatetime;
+            cursor = page.xpNextCursor;
+            hasMore = page.xpHasMore;
+        }
+
         localStorage.setItem("xpData", JSON.stringify(merged));
-        localStorage.setItem("xpLastFetchedDatetime", data.xpLastFetchedDatetime);
+        localStorage.setItem("xpLastFetchedDatetime", lastFetched);
+        if (cursor) localStorage.setItem("xpCursor", cursor);
+
+        // The ETag vouches for the whole history, so drop it if paging stopped before the end
+        if (hasMore) localStorage.removeItem("profileETag");
     }
 
     localStorage.setItem("xpUsername", data.xpUsername);
@@ -400,8 +501,9 @@ function renderKPIPanel(currentContent) {
   kpiPanel.appendChild(panelsContainer);
 
   // Retrieve KPI summary data (assumes xpData is in localStorage)
+  // Prefer the server-side summary, fall back to the raw history if it is unavailable
   const xpData = JSON.parse(localStorage.getItem('xpData')) || [];
-  summary = calculateKPIs(xpData); // changed from const
+  summary = xpSummary || calculateKPIs(xpData); // changed from const
   const soData = summary.standardObjective[currentContent] || {};
 
   // Build a fixed 5x6 grid for standards/objectives.
@@ -860,6 +962,8 @@ function processPriorAnswers(xpData, questions) {
 //-----------------------------------------------------------------------------------------------------------------
 
 function identifyCompletedCurriculums() {
+  if (xpSummary) return xpSummary.completedCurriculums;
+
   const assignments = JSON.parse(sessionStorage.getItem("studentAssignments")) || {};
   const xpData = JSON.parse(localStorage.getItem("xpData")) || [];
   const completedCurriculums = [];
@@ -1116,6 +1220,7 @@ function renderContentPanel() {
 // Main initialization function
 async function initializePage() {
     await setupDashboardSession();
+    xpSummary = applyXPSummary(await fetchXPSummary());
     await loadStandardsData();
     //calculateKPIs(JSON.parse(localStorage.getItem('xpData')));
     processXP();
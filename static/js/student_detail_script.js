@@ -18,16 +18,24 @@ let curriculumOrderMap;
 let questionDifficultyMap;
 let tagSummary = {};  // <-- Step 1: add tag summary for tag performance panel
 let summary;
+const studentProfileCache = {};  // studentName -> { etag, data } for conditional GETs
+const prefetchedProfiles = {};   // studentName -> data from /get_student_profiles, used once
 window.standardsData = {};
 currentCurriculum = ""
 currentQuestionId = ""
 
 //-----------------------------------------------------------------------------------------------------------------
 
+// Content-hashed URL of standards.json from the page (cached by the browser until it changes)
+function standardsURL() {
+    const meta = document.querySelector('meta[name="standards-url"]');
+    return meta ? meta.content : '/static/data/standards.json';
+}
+
 // Async function to fetch standards data
 async function loadStandardsData() {
   try {
-    const response = await fetch('/static/data/standards.json');
+    const response = await fetch(standardsURL());
     const data = await response.json();
     window.standardsData = data;
   } catch (error) {
@@ -46,6 +54,8 @@ async function fetchAndPopulateUsers() {
             throw new Error(errorData.error || `HTTP error! Status: ${response.status}`);
         }
         const data = await response.json();  // Assume response is { "users": [...] }
+        // Load every profile in batches while the teacher picks a student
+        prefetchStudentProfiles(data.users);
         // Populate the dropdown
         const dropdown = document.getElementById('studentName');
         data.users.forEach(username => {  // Access the usernames via 'data.users'
@@ -64,6 +74,28 @@ async function fetchAndPopulateUsers() {
 
 //-----------------------------------------------------------------------------------------------------------------
 
+// Function to fetch the profiles of many students with one request per batch
+async function prefetchStudentProfiles(usernames) {
+    const batchSize = 100;
+    for (let i = 0; i < usernames.length; i += batchSize) {
+        try {
+            const response = await fetch('/get_student_profiles', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ usernames: usernames.slice(i, i + batchSize), lastUpdate: "1970-01-01" })
+            });
+            if (!response.ok) throw new Error(`Fetch failed: ${response.status}`);
+            const data = await response.json();
+            Object.assign(prefetchedProfiles, data.data);
+        } catch (error) {
+            console.error("Profile prefetch failed:", error);
+            return;
+        }
+    }
+}
+
+//-----------------------------------------------------------------------------------------------------------------
+
 // NEW: Event listener for radar chart clicks
 function setupRadarChartClickHandler(content) {
   const radarDiv = document.getElementById('radar');
@@ -189,16 +221,33 @@ function calculateKPIs(xpData) {
 //-----------------------------------------------------------------------------------------------------------------
 
 async function fetchStudentDashboardData(studentName) {
+    // Use the batch-loaded profile once, later views revalidate with the per-student endpoint
+    if (prefetchedProfiles[studentName]) {
+        const data = prefetchedProfiles[studentName];
+        delete prefetchedProfiles[studentName];
+        await fetchRemainingXP(data);
+        return data;
+    }
+
     const lastUpdate = "1970-01-01";
     const params = new URLSearchParams({
         lastUpdate: lastUpdate,
         xpUsername: studentName
     });
 
+    // Send the stored ETag so an unchanged profile comes back as an empty 304
+    const cached = studentProfileCache[studentName];
+    const headers = cached ? { "If-None-Match": cached.etag } : {};
+
     try {
-        const response = await fetch(`/get_student_profile?${params.toString()}`);
+        const response = await fetch(`/get_student_profile?${params.toString()}`, { headers, cache: "no-store" });
+        if (response.status === 304 && cached) return cached.data;
         if (!response.ok) throw new Error(`Fetch failed: ${response.status}`);
         const data = await response.json();
+        await fetchRemainingXP(data.data);
+
+        const etag = response.headers.get("ETag");
+        if (etag) studentProfileCache[studentName] = { etag, data: data.data };
         return data.data;
     } catch (error) {
         console.error("Fetch error:", error);
@@ -208,6 +257,30 @@ async function fetchStudentDashboardData(studentName) {
 
 //-----------------------------------------------------------------------------------------------------------------
 
+// Function to append the remaining pages of XP history (after the first page) to the profile data
+async function fetchRemainingXP(data) {
+    let cursor = data.xpNextCursor;
+    let hasMore = data.xpHasMore;
+
+    while (hasMore && cursor) {
+        const params = new URLSearchParams({ xpUsername: data.xpUsername, cursor });
+        try {
+            const response = await fetch(`/xp_sync?${params.toString()}`, { cache: "no-store" });
+            if (!response.ok) throw new Error(`Fetch failed: ${response.status}`);
+            const page = await response.json();
+            if (!page.xpData.length) break;
+            data.xpData = data.xpData.concat(page.xpData);
+            cursor = page.xpNextCursor;
+            hasMore = page.xpHasMore;
+        } catch (error) {
+            console.error("XP page fetch failed:", error);
+            break;
+        }
+    }
+}
+
+//-----------------------------------------------------------------------------------------------------------------
+
 // Function to fetch user content/curriculum/question assignments and create global variables
 async function setupDashboardSession(studentName) {
     const data = await fetchStudentDashboardData(studentName);
@@ -16,13 +16,20 @@ let timerInterval;
 let description;
 let video;
 let studentAssignments;
+let curriculumBundle;
 
 //--------------------------------------------------------------------------------------
 
+// Content-hashed URL of standards.json from the page (cached by the browser until it changes)
+function standardsURL() {
+    const meta = document.querySelector('meta[name="standards-url"]');
+    return meta ? meta.content : '/static/data/standards.json';
+}
+
 // Async function to fetch standards data
 async function loadStandardsData() {
   try {
-    const response = await fetch('/static/data/standards.json');
+    const response = await fetch(standardsURL());
     const data = await response.json();
     window.standardsData = data;
     console.log("Standards data loaded:", window.standardsData);
@@ -695,6 +702,9 @@ async function fetchCurriculum(curriculumId, isNew = true) {
     // Build the questions answered arrays
     processPriorAnswers(xpData, questionsList)
 
+    // Load every question in the curriculum so navigation does not wait on the server
+    await fetchCurriculumBundle(curriculumId);
+
     // Now that we have curriculum data, load the question
     // If the curriculum is changed, find unanswered or incorrect questions
     if (isNew === false) {
@@ -707,6 +717,29 @@ async function fetchCurriculum(curriculumId, isNew = true) {
 
 //--------------------------------------------------------------------------------------
 
+// Function to fetch the task list and every question of a curriculum in one request
+async function fetchCurriculumBundle(curriculumId) {
+    if (curriculumBundle && curriculumBundle.curriculum === curriculumId) {
+        return curriculumBundle;
+    }
+
+    try {
+        // The browser revalidates with the bundle's ETag, so an unchanged curriculum is a 304
+        const response = await fetch(`/curriculum_bundle/${encodeURIComponent(curriculumId)}`);
+        if (!response.ok) {
+            throw new Error(`Bundle request failed with status ${response.status}`);
+        }
+        curriculumBundle = await response.json();
+    } catch (error) {
+        // Fall back to one /task_request per question
+        console.error('Error fetching curriculum bundle:', error);
+        curriculumBundle = null;
+    }
+    return curriculumBundle;
+}
+
+//--------------------------------------------------------------------------------------
+
 // Function to fetch question data and update the page
 function fetchAndUpdateQuestion(keyInput) {
 
@@ -716,6 +749,12 @@ function fetchAndUpdateQuestion(keyInput) {
     // Disable the run code button
     document.getElementById("run").disabled = true;
 
+    // Questions from the current curriculum bundle are shown without a round trip
+    if (curriculumBundle && curriculumBundle.questions[keyInput]) {
+        showQuestion(curriculumBundle.questions[keyInput]);
+        return;
+    }
+
     fetch('/task_request', {
         method: 'POST',
         headers: {
@@ -730,22 +769,24 @@ function fetchAndUpdateQuestion(keyInput) {
         }
         return response.json();
     })
-    .then(data => {
-        // Get the content data
-        standard = data.Standard;
-        objective = data.Objective;
-        description = data.Description;
-        difficulty = data.Difficulty;
-        video = data.Video;
-        //Update the page
-        updatePage(data);
-        
+    .then(data => showQuestion(data))
+    .catch(error => console.error('Error:', error));
+}
+
+// Function to update the page with a question payload and start timing it
+function showQuestion(data) {
+    // Get the content data
+    standard = data.Standard;
+    objective = data.Objective;
+    description = data.Description;
+    difficulty = data.Difficulty;
+    video = data.Video;
+    //Update the page
+    updatePage(data);
+    
     // Start timer
     startTimer();
     questionStartTime = new Date().getTime();
-    
-    })
-    .catch(error => console.error('Error:', error));
 }
 
 //--------------------------------------------------------------------------------------------
@@ -1001,8 +1042,23 @@ function showResultDialog(isCorrect, dXP) {
 //------------------------------------------------------------------------------------------------------------------
 
 // Function to handle posting the XP data to the server for datbase storage
+// Events wait in a localStorage outbox until the server acknowledges them; each carries an
+// event_id so a resend after a dropped response is never counted twice
+let xpFlushInFlight = false;
+
+// Outbox is per user so a shared Chromebook never posts one student's answers as another's
+function xpOutboxKey() {
+    return `xpOutbox:${sessionStorage.getItem('username')}`;
+}
+
+function newXPEventId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
 function postXP(dXP, questionId, curriculumId, contentId, standard, objective, elapsedTime, difficulty, dXP_possible) {
-    const XPData = {'dXP': dXP,
+    const XPData = {'event_id': newXPEventId(),
+                    'dXP': dXP,
                     'question_id': questionId,
                     'curriculum_id': curriculumId,
                     'content_id': contentId,
@@ -1011,26 +1067,69 @@ function postXP(dXP, questionId, curriculumId, contentId, standard, objective, e
                     'elapsed_time': elapsedTime,
                     'difficulty': difficulty,
                     'possible_xp': dXP_possible};
-    
-    fetch('/update_xp', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify(XPData)
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        return response.json();
-    })
-    .then(data => {
+
+    const outbox = JSON.parse(localStorage.getItem(xpOutboxKey())) || [];
+    outbox.push(XPData);
+    localStorage.setItem(xpOutboxKey(), JSON.stringify(outbox));
+    flushXPOutbox();
+}
+
+// Remove the given events from the outbox (new ones may have been queued meanwhile)
+function dropFromXPOutbox(events) {
+    const sent = new Set(events.map(event => event.event_id));
+    const remaining = (JSON.parse(localStorage.getItem(xpOutboxKey())) || []).filter(event => !sent.has(event.event_id));
+    localStorage.setItem(xpOutboxKey(), JSON.stringify(remaining));
+    return remaining;
+}
+
+// Function to send every unacknowledged XP event in one request
+// 200: stored (events the server rejected as malformed are dropped too, resending cannot fix them)
+// 401/403: kept until the student logs in again; other 4xx: the slice is dropped
+// 5xx or network error: kept and retried with exponential backoff
+let xpRetryDelay = 5000;
+
+async function flushXPOutbox() {
+    if (xpFlushInFlight) return;
+    const outbox = (JSON.parse(localStorage.getItem(xpOutboxKey())) || []).slice(0, 200);
+    if (!outbox.length) return;
+
+    xpFlushInFlight = true;
+    let response;
+    try {
+        response = await fetch('/update_xp', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ events: outbox })
+        });
+    } catch (error) {
+        response = null;
+        console.error('Error posting XP data:', error); // Network error
+    }
+    xpFlushInFlight = false;
+
+    if (response && response.ok) {
+        const data = await response.json();
         console.log("XP data successfully updated:", data); // Log server response
-    })
-    .catch((error) => {
-        console.error('Error posting XP data:', error); // Log any errors
-    });
+        if (data.rejected && data.rejected.length) {
+            console.warn("XP events rejected by the server:", data.rejected);
+        }
+        xpRetryDelay = 5000;
+        if (dropFromXPOutbox(outbox).length) flushXPOutbox();
+
+    } else if (response && (response.status === 401 || response.status === 403)) {
+        console.error(`XP data not sent, please log in again (status ${response.status})`);
+
+    } else if (response && response.status < 500) {
+        console.error(`XP data rejected, dropping ${outbox.length} events (status ${response.status})`);
+        if (dropFromXPOutbox(outbox).length) flushXPOutbox();
+
+    } else {
+        if (response) console.error(`Error posting XP data: status ${response.status}`);
+        setTimeout(flushXPOutbox, xpRetryDelay);
+        xpRetryDelay = Math.min(xpRetryDelay * 2, 300000);
+    }
 }
 
 //------------------------------------------------------------------------------------------------------------------
@@ -1355,6 +1454,7 @@ document.addEventListener("DOMContentLoaded", function() {
     
     // Initialize the session
     initializePage();
+    flushXPOutbox();  // Resend anything left over from a previous page
     //updateSessionData();  // Recent add here (all 3)
     //checkCurriculumStatus;
     //loadProgressBar();
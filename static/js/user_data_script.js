@@ -59,31 +59,47 @@ function initializeEditors() {
 }
 
 
-async function fetchAndPopulateUsers() {
+// Typeahead for the username field: only one page of matching usernames is ever fetched
+const USER_SUGGESTIONS = 25;
+let userSearchTimer;
+let userSearchSeq = 0;
+
+async function fetchUserSuggestions(prefix) {
+    const seq = ++userSearchSeq;
     try {
-        const response = await fetch('/get_users');
+        const params = new URLSearchParams({prefix: prefix, limit: USER_SUGGESTIONS});
+        const response = await fetch('/user_directory?' + params);
         if (!response.ok) {
             const errorData = await response.json();  // Extract the error message from the response
             throw new Error(errorData.error || `HTTP error! Status: ${response.status}`);
         }
-        const data = await response.json();  // Assume response is { "users": [...] }
+        const data = await response.json();  // { "users": [{id, username}], "nextCursor": ... }
+
+        // Drop answers to keystrokes that were overtaken by later ones
+        if (seq !== userSearchSeq) return;
 
-        // Populate the dropdown
-        const dropdown = document.getElementById('username');
-        data.users.forEach(username => {  // Access the usernames via 'data.users'
+        // Replace the suggestions
+        const datalist = document.getElementById('username-options');
+        datalist.innerHTML = '';
+        data.users.forEach(user => {
             const option = document.createElement('option');
-            option.value = username;
-            option.text = username;
-            dropdown.appendChild(option);
+            option.value = user.username;
+            datalist.appendChild(option);
         });
     } catch (error) {
         console.error('Error fetching usernames:', error);
-
-        // Display the error message in an alert
-        alert(`Error: ${error.message}`);
     }
 }
 
+function setupUserSearch() {
+    const input = document.getElementById('username');
+    input.addEventListener('input', function () {
+        clearTimeout(userSearchTimer);
+        userSearchTimer = setTimeout(() => fetchUserSuggestions(input.value.trim()), 150);
+    });
+    fetchUserSuggestions('');
+}
+
 // Function to fetch the curriculums available to the admin user
 // Teachers get only their custom curriculums, system users get all curriculums
 async function fetchCourseData() {
@@ -312,7 +328,7 @@ function moveSelected(sourceSelect, destSelect) {
 
 document.addEventListener('DOMContentLoaded', function () {
     initializeEditors();
-    fetchAndPopulateUsers();
+    setupUserSearch();
     fetchCourseData();
     setupCurriculumButtons();
 });
\ No newline at end of file
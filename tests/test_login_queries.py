@@ -0,0 +1,42 @@
+'''
+Statement budget of /login (see benchmarks/bench_login_queries)
+
+Usage: python -m pytest tests
+'''
+
+# Import packages
+import bcrypt, pytest
+from flask import session
+from modules.models import *
+from modules.passwords import password_hasher
+from benchmarks.bench_helpers import make_app, seed_school, QueryCounter
+from benchmarks.bench_login_queries import LOGIN_MAX_STATEMENTS, lean_login
+
+@pytest.fixture(scope='module')
+def school():
+    '''A small seeded school whose passwords are all "pw", with the first teacher as system admin'''
+    test_app = make_app()
+    password_hasher.configure(rounds=4)
+    with test_app.app_context():
+        school = seed_school(users=40, teachers=2, sections_per_teacher=2, xp_per_user=1, size='small')
+        db.session.execute(db.update(User).values(password_hash=bcrypt.hashpw(b'pw', bcrypt.gensalt(4))))
+        db.session.execute(db.update(Admin).where(Admin.id == school['teacher_ids'][0]).values(role='system'))
+        db.session.commit()
+        usernames = [username for (username,) in db.session.query(User.username)
+                     .filter(User.id.in_(school['student_ids'][:10]))]
+        yield test_app, school, usernames
+
+def test_login_statement_budget(school):
+    test_app, school, usernames = school
+    with test_app.app_context():
+        # The first login warms the admin role index
+        with test_app.test_request_context():
+            lean_login(usernames[0])
+
+        for username in usernames:
+            db.session.expunge_all()
+            with test_app.test_request_context(), QueryCounter(db.engine) as counter:
+                lean_login(username)
+                assert session['username'] == username
+                assert session['system_ids'] == [school['teacher_ids'][0]]
+            assert counter.count <= LOGIN_MAX_STATEMENTS, counter.statements